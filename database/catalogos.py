@@ -0,0 +1,141 @@
+"""
+database/catalogos.py - CACHÉ EN MEMORIA DE CATÁLOGOS
+│
+│ Propósito:
+│ • Guardar en memoria trabajadores, países, métodos de pago, juegos,
+│   productos y monedas (cambian pocas veces al mes, se leen miles al día)
+│ • Cada catálogo trae la lista + diccionarios id → fila y nombre → id
+│ • Catalogo sirve también a las pestañas para resolver la selección de
+│   los combos y filtrar por grupo (productos de un juego)
+│ • Invalidación write-through: las funciones agregar_/editar_/eliminar_
+│   de database.operations llaman a invalidar() al escribir
+│ • Cambios hechos por OTRA PC (BD en red) se detectan comparando la
+│   versión de datos como máximo cada SETTINGS["catalog_cache_ttl"] segundos
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.config import SETTINGS
+
+
+class Catalogo:
+    """
+    Lista de filas indexada para combos y filtros (todo O(1) por consulta).
+
+    • filas: en el orden original (el de los combos)
+    • etiquetas: texto mostrado en el combo; si dos filas comparten nombre
+      se les agrega " (#id)" para que cada etiqueta identifique una sola fila
+    • por_id / por_nombre: id -> fila, etiqueta -> id
+    • grupo(campo, valor): filas con ese valor (p.ej. productos por game_id)
+
+    Se puede iterar como la lista de filas de antes.
+    """
+
+    def __init__(self, filas: List[Dict[str, Any]], clave_nombre: str = "name",
+                 etiqueta: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 tablas: Tuple[str, ...] = (), version: int = 0):
+        self.filas = filas
+        self.clave_nombre = clave_nombre
+        self.tablas = tablas
+        self.version = version
+        self.verificado_en = time.monotonic()
+        self._etiqueta = etiqueta or (lambda f: str(f[clave_nombre]))
+        self._grupos: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {}
+
+        self.por_id: Dict[int, Dict[str, Any]] = {f["id"]: f for f in filas}
+
+        # Nombres repetidos: se distinguen con el id
+        textos = [self._etiqueta(f) for f in filas]
+        repetidos = {t for t, n in Counter(textos).items() if n > 1}
+        self._etiqueta_por_id: Dict[int, str] = {
+            f["id"]: f"{t} (#{f['id']})" if t in repetidos else t
+            for f, t in zip(filas, textos)
+        }
+        self.etiquetas: List[str] = list(self._etiqueta_por_id.values())
+        self.por_nombre: Dict[str, int] = {e: i for i, e in self._etiqueta_por_id.items()}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.filas)
+
+    def __len__(self) -> int:
+        return len(self.filas)
+
+    def id_por_nombre(self, nombre: str) -> Optional[int]:
+        """Id de la etiqueta elegida en un combo (None si no existe)"""
+        return self.por_nombre.get(nombre)
+
+    def fila_por_nombre(self, nombre: str) -> Optional[Dict[str, Any]]:
+        item_id = self.por_nombre.get(nombre)
+        return None if item_id is None else self.por_id[item_id]
+
+    def nombre_por_id(self, item_id: int) -> Optional[str]:
+        fila = self.por_id.get(item_id)
+        return fila[self.clave_nombre] if fila else None
+
+    def etiqueta_por_id(self, item_id: int) -> Optional[str]:
+        return self._etiqueta_por_id.get(item_id)
+
+    def grupo(self, campo: str, valor: Any) -> List[Dict[str, Any]]:
+        """Filas cuyo 'campo' vale 'valor' (el índice se arma una sola vez)"""
+        if campo not in self._grupos:
+            indice: Dict[Any, List[Dict[str, Any]]] = {}
+            for f in self.filas:
+                indice.setdefault(f.get(campo), []).append(f)
+            self._grupos[campo] = indice
+        return self._grupos[campo].get(valor, [])
+
+    def etiquetas_de(self, filas: List[Dict[str, Any]]) -> List[str]:
+        """Etiquetas (ya desambiguadas) de un subconjunto de filas"""
+        return [self._etiqueta_por_id[f["id"]] for f in filas]
+
+    def filtrar(self, condicion: Callable[[Dict[str, Any]], bool]) -> "Catalogo":
+        """Nuevo catálogo con las filas que cumplen la condición"""
+        return Catalogo([f for f in self.filas if condicion(f)],
+                        self.clave_nombre, self._etiqueta, self.tablas, self.version)
+
+
+_cache: Dict[str, Catalogo] = {}
+_lock = threading.Lock()  # Las pestañas y el ejecutor de consultas leen en paralelo
+
+
+def obtener(nombre: str, tablas: Tuple[str, ...],
+            cargador: Callable[[], List[Dict[str, Any]]],
+            version_actual: Callable[[], int],
+            clave_nombre: str = "name") -> Catalogo:
+    """
+    Devuelve el catálogo 'nombre' desde memoria, cargándolo con cargador()
+    si no existe, fue invalidado o la versión de sus tablas cambió.
+    """
+    with _lock:
+        catalogo = _cache.get(nombre)
+        ahora = time.monotonic()
+
+        if catalogo is not None:
+            if ahora - catalogo.verificado_en < SETTINGS["catalog_cache_ttl"]:
+                return catalogo
+            # Revisión periódica: ¿alguien más escribió en la BD?
+            if version_actual() == catalogo.version:
+                catalogo.verificado_en = ahora
+                return catalogo
+
+        # Versión leída ANTES de cargar: un cambio concurrente fuerza otra carga
+        version = version_actual()
+        catalogo = Catalogo(cargador(), clave_nombre, tablas=tablas, version=version)
+        _cache[nombre] = catalogo
+        return catalogo
+
+
+def invalidar(*tablas: str) -> None:
+    """Descarta los catálogos que dependen de alguna de las tablas indicadas."""
+    with _lock:
+        for nombre in [n for n, c in _cache.items() if set(c.tablas) & set(tablas)]:
+            del _cache[nombre]
+
+
+def limpiar() -> None:
+    """Vacía toda la caché (p.ej. al cambiar de base de datos)."""
+    with _lock:
+        _cache.clear()
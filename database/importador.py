@@ -0,0 +1,373 @@
+"""
+database/importador.py - IMPORTACIÓN MASIVA DE RECARGAS Y REMESAS
+│
+│ Propósito:
+│ • Leer filas de CSV o Excel (.xlsx) sin cargar todo el archivo en memoria
+│ • Validar cada fila y traducir nombres de catálogo (trabajador, país...) a ids
+│ • Calcular ganancias igual que agregar_recarga / agregar_remesa
+│ • Insertar por lotes con executemany: una transacción (un fsync) por lote
+│ • Modo simulación: solo valida y devuelve el reporte, sin escribir
+"""
+
+import codecs
+import csv
+import os
+import unicodedata
+from datetime import datetime, date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from utils.config import SETTINGS
+from database.catalogos import Catalogo
+from database.operations import (
+    conexion,
+    obtener_catalogo,
+    _SQL_INSERTAR_RECARGA,
+    _SQL_INSERTAR_REMESA,
+    _valores_recarga,
+    _valores_remesa,
+)
+
+# ========================================
+# 📋 COLUMNAS ESPERADAS
+# ========================================
+
+# campo -> encabezados aceptados (se comparan sin tildes ni mayúsculas)
+_COLUMNAS_COMUNES = {
+    "fecha": ("fecha", "date"),
+    "trabajador": ("trabajador", "worker", "vendedor"),
+    "pais": ("pais", "country"),
+    "metodo_pago": ("metodo_pago", "metodo de pago", "metodo", "payment_method"),
+    "notas": ("notas", "notes", "nota"),
+}
+
+_COLUMNAS = {
+    "recarga": {
+        **_COLUMNAS_COMUNES,
+        "recibido": ("recibido", "recibido_usd", "monto", "amount_received_usd"),
+        "costo": ("costo", "costo_usd", "cost_usd"),
+        "comision": ("comision", "comision_usd", "seller_commission_usd"),
+        "juego": ("juego", "game"),
+        "producto": ("producto", "product"),
+        "cliente": ("cliente", "customer_name"),
+    },
+    "remesa": {
+        **_COLUMNAS_COMUNES,
+        "moneda": ("moneda", "currency"),
+        "remitente": ("remitente", "sender_name"),
+        "telefono_remitente": ("telefono_remitente", "sender_phone"),
+        "monto_origen": ("monto_origen", "monto", "amount_origin"),
+        "tasa_bs": ("tasa_bs", "tasa", "rate_origin_to_bs"),
+        "beneficiario": ("beneficiario", "receiver_name"),
+        "telefono_beneficiario": ("telefono_beneficiario", "receiver_phone"),
+        "tasa_compra": ("tasa_compra", "tasa_compra_usdt", "rate_buy_usdt"),
+        "tasa_venta": ("tasa_venta", "tasa_venta_usdt", "rate_sell_usdt_bs"),
+        "comision": ("comision", "comision_usdt", "seller_commission_usdt"),
+    },
+}
+
+_OBLIGATORIOS = {
+    "recarga": ("fecha", "trabajador", "pais", "metodo_pago", "recibido", "costo"),
+    "remesa": ("fecha", "trabajador", "pais", "metodo_pago", "moneda", "remitente",
+               "monto_origen", "tasa_bs", "beneficiario", "tasa_compra", "tasa_venta"),
+}
+
+# Formatos de fecha aceptados además de SETTINGS["default_date_format"]
+_FORMATOS_FECHA = ("%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y")
+
+# ========================================
+# 📂 LECTURA DE ARCHIVOS
+# ========================================
+
+def _normalizar(texto: Any) -> str:
+    """'Método de Pago ' -> 'metodo de pago' (para comparar encabezados/nombres)"""
+    texto = unicodedata.normalize("NFKD", str(texto or "").strip().casefold())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def _codificacion_csv(ruta: str) -> str:
+    """utf-8 si todo el archivo lo es; si no, cp1252 (CSV guardado por Excel en Windows)"""
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 16), b""):
+                decodificador.decode(bloque)
+        decodificador.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8-sig"
+
+def _leer_csv(ruta: str) -> Iterator[List[Any]]:
+    # Se decide la codificación antes de leer para no fallar a mitad del archivo
+    with open(ruta, newline="", encoding=_codificacion_csv(ruta), errors="replace") as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.reader(f, dialecto)
+
+def _leer_xlsx(ruta: str) -> Iterator[List[Any]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Para importar Excel instala openpyxl (o guarda el archivo como CSV)")
+
+    # read_only: las filas se leen a medida que se recorren
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield list(fila)
+    finally:
+        libro.close()
+
+def _leer_filas(ruta: str) -> Iterator[List[Any]]:
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _leer_xlsx(ruta)
+    if extension in (".csv", ".txt"):
+        return _leer_csv(ruta)
+    raise ValueError(f"Formato no soportado: {extension} (usa .csv o .xlsx)")
+
+# ========================================
+# ✅ VALIDACIÓN Y CONVERSIÓN
+# ========================================
+
+def _mapear_encabezados(encabezados: List[Any], tipo: str) -> Dict[str, int]:
+    """campo -> índice de columna. Error si falta alguna obligatoria."""
+    posiciones = {_normalizar(e): i for i, e in enumerate(encabezados) if e is not None}
+    mapa = {}
+    for campo, alias in _COLUMNAS[tipo].items():
+        for nombre in alias:
+            if _normalizar(nombre) in posiciones:
+                mapa[campo] = posiciones[_normalizar(nombre)]
+                break
+
+    faltan = [c for c in _OBLIGATORIOS[tipo] if c not in mapa]
+    if faltan:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+    return mapa
+
+def _a_fecha(valor: Any) -> str:
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if isinstance(valor, date):
+        return valor.strftime("%Y-%m-%d")
+
+    texto = str(valor or "").strip()
+    if not texto:
+        raise ValueError("fecha vacía")
+    for formato in (SETTINGS["default_date_format"],) + _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida '{texto}'")
+
+def _a_numero(valor: Any, campo: str) -> float:
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor or "").strip().replace("$", "").replace(" ", "")
+    if not texto:
+        return 0.0
+    if "," in texto and "." in texto:
+        # 1.234,56 -> 1234.56 | 1,234.56 -> 1234.56
+        if texto.rfind(",") > texto.rfind("."):
+            texto = texto.replace(".", "").replace(",", ".")
+        else:
+            texto = texto.replace(",", "")
+    else:
+        texto = texto.replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError(f"{campo}: número inválido '{valor}'")
+
+class _Resolutor:
+    """Nombre escrito en la planilla -> id de catálogo (sin tildes ni mayúsculas)"""
+
+    def __init__(self, catalogo: Union[str, Catalogo], filtro: Optional[Callable[[dict], bool]] = None):
+        if isinstance(catalogo, str):
+            catalogo = obtener_catalogo(catalogo)
+        if filtro:
+            catalogo = catalogo.filtrar(filtro)
+        self._ids: Dict[str, Optional[int]] = {}
+        for fila in catalogo:
+            clave = _normalizar(fila[catalogo.clave_nombre])
+            # Nombre repetido en el catálogo: ambiguo salvo que se use la etiqueta "(#id)"
+            self._ids[clave] = None if clave in self._ids else fila["id"]
+        for fila in catalogo:
+            # "Nombre (#id)" siempre identifica una sola fila
+            self._ids.setdefault(_normalizar(f"{fila[catalogo.clave_nombre]} (#{fila['id']})"), fila["id"])
+
+    def id(self, valor: Any, campo: str, obligatorio: bool = True) -> Optional[int]:
+        clave = _normalizar(valor)
+        if not clave:
+            if obligatorio:
+                raise ValueError(f"{campo} vacío")
+            return None
+        if clave not in self._ids:
+            raise ValueError(f"{campo} '{valor}' no existe")
+        if self._ids[clave] is None:
+            raise ValueError(f"{campo} '{valor}' está repetido; usa 'Nombre (#id)'")
+        return self._ids[clave]
+
+def _convertidor(tipo: str) -> Callable[[Dict[str, Any]], tuple]:
+    """Función fila -> parámetros de INSERT (lanza ValueError si la fila es inválida)"""
+    trabajadores = _Resolutor("trabajadores")
+    paises = _Resolutor("paises")
+    metodos = _Resolutor("metodos_pago", lambda m: m["type"] in (tipo, "ambos"))
+
+    def texto(fila, campo):
+        valor = fila.get(campo)
+        return str(valor).strip() if valor not in (None, "") else None
+
+    if tipo == "recarga":
+        juegos = _Resolutor("juegos")
+        catalogo_productos = obtener_catalogo("productos")
+        productos_por_juego: Dict[int, _Resolutor] = {}
+
+        def producto_id(fila, juego_id):
+            """El producto se busca solo entre los del juego de la fila"""
+            if not _normalizar(fila.get("producto")):
+                return None
+            if juego_id is None:
+                raise ValueError("producto indicado sin juego")
+            if juego_id not in productos_por_juego:
+                productos_por_juego[juego_id] = _Resolutor(
+                    Catalogo(catalogo_productos.grupo("game_id", juego_id))
+                )
+            try:
+                return productos_por_juego[juego_id].id(fila["producto"], "producto")
+            except ValueError as e:
+                if "no existe" in str(e):
+                    raise ValueError(f"producto '{fila['producto']}' no existe en el juego '{fila['juego']}'")
+                raise
+
+        def convertir(fila):
+            recibido = _a_numero(fila["recibido"], "recibido")
+            if recibido <= 0:
+                raise ValueError("recibido debe ser mayor a cero")
+            juego_id = juegos.id(fila.get("juego"), "juego", obligatorio=False)
+            return _valores_recarga(
+                _a_fecha(fila["fecha"]),
+                trabajadores.id(fila["trabajador"], "trabajador"),
+                paises.id(fila["pais"], "país"),
+                metodos.id(fila["metodo_pago"], "método de pago"),
+                recibido,
+                _a_numero(fila["costo"], "costo"),
+                _a_numero(fila.get("comision"), "comisión"),
+                juego_id,
+                producto_id(fila, juego_id),
+                texto(fila, "cliente"),
+                texto(fila, "notas"),
+            )
+        return convertir
+
+    monedas = _Resolutor("monedas")
+
+    def convertir(fila):
+        monto = _a_numero(fila["monto_origen"], "monto origen")
+        tasa_compra = _a_numero(fila["tasa_compra"], "tasa compra")
+        tasa_venta = _a_numero(fila["tasa_venta"], "tasa venta")
+        if monto <= 0:
+            raise ValueError("monto origen debe ser mayor a cero")
+        if tasa_compra <= 0 or tasa_venta <= 0:
+            raise ValueError("las tasas de compra y venta deben ser mayores a cero")
+        remitente, beneficiario = texto(fila, "remitente"), texto(fila, "beneficiario")
+        if not remitente or not beneficiario:
+            raise ValueError("remitente y beneficiario son obligatorios")
+        return _valores_remesa(
+            _a_fecha(fila["fecha"]),
+            trabajadores.id(fila["trabajador"], "trabajador"),
+            paises.id(fila["pais"], "país"),
+            metodos.id(fila["metodo_pago"], "método de pago"),
+            monedas.id(str(fila["moneda"] or "").split(" - ")[0], "moneda"),
+            remitente,
+            texto(fila, "telefono_remitente"),
+            monto,
+            _a_numero(fila["tasa_bs"], "tasa Bs"),
+            beneficiario,
+            texto(fila, "telefono_beneficiario"),
+            tasa_compra,
+            tasa_venta,
+            _a_numero(fila.get("comision"), "comisión"),
+            texto(fila, "notas"),
+        )
+    return convertir
+
+# ========================================
+# 📥 IMPORTACIÓN
+# ========================================
+
+def importar_transacciones(
+    ruta: str,
+    tipo: str,
+    simular: bool = False,
+    al_progresar: Optional[Callable[[int, int], None]] = None,
+    tamano_lote: int = 500,
+) -> Dict[str, Any]:
+    """
+    Importa recargas (tipo='recarga') o remesas (tipo='remesa') desde CSV/XLSX.
+
+    • La primera fila son los encabezados (ver _COLUMNAS para los nombres aceptados)
+    • Las filas inválidas se omiten y se reportan con su número de línea
+    • simular=True solo valida: no escribe nada
+    • al_progresar(filas_leidas, filas_insertadas) se llama tras cada lote
+      (desde el hilo que ejecuta la importación)
+    • Cada lote se confirma por separado: si la lectura o un lote fallan a mitad
+      de archivo se devuelve el reporte parcial, con interrumpida=(última fila
+      leída, mensaje); las filas hasta ultima_linea_guardada ya quedaron guardadas
+
+    Retorna {'leidas', 'validas', 'insertadas', 'ultima_linea_guardada',
+             'errores': [(linea, mensaje)], 'interrumpida', 'simulacion'}
+    """
+    if tipo not in _COLUMNAS:
+        raise ValueError(f"Tipo inválido: {tipo} (usa 'recarga' o 'remesa')")
+
+    sql = _SQL_INSERTAR_RECARGA if tipo == "recarga" else _SQL_INSERTAR_REMESA
+    convertir = _convertidor(tipo)
+    reporte = {
+        "leidas": 0, "validas": 0, "insertadas": 0, "ultima_linea_guardada": 1,
+        "errores": [], "interrumpida": None, "simulacion": simular,
+    }
+
+    filas = _leer_filas(ruta)
+    encabezados = next(filas, None)
+    if encabezados is None:
+        raise ValueError("El archivo está vacío")
+    mapa = _mapear_encabezados(encabezados, tipo)
+
+    lote: List[tuple] = []
+    linea = 1
+
+    def guardar_lote():
+        if not simular and lote:
+            with conexion() as conn:  # Un commit por lote
+                conn.executemany(sql, lote)
+            reporte["insertadas"] += len(lote)
+            reporte["ultima_linea_guardada"] = linea
+        lote.clear()
+        if al_progresar:
+            al_progresar(reporte["leidas"], reporte["insertadas"])
+
+    try:
+        for linea, valores in enumerate(filas, start=2):
+            if not any(v not in (None, "") for v in valores):
+                continue  # Fila vacía (comunes al final de las planillas)
+            reporte["leidas"] += 1
+            fila = {campo: valores[i] if i < len(valores) else None for campo, i in mapa.items()}
+            try:
+                lote.append(convertir(fila))
+                reporte["validas"] += 1
+            except (ValueError, ZeroDivisionError) as e:
+                reporte["errores"].append((linea, str(e)))
+                continue
+
+            if len(lote) >= tamano_lote:
+                guardar_lote()
+
+        guardar_lote()
+    except Exception as e:
+        # Los lotes anteriores ya están confirmados: se informa hasta dónde llegó
+        reporte["interrumpida"] = (linea, f"{type(e).__name__}: {e}")
+    return reporte
@@ -3,6 +3,7 @@ database/operations.py - [translate:BASE DE DATOS TRYHARDS - CATÁLOGOS + TRANSA
 │
 │ Propósito:
 │ • Inicializar base de datos SQLite (app.db)
+│ • Conexión persistente por hilo reutilizada por todo el CRUD (conexion())
 │ • CRUD para catálogos usados en AdminPanel:
 │     - Trabajadores, Países, Métodos de pago, Juegos, Productos, Monedas
 │ • Tablas operacionales para Recargas y Remesas
@@ -11,25 +12,215 @@ database/operations.py - [translate:BASE DE DATOS TRYHARDS - CATÁLOGOS + TRANSA
 """
 
 import os
+import sys
+import copy
+import json
 import sqlite3
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from datetime import datetime, timedelta
 
-from utils.config import DB_PATH
+from utils.config import DB_PATH, SETTINGS, DB_PRAGMA_PROFILES
+from database import catalogos
 
 # ========================================
 # 🔗 CONEXIÓN BÁSICA
 # ========================================
 
+# Una conexión persistente por hilo (sqlite3 no comparte conexiones entre hilos)
+_pool = threading.local()
+
 def get_connection() -> sqlite3.Connection:
     """
-    Abre conexión a app.db (en carpeta data).
+    Abre una conexión NUEVA a app.db (en carpeta data).
+
+    Se mantiene por compatibilidad (database.models la reexporta).
+    Dentro de este módulo se usa conexion(), que reutiliza la conexión del hilo.
     """
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    _aplicar_pragmas_conexion(conn)
     return conn
 
+# Perfil de PRAGMAs en uso: (ruta de la BD, nombre del perfil)
+_perfil_activo: Optional[Tuple[str, str]] = None
+
+def _bd_en_red(ruta: str) -> bool:
+    """
+    Detecta si app.db está en una carpeta de red (UNC o unidad mapeada).
+    """
+    ruta = os.path.abspath(ruta)
+    if ruta.startswith("\\\\") or ruta.startswith("//"):
+        return True
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            unidad = os.path.splitdrive(ruta)[0] + "\\"
+            return ctypes.windll.kernel32.GetDriveTypeW(unidad) == 4  # DRIVE_REMOTE
+        except Exception:
+            return False
+    return False
+
+def _nombre_perfil_pragmas() -> str:
+    """
+    Resuelve el perfil de SETTINGS["db_pragma_profile"] (una vez por ruta).
+    Si la BD está en red se usa siempre el perfil "red".
+    """
+    global _perfil_activo
+    if _perfil_activo is None or _perfil_activo[0] != DB_PATH:
+        nombre = SETTINGS.get("db_pragma_profile", "rendimiento")
+        if nombre not in DB_PRAGMA_PROFILES:
+            print(f"⚠️ Perfil de PRAGMAs desconocido '{nombre}', usando 'seguro'")
+            nombre = "seguro"
+        if nombre != "red" and _bd_en_red(DB_PATH):
+            print("⚠️ app.db está en una carpeta de red: se desactiva WAL (perfil 'red')")
+            nombre = "red"
+        _perfil_activo = (DB_PATH, nombre)
+    return _perfil_activo[1]
+
+def _aplicar_pragmas_conexion(conn: sqlite3.Connection) -> None:
+    """
+    PRAGMAs por conexión: se aplican UNA vez al abrirla, no en cada consulta.
+    El modo de diario (WAL) es persistente y se fija en inicializar_base_de_datos().
+    """
+    perfil = DB_PRAGMA_PROFILES[_nombre_perfil_pragmas()]
+    conn.execute("PRAGMA busy_timeout = 5000")  # Espera 5 s si otro proceso escribe
+    conn.execute(f"PRAGMA synchronous = {perfil['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(perfil['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(perfil['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {perfil['temp_store']}")
+
+def _aplicar_modo_diario(conn: sqlite3.Connection) -> str:
+    """
+    Fija el journal_mode del perfil activo y devuelve el modo resultante.
+    Si SQLite rechaza WAL (sistema de archivos sin memoria compartida)
+    se cae al perfil "red" y se reaplican los PRAGMAs de la conexión.
+    """
+    global _perfil_activo
+    perfil = DB_PRAGMA_PROFILES[_nombre_perfil_pragmas()]
+    deseado = perfil["journal_mode"].lower()
+
+    try:
+        modo = conn.execute(f"PRAGMA journal_mode = {deseado}").fetchone()[0].lower()
+    except sqlite3.DatabaseError as e:
+        print(f"⚠️ No se pudo fijar journal_mode={deseado}: {e}")
+        modo = ""
+
+    if modo != deseado:
+        print(f"⚠️ journal_mode={deseado} no disponible (actual: {modo or '?'}), usando perfil 'red'")
+        _perfil_activo = (DB_PATH, "red")
+        modo = conn.execute("PRAGMA journal_mode = DELETE").fetchone()[0].lower()
+        _aplicar_pragmas_conexion(conn)
+
+    return modo
+
+@contextmanager
+def conexion() -> Iterator[sqlite3.Connection]:
+    """
+    Entrega la conexión persistente del hilo actual como context manager.
+
+    • La primera llamada del hilo abre la conexión (row_factory + PRAGMAs)
+    • El bloque más externo hace commit al salir (rollback si hubo error)
+    • Los bloques anidados reutilizan la misma conexión y transacción
+
+    Uso:
+        with conexion() as conn:
+            conn.execute("...")
+    """
+    conn = getattr(_pool, "conn", None)
+    nivel = getattr(_pool, "nivel", 0)
+
+    # Si cambió la ruta de la BD (p. ej. otra carpeta data/) se reabre
+    if conn is not None and nivel == 0 and getattr(_pool, "ruta", None) != DB_PATH:
+        conn.close()
+        conn = None
+
+    if conn is None:
+        conn = get_connection()
+        _pool.conn = conn
+        _pool.ruta = DB_PATH
+
+    _pool.nivel = nivel + 1
+    try:
+        yield conn
+        if nivel == 0:
+            conn.commit()
+    except BaseException:
+        if nivel == 0:
+            conn.rollback()
+        raise
+    finally:
+        _pool.nivel = nivel
+
+# Espera TOTAL máxima para tomar el lock de escritura (busy_timeout incluido):
+# estas escrituras corren en el hilo de Tk, la ventana no debe congelarse más
+_ESPERA_MAXIMA_ESCRITURA = 8.0
+
+# UPDATE ... RETURNING existe desde SQLite 3.35
+_SOPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+@contextmanager
+def transaccion_inmediata() -> Iterator[sqlite3.Connection]:
+    """
+    Como conexion(), pero abre la transacción con BEGIN IMMEDIATE: el lock de
+    escritura se toma ANTES de leer saldos, así dos cajas (o dos PCs con la
+    misma app.db) no leen el mismo balance y se pisan al escribir.
+
+    • Si la BD sigue ocupada se reintenta con espera creciente, pero entre
+      busy_timeout y reintentos nunca se esperan más de _ESPERA_MAXIMA_ESCRITURA
+      segundos; después se propaga el error
+    • Dentro de una transacción ya abierta se reutiliza esa transacción
+    """
+    with conexion() as conn:
+        if not conn.in_transaction:
+            limite = time.monotonic() + _ESPERA_MAXIMA_ESCRITURA
+            espera_original = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+            intento = 0
+            try:
+                while True:
+                    # busy_timeout de cada intento = lo que queda del plazo total
+                    restante = max(limite - time.monotonic(), 0.0)
+                    conn.execute(f"PRAGMA busy_timeout = {int(restante * 1000)}")
+                    try:
+                        conn.execute("BEGIN IMMEDIATE")
+                        break
+                    except sqlite3.OperationalError as e:
+                        ocupada = "locked" in str(e) or "busy" in str(e)
+                        restante = limite - time.monotonic()
+                        if not ocupada or restante <= 0:
+                            raise
+                        time.sleep(min(0.2 * 2 ** intento, restante))
+                        intento += 1
+            finally:
+                conn.execute(f"PRAGMA busy_timeout = {espera_original}")
+        yield conn
+
+def _sumar_balance(conn: sqlite3.Connection, cuenta_id: int, delta: float) -> float:
+    """balance = balance + delta en una sola sentencia; retorna el balance nuevo"""
+    sql = """
+        UPDATE financial_accounts
+        SET balance = balance + ?, updated_at = datetime('now')
+        WHERE id = ?
+    """
+    if _SOPORTA_RETURNING:
+        # fetchall: la sentencia termina antes del INSERT del movimiento
+        return conn.execute(sql + " RETURNING balance", (delta, cuenta_id)).fetchall()[0]['balance']
+    conn.execute(sql, (delta, cuenta_id))
+    return conn.execute("SELECT balance FROM financial_accounts WHERE id = ?", (cuenta_id,)).fetchone()['balance']
+
+def cerrar_conexiones() -> None:
+    """
+    Cierra la conexión persistente del hilo actual (al cerrar la aplicación).
+    """
+    conn = getattr(_pool, "conn", None)
+    if conn is not None:
+        conn.close()
+        _pool.conn = None
+
 # ========================================
 # 🧱 CREACIÓN Y ACTUALIZACIÓN DE TABLAS
 # ========================================
@@ -236,42 +427,412 @@ def _create_tables(conn: sqlite3.Connection) -> None:
         );
     """)
 
-    conn.commit()
+# ✅ ÍNDICES SECUNDARIOS ADMINISTRADOS (nombre → tabla, columnas)
+# Cubren los filtros de Historial/Dashboard: fecha, trabajador y país.
+_INDICES = {
+    "idx_recharges_date_id":           ("recharges", "date, id"),
+    "idx_recharges_worker_date":       ("recharges", "worker_id, date"),
+    "idx_recharges_country_date":      ("recharges", "country_id, date"),
+    "idx_remittances_date_id":         ("remittances", "date, id"),
+    "idx_remittances_worker_date":     ("remittances", "worker_id, date"),
+    "idx_remittances_country_date":    ("remittances", "country_id, date"),
+    "idx_account_movements_account":   ("account_movements", "account_id, created_at"),
+    "idx_financial_deductions_status": ("financial_deductions", "status, due_date"),
+    "idx_change_log_table_version":    ("change_log", "table_name, version"),
+    "idx_daily_summary_worker_date":   ("daily_summary", "worker_id, date"),
+    "idx_account_checkpoints_time":    ("account_checkpoints", "account_id, created_at"),
+    "idx_financial_snapshots_created": ("financial_snapshots", "created_at"),
+}
+
+# Índices que la app creó en versiones anteriores y ya no usa: se eliminan.
+# Al quitar un nombre de _INDICES se agrega aquí; los índices creados a mano
+# (aunque empiecen con "idx_") nunca se tocan.
+_INDICES_RETIRADOS: Tuple[str, ...] = ()
+
+def _sincronizar_indices(conn: sqlite3.Connection) -> None:
+    """
+    Crea los índices de _INDICES que falten y elimina los de
+    _INDICES_RETIRADOS (solo índices que la app administró).
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\'")
+    existentes = {row[0] for row in cur.fetchall()}
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tablas = {row[0] for row in cur.fetchall()}
+
+    creados = 0
+    for nombre, (tabla, columnas) in _INDICES.items():
+        # Tablas creadas por una migración posterior: su índice llega con ella
+        if nombre not in existentes and tabla in tablas:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})")
+            creados += 1
+
+    for nombre in existentes & set(_INDICES_RETIRADOS):
+        cur.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+    if creados:
+        cur.execute("ANALYZE")  # Estadísticas para que el planificador use los índices
+        print(f"✅ {creados} índices creados")
+
+# ✅ REGISTRO DE CAMBIOS: versión de datos por tabla
+# Los triggers anotan cada INSERT/UPDATE/DELETE en change_log; su "version"
+# (AUTOINCREMENT) es un contador global que nunca retrocede, y data_versions
+# guarda la última versión de cada tabla. Así cualquier escritura (de esta
+# app, de otra PC en red o del importador) invalida las vistas que la usan.
+_TABLAS_VERSIONADAS = (
+    "workers", "countries", "payment_methods", "games", "products", "currencies",
+    "recharges", "remittances",
+    "financial_accounts", "financial_deductions", "account_movements", "financial_snapshots",
+)
+
+# Entradas de change_log que se conservan al podar (al iniciar la app)
+_CAMBIOS_RETENIDOS = 50000
+
+def _crear_registro_cambios(conn: sqlite3.Connection) -> None:
+    """Crea data_versions, change_log y los triggers de _TABLAS_VERSIONADAS."""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version    INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            version    INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id     INTEGER NOT NULL,
+            operation  TEXT NOT NULL CHECK (operation IN ('I', 'U', 'D')),
+            changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+
+    for tabla in _TABLAS_VERSIONADAS:
+        for evento, operacion, fila in (("INSERT", "I", "NEW"),
+                                        ("UPDATE", "U", "NEW"),
+                                        ("DELETE", "D", "OLD")):
+            # Dentro del trigger last_insert_rowid() es la versión recién
+            # anotada; al salir vuelve a ser el id de la fila del INSERT original
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{tabla}_{evento.lower()}_version
+                AFTER {evento} ON {tabla}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, operation)
+                    VALUES ('{tabla}', {fila}.id, '{operacion}');
+                    INSERT INTO data_versions (table_name, version)
+                    VALUES ('{tabla}', last_insert_rowid())
+                    ON CONFLICT(table_name) DO UPDATE SET version = excluded.version;
+                END
+            """)
+
+def _podar_registro_cambios(conn: sqlite3.Connection) -> None:
+    """Deja solo las últimas _CAMBIOS_RETENIDOS entradas de change_log."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'").fetchone() is None:
+        return  # Migración 3 aún no aplicada
+    conn.execute(
+        "DELETE FROM change_log WHERE version <= (SELECT MAX(version) FROM change_log) - ?",
+        (_CAMBIOS_RETENIDOS,)
+    )
+
+# ✅ RESUMEN DIARIO MATERIALIZADO
+# daily_summary guarda, por (día, trabajador, país, tipo), la cantidad y las
+# sumas de cada transacción. Triggers sobre recharges/remittances lo mantienen
+# al día en la misma transacción de la escritura; los resúmenes del Dashboard
+# y del Historial leen unas cientos de filas en vez de años de movimientos.
+# tipo -> (tabla, monto, monto_bs, costo, comisión, ganancia)
+_RESUMEN_DIARIO_ORIGENES = {
+    "RECARGA": ("recharges", "amount_received_usd", "0",
+                "cost_usd", "seller_commission_usd", "profit_usd"),
+    "REMESA": ("remittances", "amount_origin", "amount_destiny_bs",
+               "usdt_spent", "seller_commission_usdt", "profit_net_usdt"),
+}
+
+def _crear_resumen_diario(conn: sqlite3.Connection) -> None:
+    """Crea daily_summary y los triggers que lo mantienen."""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            date       TEXT NOT NULL,
+            worker_id  INTEGER NOT NULL,
+            country_id INTEGER NOT NULL,
+            kind       TEXT NOT NULL CHECK (kind IN ('RECARGA', 'REMESA')),
+            count      INTEGER NOT NULL DEFAULT 0,
+            amount     REAL NOT NULL DEFAULT 0,
+            amount_bs  REAL NOT NULL DEFAULT 0,
+            cost       REAL NOT NULL DEFAULT 0,
+            commission REAL NOT NULL DEFAULT 0,
+            profit     REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, worker_id, country_id, kind)
+        ) WITHOUT ROWID
+    """)
 
-def _actualizar_esquema(conn: sqlite3.Connection) -> None:
+    for tipo, (tabla, monto, monto_bs, costo, comision, ganancia) in _RESUMEN_DIARIO_ORIGENES.items():
+        def sumar(fila: str, signo: str) -> str:
+            # Upsert que suma (signo '+') o resta (signo '-') una fila al resumen
+            valores = ", ".join(
+                f"{signo}{fila}.{col}" if col != "0" else "0"
+                for col in (monto, monto_bs, costo, comision, ganancia)
+            )
+            return f"""
+                INSERT INTO daily_summary
+                    (date, worker_id, country_id, kind, count, amount, amount_bs, cost, commission, profit)
+                VALUES ({fila}.date, {fila}.worker_id, {fila}.country_id, '{tipo}', {signo}1, {valores})
+                ON CONFLICT(date, worker_id, country_id, kind) DO UPDATE SET
+                    count = count + excluded.count,
+                    amount = amount + excluded.amount,
+                    amount_bs = amount_bs + excluded.amount_bs,
+                    cost = cost + excluded.cost,
+                    commission = commission + excluded.commission,
+                    profit = profit + excluded.profit;
+            """
+
+        limpiar_vacio = f"""
+            DELETE FROM daily_summary
+            WHERE date = OLD.date AND worker_id = OLD.worker_id
+              AND country_id = OLD.country_id AND kind = '{tipo}' AND count = 0;
+        """
+        columnas = ", ".join(["date", "worker_id", "country_id"] +
+                             [c for c in (monto, monto_bs, costo, comision, ganancia) if c != "0"])
+
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_insert_resumen
+            AFTER INSERT ON {tabla}
+            BEGIN {sumar("NEW", "")} END
+        """)
+        # Solo cuando cambia algo que el resumen usa (no notas ni nombres)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_update_resumen
+            AFTER UPDATE OF {columnas} ON {tabla}
+            BEGIN {sumar("OLD", "-")} {sumar("NEW", "")} {limpiar_vacio} END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabla}_delete_resumen
+            AFTER DELETE ON {tabla}
+            BEGIN {sumar("OLD", "-")} {limpiar_vacio} END
+        """)
+
+def _reconstruir_resumen_diario(conn: sqlite3.Connection) -> int:
+    """Recalcula daily_summary desde cero. Retorna las filas generadas."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM daily_summary")
+    for tipo, (tabla, monto, monto_bs, costo, comision, ganancia) in _RESUMEN_DIARIO_ORIGENES.items():
+        cur.execute(f"""
+            INSERT INTO daily_summary
+                (date, worker_id, country_id, kind, count, amount, amount_bs, cost, commission, profit)
+            SELECT date, worker_id, country_id, '{tipo}', COUNT(*),
+                   SUM({monto}), SUM({monto_bs}), SUM({costo}), SUM({comision}), SUM({ganancia})
+            FROM {tabla}
+            GROUP BY date, worker_id, country_id
+        """)
+    return cur.execute("SELECT COUNT(*) FROM daily_summary").fetchone()[0]
+
+def _crear_libro_mayor(conn: sqlite3.Connection) -> None:
+    """
+    Libro mayor de cuentas:
+    • account_movements pasa a ser de solo inserción (triggers que rechazan
+      UPDATE/DELETE): un error se corrige con otro movimiento
+    • account_checkpoints: balance derivado de los movimientos hasta
+      movement_id; "balance al momento X" parte del checkpoint anterior
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS account_checkpoints (
+            account_id  INTEGER NOT NULL,
+            movement_id INTEGER NOT NULL,   -- Último movimiento incluido
+            created_at  TEXT NOT NULL,      -- created_at de ese movimiento
+            balance     REAL NOT NULL,
+            PRIMARY KEY (account_id, movement_id),
+            FOREIGN KEY (account_id) REFERENCES financial_accounts(id)
+        ) WITHOUT ROWID
+    """)
+    for operacion in ("UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_account_movements_no_{operacion.lower()}
+            BEFORE {operacion} ON account_movements
+            BEGIN SELECT RAISE(ABORT, 'account_movements es de solo inserción'); END
+        """)
+
+def _hay_libro_mayor(conn: sqlite3.Connection) -> bool:
+    """False mientras la migración 5 (account_checkpoints) no esté aplicada."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'account_checkpoints'"
+    ).fetchone() is not None
+
+def _crear_checkpoints_cuentas(conn: sqlite3.Connection, cada: int,
+                               cuentas: Optional[List[int]] = None) -> int:
+    """
+    Agrega un checkpoint a las cuentas con 'cada' o más movimientos desde el
+    último (solo a 'cuentas', si se indican). El balance sale SOLO de los
+    movimientos (checkpoint anterior + suma de new_balance - old_balance).
+    Retorna los checkpoints creados.
+    """
+    if not _hay_libro_mayor(conn):
+        return 0  # Migración 5 aún no aplicada
+    parametros: Dict[str, Any] = {"cada": cada}
+    filtro = ""
+    if cuentas is not None:
+        parametros.update((f"c{i}", cuenta_id) for i, cuenta_id in enumerate(cuentas))
+        filtro = f"AND m.account_id IN ({', '.join(f':c{i}' for i in range(len(cuentas)))})"
+    cur = conn.execute(f"""
+        INSERT INTO account_checkpoints (account_id, movement_id, created_at, balance)
+        WITH pendientes AS (
+            SELECT m.account_id,
+                   COUNT(*) AS movimientos,
+                   MIN(m.id) AS primero_id,
+                   MAX(m.id) AS ultimo_id,
+                   SUM(m.new_balance - m.old_balance) AS delta,
+                   c.balance AS balance_checkpoint
+            FROM account_movements m
+            LEFT JOIN account_checkpoints c
+                   ON c.account_id = m.account_id
+                  AND c.movement_id = (SELECT MAX(movement_id) FROM account_checkpoints
+                                       WHERE account_id = m.account_id)
+            WHERE m.id > COALESCE(c.movement_id, 0) {filtro}
+            GROUP BY m.account_id
+            HAVING COUNT(*) >= :cada
+        )
+        SELECT p.account_id, p.ultimo_id,
+               (SELECT created_at FROM account_movements WHERE id = p.ultimo_id),
+               -- Sin checkpoint previo se parte del old_balance del primer movimiento
+               COALESCE(p.balance_checkpoint,
+                        (SELECT old_balance FROM account_movements WHERE id = p.primero_id)) + p.delta
+        FROM pendientes p
+    """, parametros)
+    return cur.rowcount
+
+def _checkpoint_tras_movimientos(conn: sqlite3.Connection, cuentas: List[int]) -> int:
+    """
+    Llamar dentro de la transacción que escribió movimientos: crea checkpoint
+    para las cuentas que ya juntaron SETTINGS["ledger_checkpoint_every"]
+    movimientos desde el último. Cada revisión es una búsqueda por índice que
+    recorre como mucho esos movimientos (no todo el libro).
+    """
+    if not _hay_libro_mayor(conn):
+        return 0
+    cada = SETTINGS["ledger_checkpoint_every"]
+    pendientes = []
+    for cuenta_id in dict.fromkeys(cuentas):
+        ultimo = conn.execute("""
+            SELECT movement_id, created_at FROM account_checkpoints
+            WHERE account_id = ?
+            ORDER BY movement_id DESC
+            LIMIT 1
+        """, (cuenta_id,)).fetchone()
+        desde_id, desde_fecha = (ultimo['movement_id'], ultimo['created_at']) if ultimo else (0, "")
+        # created_at >= acota el rango en idx_account_movements_account
+        nuevos = conn.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM account_movements
+                WHERE account_id = ? AND created_at >= ? AND id > ?
+                LIMIT ?
+            )
+        """, (cuenta_id, desde_fecha, desde_id, cada)).fetchone()[0]
+        if nuevos >= cada:
+            pendientes.append(cuenta_id)
+    return _crear_checkpoints_cuentas(conn, cada, pendientes) if pendientes else 0
+
+# ========================================
+# 🧬 MIGRACIONES DE ESQUEMA (PRAGMA user_version)
+# ========================================
+
+def _migracion_esquema_base(conn: sqlite3.Connection) -> None:
     """
-    ✅ SISTEMA DE ACTUALIZACIÓN AUTOMÁTICA DE ESQUEMA
-    Agrega columnas faltantes a tablas existentes SIN perder datos.
-    Se ejecuta cada vez que se inicia la aplicación.
+    Migración 1: tablas base + columna customer_name en recharges
+    (bases de datos creadas antes de que existiera ese campo).
     """
+    _create_tables(conn)
+
     cur = conn.cursor()
+    cur.execute("PRAGMA table_info(recharges)")
+    columnas = [col[1] for col in cur.fetchall()]  # Nombre de columnas
+    if 'customer_name' not in columnas:
+        cur.execute("ALTER TABLE recharges ADD COLUMN customer_name TEXT")
 
-    try:
-        # Verificar si la columna customer_name existe en recharges
-        cur.execute("PRAGMA table_info(recharges)")
-        columnas = [col[1] for col in cur.fetchall()]  # Nombre de columnas
+def _migracion_indices(conn: sqlite3.Connection) -> None:
+    """Migración 2: índices secundarios de _INDICES."""
+    _sincronizar_indices(conn)
 
-        if 'customer_name' not in columnas:
-            print("🔄 Actualizando esquema: agregando customer_name a recharges...")
-            cur.execute("ALTER TABLE recharges ADD COLUMN customer_name TEXT")
-            conn.commit()
-            print("✅ Columna customer_name agregada exitosamente")
+def _migracion_registro_cambios(conn: sqlite3.Connection) -> None:
+    """Migración 3: data_versions + change_log + triggers (y su índice)."""
+    _crear_registro_cambios(conn)
+    _sincronizar_indices(conn)
+
+def _migracion_resumen_diario(conn: sqlite3.Connection) -> None:
+    """Migración 4: daily_summary + triggers, llenado con el histórico."""
+    _crear_resumen_diario(conn)
+    _reconstruir_resumen_diario(conn)
+    _sincronizar_indices(conn)
+
+def _migracion_libro_mayor(conn: sqlite3.Connection) -> None:
+    """Migración 5: account_checkpoints + movimientos de solo inserción."""
+    _crear_libro_mayor(conn)
+    _crear_checkpoints_cuentas(conn, 1)  # Un checkpoint por cuenta con el histórico
+    _sincronizar_indices(conn)
+
+def _migracion_snapshots_comprimidos(conn: sqlite3.Connection) -> None:
+    """
+    Migración 6: snapshots comprimidos (data_blob + codec + base_snapshot_id).
+    Los snapshots existentes pasan de JSON en texto a zlib.
+    """
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(financial_snapshots)")
+    columnas = [col[1] for col in cur.fetchall()]
+    if 'data_blob' not in columnas:
+        cur.execute("ALTER TABLE financial_snapshots ADD COLUMN data_blob BLOB")
+    if 'codec' not in columnas:
+        cur.execute("ALTER TABLE financial_snapshots ADD COLUMN codec TEXT NOT NULL DEFAULT 'json'")
+    if 'base_snapshot_id' not in columnas:
+        cur.execute("ALTER TABLE financial_snapshots ADD COLUMN base_snapshot_id INTEGER")
+
+    filas = cur.execute(
+        "SELECT id, snapshot_data FROM financial_snapshots WHERE codec = 'json'"
+    ).fetchall()
+    cur.executemany(
+        "UPDATE financial_snapshots SET data_blob = ?, codec = 'zlib', snapshot_data = '' WHERE id = ?",
+        [(zlib.compress(f['snapshot_data'].encode('utf-8')), f['id']) for f in filas]
+    )
+    _sincronizar_indices(conn)
+
+# Pasos ordenados: (versión, descripción, función).
+# Para cambiar el esquema SOLO se agrega un paso al final de esta lista.
+_MIGRACIONES = [
+    (1, "Esquema base + customer_name en recharges", _migracion_esquema_base),
+    (2, "Índices por fecha, trabajador y país", _migracion_indices),
+    (3, "Registro de cambios por tabla (versiones de datos)", _migracion_registro_cambios),
+    (4, "Resumen diario materializado (daily_summary)", _migracion_resumen_diario),
+    (5, "Libro mayor de cuentas con checkpoints de balance", _migracion_libro_mayor),
+    (6, "Snapshots financieros comprimidos (zlib + delta)", _migracion_snapshots_comprimidos),
+]
+
+def _actualizar_esquema(conn: sqlite3.Connection) -> None:
+    """
+    ✅ SISTEMA DE MIGRACIONES VERSIONADAS
+    Lee PRAGMA user_version y aplica solo los pasos pendientes,
+    cada uno en su propia transacción (si falla, se revierte ese paso).
+    Con la versión al día el costo es UNA lectura de PRAGMA.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= _MIGRACIONES[-1][0]:
+        return  # ✅ Esquema al día: sin introspección
 
-    except Exception as e:
-        print(f"⚠️ Error al verificar/esquema recharges: {e}")
-        # No hacemos commit si hay error
+    if conn.in_transaction:
+        conn.commit()
 
-    # En el futuro, puedes agregar más verificaciones aquí:
-    # Ejemplo: verificar otras columnas nuevas, tablas nuevas, etc.
+    for numero, descripcion, paso in _MIGRACIONES:
+        if numero <= version:
+            continue
 
-    # try:
-    #     cur.execute("PRAGMA table_info(otra_tabla)")
-    #     columnas = [col[1] for col in cur.fetchall()]
-    #     if 'nueva_columna' not in columnas:
-    #         cur.execute("ALTER TABLE otra_tabla ADD COLUMN nueva_columna TEXT")
-    #         conn.commit()
-    # except Exception as e:
-    #     print(f"⚠️ Error al verificar otra_tabla: {e}")
+        print(f"🔄 Migración {numero}: {descripcion}...")
+        try:
+            conn.execute("BEGIN")
+            paso(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+            print(f"✅ Migración {numero} aplicada")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Error en migración {numero} ({descripcion}): {e}")
+            break  # No se aplican pasos posteriores sobre un esquema incompleto
 
 # ========================================
 # 🚀 INICIALIZAR DESDE main.py
@@ -279,297 +840,388 @@ def _actualizar_esquema(conn: sqlite3.Connection) -> None:
 
 def inicializar_base_de_datos() -> None:
     """
-    Crea app.db y todas las tablas necesarias si no existen.
-    Actualiza el esquema de tablas existentes.
+    Crea app.db y aplica las migraciones de esquema pendientes.
+    Aplica el perfil de PRAGMAs (WAL, caché, mmap) de SETTINGS.
     Se llama una sola vez al iniciar la aplicación.
     """
-    conn = get_connection()
-    _create_tables(conn)       # ✅ Crea tablas si no existen
-    _actualizar_esquema(conn)  # ✅ Actualiza tablas existentes (NUEVO)
-    conn.close()
+    with conexion() as conn:
+        modo = _aplicar_modo_diario(conn)  # ✅ WAL + PRAGMAs del perfil configurado
+        if SETTINGS.get("debug"):
+            print(f"🗄️ SQLite: perfil '{_nombre_perfil_pragmas()}', journal_mode={modo}")
+        _actualizar_esquema(conn)  # ✅ Crea/migra tablas según PRAGMA user_version
+        _podar_registro_cambios(conn)
+
+# ========================================
+# 🔄 VERSIONES DE DATOS (REFRESCO INCREMENTAL)
+# ========================================
+
+def obtener_version_datos(*tablas: str) -> int:
+    """
+    Versión de datos (monotónica) de las tablas indicadas: la mayor entre ellas.
+    Sin argumentos retorna la versión global. Si no cambió, no hace falta recargar.
+    """
+    with conexion() as conn:
+        if tablas:
+            marcas = ", ".join("?" for _ in tablas)
+            row = conn.execute(
+                f"SELECT COALESCE(MAX(version), 0) FROM data_versions WHERE table_name IN ({marcas})",
+                tablas
+            ).fetchone()
+        else:
+            row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM data_versions").fetchone()
+    return row[0]
+
+def obtener_cambios(tabla: str, desde_version: int) -> Optional[Dict[str, Any]]:
+    """
+    Filas de 'tabla' que cambiaron después de 'desde_version'.
+    Retorna {'version', 'cambiados': [ids], 'eliminados': [ids]}
+    o None si el registro ya fue podado (hay que recargar todo).
+    """
+    with conexion() as conn:
+        version = conn.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM data_versions WHERE table_name = ?", (tabla,)
+        ).fetchone()[0]
+        if version <= desde_version:
+            return {'version': version, 'cambiados': [], 'eliminados': []}
+
+        minima = conn.execute("SELECT MIN(version) FROM change_log").fetchone()[0]
+        if minima is None or minima > desde_version + 1:
+            return None
+
+        cur = conn.execute(
+            "SELECT row_id, operation FROM change_log "
+            "WHERE table_name = ? AND version > ? ORDER BY version",
+            (tabla, desde_version)
+        )
+        ultima_operacion = {row_id: operacion for row_id, operacion in cur.fetchall()}
+
+    return {
+        'version': version,
+        'cambiados': [i for i, op in ultima_operacion.items() if op != 'D'],
+        'eliminados': [i for i, op in ultima_operacion.items() if op == 'D'],
+    }
 
 # ========================================
 # 🏢 TRABAJADORES (CRUD)
 # ========================================
 
 def agregar_trabajador(nombre: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO workers (name) VALUES (?)", (nombre,))
-    conn.commit()
-    worker_id = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO workers (name) VALUES (?)", (nombre,))
+        worker_id = cur.lastrowid
+    catalogos.invalidar("workers")
     return worker_id
 
 def editar_trabajador(worker_id: int, nuevo_nombre: str) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE workers SET name = ? WHERE id = ?", (nuevo_nombre, worker_id))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE workers SET name = ? WHERE id = ?", (nuevo_nombre, worker_id))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("workers")
     return ok
 
 def eliminar_trabajador(worker_id: int) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE workers SET is_active = 0 WHERE id = ?", (worker_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE workers SET is_active = 0 WHERE id = ?", (worker_id,))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("workers")
     return ok
 
-def listar_trabajadores_activos() -> list[dict[str, Any]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name FROM workers WHERE is_active = 1 ORDER BY name;"
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+def _consultar_trabajadores() -> list[dict[str, Any]]:
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, name FROM workers WHERE is_active = 1 ORDER BY name;"
+        )
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_trabajadores_activos() -> list[dict[str, Any]]:
+    return [dict(f) for f in obtener_catalogo("trabajadores").filas]
+
 # ========================================
 # 🌍 PAÍSES (CRUD)
 # ========================================
 
 def agregar_pais(nombre: str, currency_code: str = "USD") -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO countries (name, currency_code) VALUES (?, ?)",
-        (nombre, currency_code),
-    )
-    conn.commit()
-    country_id = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO countries (name, currency_code) VALUES (?, ?)",
+            (nombre, currency_code),
+        )
+        country_id = cur.lastrowid
+    catalogos.invalidar("countries")
     return country_id
 
 def editar_pais(country_id: int, nuevo_nombre: str, nuevo_currency: Optional[str] = None) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    if nuevo_currency:
-        cur.execute(
-            "UPDATE countries SET name = ?, currency_code = ? WHERE id = ?",
-            (nuevo_nombre, nuevo_currency, country_id),
-        )
-    else:
-        cur.execute(
-            "UPDATE countries SET name = ? WHERE id = ?",
-            (nuevo_nombre, country_id),
-        )
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        if nuevo_currency:
+            cur.execute(
+                "UPDATE countries SET name = ?, currency_code = ? WHERE id = ?",
+                (nuevo_nombre, nuevo_currency, country_id),
+            )
+        else:
+            cur.execute(
+                "UPDATE countries SET name = ? WHERE id = ?",
+                (nuevo_nombre, country_id),
+            )
+        ok = cur.rowcount > 0
+    catalogos.invalidar("countries")
     return ok
 
 def eliminar_pais(country_id: int) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE countries SET is_active = 0 WHERE id = ?", (country_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE countries SET is_active = 0 WHERE id = ?", (country_id,))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("countries")
     return ok
 
-def listar_paises_activos() -> list[dict[str, Any]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name, currency_code FROM countries WHERE is_active = 1 ORDER BY name;"
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+def _consultar_paises() -> list[dict[str, Any]]:
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, name, currency_code FROM countries WHERE is_active = 1 ORDER BY name;"
+        )
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_paises_activos() -> list[dict[str, Any]]:
+    return [dict(f) for f in obtener_catalogo("paises").filas]
+
 # ========================================
 # 💳 MÉTODOS DE PAGO (CRUD)
 # ========================================
 
 def agregar_metodo_pago(nombre: str, tipo: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO payment_methods (name, type) VALUES (?, ?)",
-        (nombre, tipo),
-    )
-    conn.commit()
-    mid = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO payment_methods (name, type) VALUES (?, ?)",
+            (nombre, tipo),
+        )
+        mid = cur.lastrowid
+    catalogos.invalidar("payment_methods")
     return mid
 
 def editar_metodo_pago(mp_id: int, nuevo_nombre: str, nuevo_tipo: str) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE payment_methods SET name = ?, type = ? WHERE id = ?",
-        (nuevo_nombre, nuevo_tipo, mp_id)
-    )
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE payment_methods SET name = ?, type = ? WHERE id = ?",
+            (nuevo_nombre, nuevo_tipo, mp_id)
+        )
+        ok = cur.rowcount > 0
+    catalogos.invalidar("payment_methods")
     return ok
 
 def eliminar_metodo_pago(mp_id: int) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE payment_methods SET is_active = 0 WHERE id = ?", (mp_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE payment_methods SET is_active = 0 WHERE id = ?", (mp_id,))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("payment_methods")
     return ok
 
-def listar_metodos_pago_activos() -> list[dict[str, Any]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name, type FROM payment_methods WHERE is_active = 1 ORDER BY name;"
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+def _consultar_metodos_pago() -> list[dict[str, Any]]:
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, name, type FROM payment_methods WHERE is_active = 1 ORDER BY name;"
+        )
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_metodos_pago_activos() -> list[dict[str, Any]]:
+    return [dict(f) for f in obtener_catalogo("metodos_pago").filas]
+
 # ========================================
 # 🎮 JUEGOS (CRUD)
 # ========================================
 
 def agregar_juego(nombre: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO games (name) VALUES (?)", (nombre,))
-    conn.commit()
-    gid = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO games (name) VALUES (?)", (nombre,))
+        gid = cur.lastrowid
+    catalogos.invalidar("games")
     return gid
 
 def editar_juego(game_id: int, nuevo_nombre: str) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE games SET name = ? WHERE id = ?", (nuevo_nombre, game_id))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE games SET name = ? WHERE id = ?", (nuevo_nombre, game_id))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("games")
     return ok
 
 def eliminar_juego(game_id: int) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE games SET is_active = 0 WHERE id = ?", (game_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE games SET is_active = 0 WHERE id = ?", (game_id,))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("games")
     return ok
 
-def listar_juegos_activos() -> list[dict[str, Any]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM games WHERE is_active = 1 ORDER BY name;")
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+def _consultar_juegos() -> list[dict[str, Any]]:
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, name FROM games WHERE is_active = 1 ORDER BY name;")
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_juegos_activos() -> list[dict[str, Any]]:
+    return [dict(f) for f in obtener_catalogo("juegos").filas]
+
 # ========================================
 # 📦 PRODUCTOS (CRUD)
 # ========================================
 
 def agregar_producto(nombre: str, game_id: Optional[int], precio_base_usd: float) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO products (name, game_id, price_base_usd) VALUES (?, ?, ?)",
-        (nombre, game_id, precio_base_usd),
-    )
-    conn.commit()
-    pid = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO products (name, game_id, price_base_usd) VALUES (?, ?, ?)",
+            (nombre, game_id, precio_base_usd),
+        )
+        pid = cur.lastrowid
+    catalogos.invalidar("products")
     return pid
 
 def editar_producto(prod_id: int, nuevo_nombre: str, nuevo_game_id: Optional[int], nuevo_precio: float) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE products SET name = ?, game_id = ?, price_base_usd = ? WHERE id = ?",
-        (nuevo_nombre, nuevo_game_id, nuevo_precio, prod_id)
-    )
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE products SET name = ?, game_id = ?, price_base_usd = ? WHERE id = ?",
+            (nuevo_nombre, nuevo_game_id, nuevo_precio, prod_id)
+        )
+        ok = cur.rowcount > 0
+    catalogos.invalidar("products")
     return ok
 
 def eliminar_producto(prod_id: int) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE products SET is_active = 0 WHERE id = ?", (prod_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE products SET is_active = 0 WHERE id = ?", (prod_id,))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("products")
     return ok
 
-def listar_productos_activos() -> list[dict[str, Any]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT p.id, p.name, p.price_base_usd, g.name AS game_name
-        FROM products p
-        LEFT JOIN games g ON p.game_id = g.id
-        WHERE p.is_active = 1
-        ORDER BY p.name;
-    """)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+def _consultar_productos() -> list[dict[str, Any]]:
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT p.id, p.name, p.game_id, p.price_base_usd, g.name AS game_name
+            FROM products p
+            LEFT JOIN games g ON p.game_id = g.id
+            WHERE p.is_active = 1
+            ORDER BY p.name;
+        """)
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_productos_activos() -> list[dict[str, Any]]:
+    return [dict(f) for f in obtener_catalogo("productos").filas]
+
 # ========================================
 # 💱 MONEDAS (CRUD)
 # ========================================
 
 def agregar_moneda(code: str, name: str) -> int:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO currencies (code, name) VALUES (?, ?)",
-        (code.upper(), name),
-    )
-    conn.commit()
-    mid = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO currencies (code, name) VALUES (?, ?)",
+            (code.upper(), name),
+        )
+        mid = cur.lastrowid
+    catalogos.invalidar("currencies")
     return mid
 
 def editar_moneda(currency_id: int, nuevo_codigo: str, nuevo_nombre: str) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE currencies SET code = ?, name = ? WHERE id = ?",
-        (nuevo_codigo.upper(), nuevo_nombre, currency_id)
-    )
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE currencies SET code = ?, name = ? WHERE id = ?",
+            (nuevo_codigo.upper(), nuevo_nombre, currency_id)
+        )
+        ok = cur.rowcount > 0
+    catalogos.invalidar("currencies")
     return ok
 
 def eliminar_moneda(currency_id: int) -> bool:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE currencies SET is_active = 0 WHERE id = ?", (currency_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE currencies SET is_active = 0 WHERE id = ?", (currency_id,))
+        ok = cur.rowcount > 0
+    catalogos.invalidar("currencies")
     return ok
 
-def listar_monedas_activas() -> list[dict[str, Any]]:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, code, name FROM currencies WHERE is_active = 1 ORDER BY code;"
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+def _consultar_monedas() -> list[dict[str, Any]]:
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, code, name FROM currencies WHERE is_active = 1 ORDER BY code;"
+        )
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_monedas_activas() -> list[dict[str, Any]]:
+    return [dict(f) for f in obtener_catalogo("monedas").filas]
+
+# ========================================
+# 🗂️ CACHÉ DE CATÁLOGOS
+# ========================================
+
+# nombre -> (tablas de las que depende, cargador, campo usado como nombre)
+_CATALOGOS = {
+    "trabajadores": (("workers",), _consultar_trabajadores, "name"),
+    "paises": (("countries",), _consultar_paises, "name"),
+    "metodos_pago": (("payment_methods",), _consultar_metodos_pago, "name"),
+    "juegos": (("games",), _consultar_juegos, "name"),
+    "productos": (("products", "games"), _consultar_productos, "name"),
+    "monedas": (("currencies",), _consultar_monedas, "code"),
+}
+
+def obtener_catalogo(nombre: str) -> catalogos.Catalogo:
+    """
+    Catálogo en memoria ('trabajadores', 'paises', 'metodos_pago', 'juegos',
+    'productos', 'monedas') con .filas, .por_id y .por_nombre.
+    No modificar las filas devueltas: son compartidas por toda la app.
+    """
+    tablas, cargador, clave_nombre = _CATALOGOS[nombre]
+    return catalogos.obtener(nombre, tablas, cargador,
+                             lambda: obtener_version_datos(*tablas),
+                             clave_nombre)
+
 # ========================================
 # 🔁 RECARGAS: INSERCIÓN BÁSICA EN USD
 # ========================================
 
+_SQL_INSERTAR_RECARGA = """
+    INSERT INTO recharges (
+        date, worker_id, country_id, game_id, product_id,
+        payment_method_id, amount_received_usd, cost_usd,
+        seller_commission_usd, profit_usd, customer_name, notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _valores_recarga(date_str, worker_id, country_id, payment_method_id,
+                     amount_received_usd, cost_usd, seller_commission_usd,
+                     game_id=None, product_id=None, customer_name=None, notes=None) -> tuple:
+    """Parámetros de _SQL_INSERTAR_RECARGA con la ganancia ya calculada
+    (compartido con el importador masivo)."""
+    profit_usd = amount_received_usd - cost_usd - seller_commission_usd
+    return (
+        date_str, worker_id, country_id, game_id, product_id,
+        payment_method_id, amount_received_usd, cost_usd,
+        seller_commission_usd, profit_usd, customer_name, notes
+    )
+
 def agregar_recarga(
     date_str: str,
     worker_id: int,
@@ -587,66 +1239,109 @@ def agregar_recarga(
     Crea una recarga calculando ganancia en USD:
     ganancia = recibido - costo - comisión_vendedor
     """
-    profit_usd = amount_received_usd - cost_usd - seller_commission_usd
-
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO recharges (
-            date, worker_id, country_id, game_id, product_id,
-            payment_method_id, amount_received_usd, cost_usd,
-            seller_commission_usd, profit_usd, customer_name, notes  -- ✅ Agregado customer_name
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)  -- ✅ Un parámetro más
-    """, (
-        date_str, worker_id, country_id, game_id, product_id,
-        payment_method_id, amount_received_usd, cost_usd,
-        seller_commission_usd, profit_usd, customer_name, notes  # ✅ Agregado customer_name
-    ))
-    conn.commit()
-    rid = cur.lastrowid
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_INSERTAR_RECARGA, _valores_recarga(
+            date_str, worker_id, country_id, payment_method_id,
+            amount_received_usd, cost_usd, seller_commission_usd,
+            game_id, product_id, customer_name, notes  # ✅ Incluye customer_name
+        ))
+        rid = cur.lastrowid
     return rid
 
 # ========================================
 # 🔁 RECARGAS: FUNCIONES COMPLETAS
 # ========================================
 
+_SQL_RECARGAS_DETALLE = """
+    SELECT
+        r.*,
+        w.name as worker_name,
+        c.name as country_name,
+        g.name as game_name,
+        p.name as product_name,
+        pm.name as payment_method_name
+    FROM recharges r
+    LEFT JOIN workers w ON r.worker_id = w.id
+    LEFT JOIN countries c ON r.country_id = c.id
+    LEFT JOIN games g ON r.game_id = g.id
+    LEFT JOIN products p ON r.product_id = p.id
+    LEFT JOIN payment_methods pm ON r.payment_method_id = pm.id
+"""
+
 def listar_recargas() -> list[dict[str, Any]]:
     """
     Lista todas las recargas con información completa.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            r.*,
-            w.name as worker_name,
-            c.name as country_name,
-            g.name as game_name,
-            p.name as product_name,
-            pm.name as payment_method_name
-        FROM recharges r
-        LEFT JOIN workers w ON r.worker_id = w.id
-        LEFT JOIN countries c ON r.country_id = c.id
-        LEFT JOIN games g ON r.game_id = g.id
-        LEFT JOIN products p ON r.product_id = p.id
-        LEFT JOIN payment_methods pm ON r.payment_method_id = pm.id
-        ORDER BY r.date DESC, r.id DESC
-    """)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_RECARGAS_DETALLE + " ORDER BY r.date DESC, r.id DESC")
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def _pagina_keyset(sql_base: str, limite: int,
+                   cursor: Optional[Tuple[str, int]]) -> Dict[str, Any]:
+    """
+    Ejecuta una página keyset sobre (r.date, r.id) descendente.
+    Retorna {'filas': [...], 'cursor': (date, id) | None}; cursor None = no hay más.
+    """
+    params: list = []
+    where = ""
+    if cursor is not None:
+        where = " WHERE (r.date, r.id) < (?, ?)"
+        params.extend(cursor)
+
+    with conexion() as conn:
+        cur = conn.cursor()
+        # Se pide una fila extra para saber si existe una página siguiente
+        cur.execute(f"{sql_base}{where} ORDER BY r.date DESC, r.id DESC LIMIT ?",
+                    params + [limite + 1])
+        filas = [dict(r) for r in cur.fetchall()]
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = (filas[-1]['date'], filas[-1]['id'])
+    return {'filas': filas, 'cursor': siguiente}
+
+def _listar_por_ids(sql_base: str, ids: list[int]) -> list[dict[str, Any]]:
+    """Filas de detalle para una lista de ids (en bloques de 500 parámetros)."""
+    filas = []
+    with conexion() as conn:
+        for i in range(0, len(ids), 500):
+            bloque = ids[i:i + 500]
+            marcas = ", ".join("?" for _ in bloque)
+            cur = conn.execute(f"{sql_base} WHERE r.id IN ({marcas})", bloque)
+            filas.extend(dict(r) for r in cur.fetchall())
+    return filas
+
+def listar_recargas_por_ids(ids: list[int]) -> list[dict[str, Any]]:
+    """Recargas con información completa para los ids dados (refresco incremental)."""
+    return _listar_por_ids(_SQL_RECARGAS_DETALLE, ids)
+
+def listar_recargas_pagina(limite: int = 200,
+                           cursor: Optional[Tuple[str, int]] = None) -> Dict[str, Any]:
+    """
+    Lista una página de recargas (más recientes primero) usando paginación keyset.
+    Pasar el 'cursor' devuelto para obtener la página siguiente.
+    """
+    return _pagina_keyset(_SQL_RECARGAS_DETALLE, limite, cursor)
+
+def contar_recargas_del_dia(fecha: str) -> int:
+    """Cuenta las recargas de un día (YYYY-MM-DD) sin cargar las filas."""
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM recharges WHERE date = ?", (fecha,))
+        return cur.fetchone()[0]
+
 def eliminar_recarga(recarga_id: int) -> bool:
     """
     Elimina físicamente una recarga (DELETE).
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM recharges WHERE id = ?", (recarga_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM recharges WHERE id = ?", (recarga_id,))
+        ok = cur.rowcount > 0
     return ok
 
 def editar_recarga(
@@ -668,62 +1363,45 @@ def editar_recarga(
     """
     profit_usd = amount_received_usd - cost_usd - seller_commission_usd
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE recharges SET
-            date = ?, worker_id = ?, country_id = ?, game_id = ?, product_id = ?,
-            payment_method_id = ?, amount_received_usd = ?, cost_usd = ?,
-            seller_commission_usd = ?, profit_usd = ?, customer_name = ?, notes = ?  -- ✅ Agregado customer_name
-        WHERE id = ?
-    """, (
-        date_str, worker_id, country_id, game_id, product_id,
-        payment_method_id, amount_received_usd, cost_usd,
-        seller_commission_usd, profit_usd, customer_name, notes, recarga_id  # ✅ Agregado customer_name
-    ))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE recharges SET
+                date = ?, worker_id = ?, country_id = ?, game_id = ?, product_id = ?,
+                payment_method_id = ?, amount_received_usd = ?, cost_usd = ?,
+                seller_commission_usd = ?, profit_usd = ?, customer_name = ?, notes = ?  -- ✅ Agregado customer_name
+            WHERE id = ?
+        """, (
+            date_str, worker_id, country_id, game_id, product_id,
+            payment_method_id, amount_received_usd, cost_usd,
+            seller_commission_usd, profit_usd, customer_name, notes, recarga_id  # ✅ Agregado customer_name
+        ))
+        ok = cur.rowcount > 0
     return ok
 
 # ========================================
 # 🔁 REMESAS: NUEVA ESTRUCTURA COMPLETA
 # ========================================
 
-def agregar_remesa(
-    date_str: str,
-    worker_id: int,
-    country_id: int,
-    payment_method_id: int,
-    currency_id: int,
-    sender_name: str,
-    sender_phone: str,
-    amount_origin: float,
-    rate_origin_to_bs: float,
-    receiver_name: str,
-    receiver_phone: str,
-    rate_buy_usdt: float,
-    rate_sell_usdt_bs: float,
-    seller_commission_usdt: float,
-    notes: Optional[str] = None,
-) -> int:
-    """
-    Registra una remesa con la nueva lógica de conversión:
-
-    PASO 1: Conversión a Bolívares
-    - amount_destiny_bs = amount_origin * rate_origin_to_bs
-
-    PASO 2: Conversión a USDT (COMPRA)
-    - usdt_received = amount_origin / rate_buy_usdt
-
-    PASO 3: Conversión USDT a Bs (VENTA)
-    - usdt_spent = amount_destiny_bs / rate_sell_usdt_bs
-
-    PASO 4: Ganancias
-    - profit_gross = usdt_received - usdt_spent
-    - profit_net = profit_gross - seller_commission_usdt
-    """
+_SQL_INSERTAR_REMESA = """
+    INSERT INTO remittances (
+        date, worker_id, country_id, payment_method_id, currency_id,
+        sender_name, sender_phone,
+        amount_origin, rate_origin_to_bs, amount_destiny_bs,
+        receiver_name, receiver_phone,
+        rate_buy_usdt, usdt_received,
+        rate_sell_usdt_bs, usdt_spent,
+        profit_gross_usdt, seller_commission_usdt, profit_net_usdt,
+        notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
+def _valores_remesa(date_str, worker_id, country_id, payment_method_id, currency_id,
+                    sender_name, sender_phone, amount_origin, rate_origin_to_bs,
+                    receiver_name, receiver_phone, rate_buy_usdt, rate_sell_usdt_bs,
+                    seller_commission_usdt, notes=None) -> tuple:
+    """Parámetros de _SQL_INSERTAR_REMESA con las conversiones ya calculadas
+    (compartido con el importador masivo)."""
     # CÁLCULOS AUTOMÁTICOS
     amount_destiny_bs = amount_origin * rate_origin_to_bs
     usdt_received = amount_origin / rate_buy_usdt
@@ -731,20 +1409,7 @@ def agregar_remesa(
     profit_gross_usdt = usdt_received - usdt_spent
     profit_net_usdt = profit_gross_usdt - seller_commission_usdt
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO remittances (
-            date, worker_id, country_id, payment_method_id, currency_id,
-            sender_name, sender_phone,
-            amount_origin, rate_origin_to_bs, amount_destiny_bs,
-            receiver_name, receiver_phone,
-            rate_buy_usdt, usdt_received,
-            rate_sell_usdt_bs, usdt_spent,
-            profit_gross_usdt, seller_commission_usdt, profit_net_usdt,
-            notes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    return (
         date_str, worker_id, country_id, payment_method_id, currency_id,
         sender_name, sender_phone,
         amount_origin, rate_origin_to_bs, amount_destiny_bs,
@@ -753,10 +1418,51 @@ def agregar_remesa(
         rate_sell_usdt_bs, usdt_spent,
         profit_gross_usdt, seller_commission_usdt, profit_net_usdt,
         notes
-    ))
-    conn.commit()
-    rid = cur.lastrowid
-    conn.close()
+    )
+
+def agregar_remesa(
+    date_str: str,
+    worker_id: int,
+    country_id: int,
+    payment_method_id: int,
+    currency_id: int,
+    sender_name: str,
+    sender_phone: str,
+    amount_origin: float,
+    rate_origin_to_bs: float,
+    receiver_name: str,
+    receiver_phone: str,
+    rate_buy_usdt: float,
+    rate_sell_usdt_bs: float,
+    seller_commission_usdt: float,
+    notes: Optional[str] = None,
+) -> int:
+    """
+    Registra una remesa con la nueva lógica de conversión:
+
+    PASO 1: Conversión a Bolívares
+    - amount_destiny_bs = amount_origin * rate_origin_to_bs
+
+    PASO 2: Conversión a USDT (COMPRA)
+    - usdt_received = amount_origin / rate_buy_usdt
+
+    PASO 3: Conversión USDT a Bs (VENTA)
+    - usdt_spent = amount_destiny_bs / rate_sell_usdt_bs
+
+    PASO 4: Ganancias
+    - profit_gross = usdt_received - usdt_spent
+    - profit_net = profit_gross - seller_commission_usdt
+    """
+
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_INSERTAR_REMESA, _valores_remesa(
+            date_str, worker_id, country_id, payment_method_id, currency_id,
+            sender_name, sender_phone, amount_origin, rate_origin_to_bs,
+            receiver_name, receiver_phone, rate_buy_usdt, rate_sell_usdt_bs,
+            seller_commission_usdt, notes
+        ))
+        rid = cur.lastrowid
     return rid
 
 def editar_remesa(
@@ -787,71 +1493,86 @@ def editar_remesa(
     profit_gross_usdt = usdt_received - usdt_spent
     profit_net_usdt = profit_gross_usdt - seller_commission_usdt
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE remittances SET
-            date = ?, worker_id = ?, country_id = ?, payment_method_id = ?, currency_id = ?,
-            sender_name = ?, sender_phone = ?,
-            amount_origin = ?, rate_origin_to_bs = ?, amount_destiny_bs = ?,
-            receiver_name = ?, receiver_phone = ?,
-            rate_buy_usdt = ?, usdt_received = ?,
-            rate_sell_usdt_bs = ?, usdt_spent = ?,
-            profit_gross_usdt = ?, seller_commission_usdt = ?, profit_net_usdt = ?,
-            notes = ?
-        WHERE id = ?
-    """, (
-        date_str, worker_id, country_id, payment_method_id, currency_id,
-        sender_name, sender_phone,
-        amount_origin, rate_origin_to_bs, amount_destiny_bs,
-        receiver_name, receiver_phone,
-        rate_buy_usdt, usdt_received,
-        rate_sell_usdt_bs, usdt_spent,
-        profit_gross_usdt, seller_commission_usdt, profit_net_usdt,
-        notes, remesa_id
-    ))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE remittances SET
+                date = ?, worker_id = ?, country_id = ?, payment_method_id = ?, currency_id = ?,
+                sender_name = ?, sender_phone = ?,
+                amount_origin = ?, rate_origin_to_bs = ?, amount_destiny_bs = ?,
+                receiver_name = ?, receiver_phone = ?,
+                rate_buy_usdt = ?, usdt_received = ?,
+                rate_sell_usdt_bs = ?, usdt_spent = ?,
+                profit_gross_usdt = ?, seller_commission_usdt = ?, profit_net_usdt = ?,
+                notes = ?
+            WHERE id = ?
+        """, (
+            date_str, worker_id, country_id, payment_method_id, currency_id,
+            sender_name, sender_phone,
+            amount_origin, rate_origin_to_bs, amount_destiny_bs,
+            receiver_name, receiver_phone,
+            rate_buy_usdt, usdt_received,
+            rate_sell_usdt_bs, usdt_spent,
+            profit_gross_usdt, seller_commission_usdt, profit_net_usdt,
+            notes, remesa_id
+        ))
+        ok = cur.rowcount > 0
     return ok
 
 def eliminar_remesa(remesa_id: int) -> bool:
     """
     Elimina físicamente una remesa (DELETE).
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM remittances WHERE id = ?", (remesa_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM remittances WHERE id = ?", (remesa_id,))
+        ok = cur.rowcount > 0
     return ok
 
+_SQL_REMESAS_DETALLE = """
+    SELECT
+        r.*,
+        w.name as worker_name,
+        c.name as country_name,
+        pm.name as payment_method_name,
+        cu.code as currency_code,
+        cu.name as currency_name
+    FROM remittances r
+    LEFT JOIN workers w ON r.worker_id = w.id
+    LEFT JOIN countries c ON r.country_id = c.id
+    LEFT JOIN payment_methods pm ON r.payment_method_id = pm.id
+    LEFT JOIN currencies cu ON r.currency_id = cu.id
+"""
+
 def listar_remesas() -> list[dict[str, Any]]:
     """
     Lista todas las remesas con información completa.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            r.*,
-            w.name as worker_name,
-            c.name as country_name,
-            pm.name as payment_method_name,
-            cu.code as currency_code,
-            cu.name as currency_name
-        FROM remittances r
-        LEFT JOIN workers w ON r.worker_id = w.id
-        LEFT JOIN countries c ON r.country_id = c.id
-        LEFT JOIN payment_methods pm ON r.payment_method_id = pm.id
-        LEFT JOIN currencies cu ON r.currency_id = cu.id
-        ORDER BY r.date DESC, r.id DESC
-    """)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_REMESAS_DETALLE + " ORDER BY r.date DESC, r.id DESC")
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+def listar_remesas_por_ids(ids: list[int]) -> list[dict[str, Any]]:
+    """Remesas con información completa para los ids dados (refresco incremental)."""
+    return _listar_por_ids(_SQL_REMESAS_DETALLE, ids)
+
+def listar_remesas_pagina(limite: int = 200,
+                          cursor: Optional[Tuple[str, int]] = None) -> Dict[str, Any]:
+    """
+    Lista una página de remesas (más recientes primero) usando paginación keyset.
+    Pasar el 'cursor' devuelto para obtener la página siguiente.
+    """
+    return _pagina_keyset(_SQL_REMESAS_DETALLE, limite, cursor)
+
+def contar_remesas_del_dia(fecha: str) -> int:
+    """Cuenta las remesas de un día (YYYY-MM-DD) sin cargar las filas."""
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM remittances WHERE date = ?", (fecha,))
+        return cur.fetchone()[0]
+
 # ========================================
 # ✅ NUEVO: GESTIÓN DE SALDOS FINANCIEROS
 # ========================================
@@ -868,32 +1589,29 @@ def agregar_cuenta_financiera(
     """
     Agrega una nueva cuenta financiera (ej: Banco Venezuela, Airtm, Binance).
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    # Verificar si ya existe
-    cur.execute("SELECT id FROM financial_accounts WHERE name = ?", (nombre,))
-    if cur.fetchone():
-        conn.close()
-        raise ValueError(f"Ya existe una cuenta con el nombre '{nombre}'")
+        # Verificar si ya existe
+        cur.execute("SELECT id FROM financial_accounts WHERE name = ?", (nombre,))
+        if cur.fetchone():
+            raise ValueError(f"Ya existe una cuenta con el nombre '{nombre}'")
 
-    cur.execute("""
-        INSERT INTO financial_accounts (name, type, balance, currency, tags, notes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (nombre, tipo, balance, currency, tags, notas))
+        cur.execute("""
+            INSERT INTO financial_accounts (name, type, balance, currency, tags, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (nombre, tipo, balance, currency, tags, notas))
 
-    conn.commit()
-    cuenta_id = cur.lastrowid
+        cuenta_id = cur.lastrowid
 
-    # Registrar movimiento inicial
-    if balance != 0:
-        cur.execute("""
-            INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
-            VALUES (?, 'deposit', ?, 0.0, ?, 'Saldo inicial')
-        """, (cuenta_id, balance, balance))
-        conn.commit()
+        # Registrar movimiento inicial
+        if balance != 0:
+            cur.execute("""
+                INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
+                VALUES (?, 'deposit', ?, 0.0, ?, 'Saldo inicial')
+            """, (cuenta_id, balance, balance))
+            _checkpoint_tras_movimientos(conn, [cuenta_id])
 
-    conn.close()
     return cuenta_id
 
 def editar_cuenta_financiera(
@@ -908,169 +1626,223 @@ def editar_cuenta_financiera(
     """
     Edita una cuenta financiera existente.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # Obtener datos actuales
-    cur.execute("SELECT name, balance FROM financial_accounts WHERE id = ?", (cuenta_id,))
-    cuenta = cur.fetchone()
-    if not cuenta:
-        conn.close()
-        return False
-
-    # Construir query dinámica
-    campos = []
-    valores = []
-
-    if nuevo_nombre is not None:
-        # Verificar que el nuevo nombre no exista en otra cuenta
-        cur.execute("SELECT id FROM financial_accounts WHERE name = ? AND id != ?", (nuevo_nombre, cuenta_id))
-        if cur.fetchone():
-            conn.close()
-            raise ValueError(f"Ya existe otra cuenta con el nombre '{nuevo_nombre}'")
-        campos.append("name = ?")
-        valores.append(nuevo_nombre)
-
-    if nuevo_tipo is not None:
-        campos.append("type = ?")
-        valores.append(nuevo_tipo)
-
-    if nuevo_balance is not None:
-        old_balance = cuenta['balance']
-        campos.append("balance = ?")
-        valores.append(nuevo_balance)
-
-        # Registrar movimiento si cambió el balance
-        if old_balance != nuevo_balance:
-            tipo_mov = "deposit" if nuevo_balance > old_balance else "withdrawal"
-            monto = abs(nuevo_balance - old_balance)
-            desc = "Ajuste manual de saldo"
-
-            cur.execute("""
-                INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (cuenta_id, tipo_mov, monto, old_balance, nuevo_balance, desc))
-
-    if nueva_currency is not None:
-        campos.append("currency = ?")
-        valores.append(nueva_currency)
-
-    if nuevos_tags is not None:
-        campos.append("tags = ?")
-        valores.append(nuevos_tags)
-
-    if nuevas_notas is not None:
-        campos.append("notes = ?")
-        valores.append(nuevas_notas)
-
-    # Agregar updated_at
-    campos.append("updated_at = datetime('now')")
-
-    if campos:
-        valores.append(cuenta_id)
-        query = f"UPDATE financial_accounts SET {', '.join(campos)} WHERE id = ?"
-        cur.execute(query, valores)
-        conn.commit()
-
-    ok = cur.rowcount > 0
-    conn.close()
+    with transaccion_inmediata() as conn:
+        cur = conn.cursor()
+
+        # Obtener datos actuales
+        cur.execute("SELECT name, balance FROM financial_accounts WHERE id = ?", (cuenta_id,))
+        cuenta = cur.fetchone()
+        if not cuenta:
+            return False
+
+        # Construir query dinámica
+        campos = []
+        valores = []
+
+        if nuevo_nombre is not None:
+            # Verificar que el nuevo nombre no exista en otra cuenta
+            cur.execute("SELECT id FROM financial_accounts WHERE name = ? AND id != ?", (nuevo_nombre, cuenta_id))
+            if cur.fetchone():
+                raise ValueError(f"Ya existe otra cuenta con el nombre '{nuevo_nombre}'")
+            campos.append("name = ?")
+            valores.append(nuevo_nombre)
+
+        if nuevo_tipo is not None:
+            campos.append("type = ?")
+            valores.append(nuevo_tipo)
+
+        if nuevo_balance is not None:
+            old_balance = cuenta['balance']
+            campos.append("balance = ?")
+            valores.append(nuevo_balance)
+
+            # Registrar movimiento si cambió el balance
+            if old_balance != nuevo_balance:
+                tipo_mov = "deposit" if nuevo_balance > old_balance else "withdrawal"
+                monto = abs(nuevo_balance - old_balance)
+                desc = "Ajuste manual de saldo"
+
+                cur.execute("""
+                    INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (cuenta_id, tipo_mov, monto, old_balance, nuevo_balance, desc))
+                _checkpoint_tras_movimientos(conn, [cuenta_id])
+
+        if nueva_currency is not None:
+            campos.append("currency = ?")
+            valores.append(nueva_currency)
+
+        if nuevos_tags is not None:
+            campos.append("tags = ?")
+            valores.append(nuevos_tags)
+
+        if nuevas_notas is not None:
+            campos.append("notes = ?")
+            valores.append(nuevas_notas)
+
+        # Agregar updated_at
+        campos.append("updated_at = datetime('now')")
+
+        if campos:
+            valores.append(cuenta_id)
+            query = f"UPDATE financial_accounts SET {', '.join(campos)} WHERE id = ?"
+            cur.execute(query, valores)
+
+        ok = cur.rowcount > 0
     return ok
 
 def eliminar_cuenta_financiera(cuenta_id: int) -> bool:
     """
     Marca una cuenta como inactiva (soft delete).
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE financial_accounts
-        SET is_active = 0, updated_at = datetime('now')
-        WHERE id = ?
-    """, (cuenta_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE financial_accounts
+            SET is_active = 0, updated_at = datetime('now')
+            WHERE id = ?
+        """, (cuenta_id,))
+        ok = cur.rowcount > 0
     return ok
 
 def listar_cuentas_financieras_activas() -> list[dict[str, Any]]:
     """
     Lista todas las cuentas financieras activas.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, name, type, balance, currency, tags, notes, created_at, updated_at
-        FROM financial_accounts
-        WHERE is_active = 1
-        ORDER BY
-            CASE type
-                WHEN 'banco' THEN 1
-                WHEN 'wallet' THEN 2
-                WHEN 'efectivo' THEN 3
-                ELSE 4
-            END, name
-    """)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, name, type, balance, currency, tags, notes, created_at, updated_at
+            FROM financial_accounts
+            WHERE is_active = 1
+            ORDER BY
+                CASE type
+                    WHEN 'banco' THEN 1
+                    WHEN 'wallet' THEN 2
+                    WHEN 'efectivo' THEN 3
+                    ELSE 4
+                END, name
+        """)
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 def obtener_cuenta_financiera(cuenta_id: int) -> Optional[dict[str, Any]]:
     """
     Obtiene una cuenta financiera específica.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, name, type, balance, currency, tags, notes, created_at, updated_at
-        FROM financial_accounts
-        WHERE id = ? AND is_active = 1
-    """, (cuenta_id,))
-    row = cur.fetchone()
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, name, type, balance, currency, tags, notes, created_at, updated_at
+            FROM financial_accounts
+            WHERE id = ? AND is_active = 1
+        """, (cuenta_id,))
+        row = cur.fetchone()
     return dict(row) if row else None
 
 def actualizar_balance_cuenta(cuenta_id: int, nuevo_balance: float, descripcion: str = "Ajuste manual") -> bool:
     """
     Actualiza el balance de una cuenta y registra el movimiento.
+    Bajo BEGIN IMMEDIATE: el balance leído no puede cambiar antes del UPDATE.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with transaccion_inmediata() as conn:
+        cur = conn.cursor()
 
-    # Obtener balance actual
-    cur.execute("SELECT balance FROM financial_accounts WHERE id = ?", (cuenta_id,))
-    result = cur.fetchone()
-    if not result:
-        conn.close()
-        return False
+        # Obtener balance actual
+        cur.execute("SELECT balance FROM financial_accounts WHERE id = ?", (cuenta_id,))
+        result = cur.fetchone()
+        if not result:
+            return False
 
-    old_balance = result['balance']
+        old_balance = result['balance']
 
-    if old_balance == nuevo_balance:
-        conn.close()
-        return True  # No hay cambio
+        if old_balance == nuevo_balance:
+            return True  # No hay cambio
 
-    # Determinar tipo de movimiento
-    tipo_mov = "deposit" if nuevo_balance > old_balance else "withdrawal"
-    monto = abs(nuevo_balance - old_balance)
+        # Determinar tipo de movimiento
+        tipo_mov = "deposit" if nuevo_balance > old_balance else "withdrawal"
+        monto = abs(nuevo_balance - old_balance)
 
-    # Actualizar cuenta
-    cur.execute("""
-        UPDATE financial_accounts
-        SET balance = ?, updated_at = datetime('now')
-        WHERE id = ?
-    """, (nuevo_balance, cuenta_id))
+        # Actualizar cuenta
+        cur.execute("""
+            UPDATE financial_accounts
+            SET balance = ?, updated_at = datetime('now')
+            WHERE id = ?
+        """, (nuevo_balance, cuenta_id))
 
-    # Registrar movimiento
-    cur.execute("""
-        INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (cuenta_id, tipo_mov, monto, old_balance, nuevo_balance, descripcion))
+        # Registrar movimiento
+        cur.execute("""
+            INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (cuenta_id, tipo_mov, monto, old_balance, nuevo_balance, descripcion))
 
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+        ok = cur.rowcount > 0
+        _checkpoint_tras_movimientos(conn, [cuenta_id])
     return ok
 
+def actualizar_balances_cuentas(cambios: List[Tuple[int, float]],
+                                descripcion: str = "Actualización masiva") -> List[Dict[str, Any]]:
+    """
+    Fija el balance de varias cuentas en UNA transacción (todo o nada).
+
+    • cambios: [(cuenta_id, nuevo_balance), ...]
+    • Los UPDATE y los movimientos se escriben con executemany
+    • Si algo falla se revierte todo y se propaga la excepción
+    • Bajo BEGIN IMMEDIATE: nadie cambia los balances entre la lectura y la escritura
+
+    Retorna un resultado por cuenta, en el orden recibido:
+    {'cuenta_id', 'estado': 'actualizada' | 'sin_cambio' | 'no_existe',
+     'balance_anterior', 'balance_nuevo'}
+    """
+    ids = list(dict.fromkeys(cuenta_id for cuenta_id, _ in cambios))
+
+    with transaccion_inmediata() as conn:
+        # Balances actuales (en bloques de 500 parámetros)
+        actuales = {}
+        for i in range(0, len(ids), 500):
+            bloque = ids[i:i + 500]
+            marcas = ", ".join("?" for _ in bloque)
+            cur = conn.execute(
+                f"SELECT id, balance FROM financial_accounts WHERE id IN ({marcas})", bloque
+            )
+            actuales.update((r['id'], r['balance']) for r in cur.fetchall())
+
+        resultados = []
+        actualizaciones = []
+        movimientos = []
+        for cuenta_id, nuevo_balance in cambios:
+            if cuenta_id not in actuales:
+                resultados.append({'cuenta_id': cuenta_id, 'estado': 'no_existe',
+                                   'balance_anterior': None, 'balance_nuevo': None})
+                continue
+
+            old_balance = actuales[cuenta_id]
+            if old_balance == nuevo_balance:
+                estado = 'sin_cambio'
+            else:
+                estado = 'actualizada'
+                tipo_mov = "deposit" if nuevo_balance > old_balance else "withdrawal"
+                actualizaciones.append((nuevo_balance, cuenta_id))
+                movimientos.append((cuenta_id, tipo_mov, abs(nuevo_balance - old_balance),
+                                    old_balance, nuevo_balance, descripcion))
+                actuales[cuenta_id] = nuevo_balance  # Si la cuenta se repite, encadena
+
+            resultados.append({'cuenta_id': cuenta_id, 'estado': estado,
+                               'balance_anterior': old_balance, 'balance_nuevo': nuevo_balance})
+
+        conn.executemany("""
+            UPDATE financial_accounts
+            SET balance = ?, updated_at = datetime('now')
+            WHERE id = ?
+        """, actualizaciones)
+        conn.executemany("""
+            INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, movimientos)
+        _checkpoint_tras_movimientos(conn, [m[0] for m in movimientos])
+
+    return resultados
+
 def agregar_movimiento_cuenta(
     cuenta_id: int,
     tipo: str,
@@ -1080,62 +1852,186 @@ def agregar_movimiento_cuenta(
 ) -> bool:
     """
     Agrega un movimiento a una cuenta y actualiza su balance automáticamente.
-    """
-    conn = get_connection()
-    cur = conn.cursor()
 
-    # Obtener balance actual
-    cur.execute("SELECT balance FROM financial_accounts WHERE id = ?", (cuenta_id,))
-    result = cur.fetchone()
-    if not result:
-        conn.close()
-        return False
+    Depósitos y retiros suman en la misma sentencia (balance = balance + ?)
+    bajo BEGIN IMMEDIATE, así dos movimientos simultáneos nunca se pierden.
+    """
+    with transaccion_inmediata() as conn:
+        cur = conn.cursor()
 
-    old_balance = result['balance']
+        # Balance actual (con el lock de escritura tomado no puede cambiar)
+        cur.execute("SELECT balance FROM financial_accounts WHERE id = ?", (cuenta_id,))
+        result = cur.fetchone()
+        if not result:
+            return False
 
-    # Calcular nuevo balance
-    if tipo == "deposit":
-        new_balance = old_balance + monto
-    elif tipo == "withdrawal":
-        new_balance = old_balance - monto
-    else:  # adjustment
-        new_balance = monto  # En adjustments, monto es el nuevo balance total
+        old_balance = result['balance']
 
-    # Actualizar cuenta
-    cur.execute("""
-        UPDATE financial_accounts
-        SET balance = ?, updated_at = datetime('now')
-        WHERE id = ?
-    """, (new_balance, cuenta_id))
+        # Actualizar cuenta
+        if tipo == "deposit":
+            new_balance = _sumar_balance(conn, cuenta_id, monto)
+        elif tipo == "withdrawal":
+            new_balance = _sumar_balance(conn, cuenta_id, -monto)
+        else:  # adjustment
+            new_balance = monto  # En adjustments, monto es el nuevo balance total
+            cur.execute("""
+                UPDATE financial_accounts
+                SET balance = ?, updated_at = datetime('now')
+                WHERE id = ?
+            """, (new_balance, cuenta_id))
 
-    # Registrar movimiento
-    cur.execute("""
-        INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description, notes)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (cuenta_id, tipo, monto, old_balance, new_balance, descripcion, notas))
+        # Registrar movimiento
+        cur.execute("""
+            INSERT INTO account_movements (account_id, type, amount, old_balance, new_balance, description, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (cuenta_id, tipo, monto, old_balance, new_balance, descripcion, notas))
 
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+        ok = cur.rowcount > 0
+        _checkpoint_tras_movimientos(conn, [cuenta_id])
     return ok
 
 def obtener_movimientos_cuenta(cuenta_id: int, limite: int = 50) -> list[dict[str, Any]]:
     """
     Obtiene los últimos movimientos de una cuenta.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, type, amount, old_balance, new_balance, description, notes, created_at
-        FROM account_movements
-        WHERE account_id = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-    """, (cuenta_id, limite))
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, type, amount, old_balance, new_balance, description, notes, created_at
+            FROM account_movements
+            WHERE account_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (cuenta_id, limite))
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
+# 🔸 LIBRO MAYOR: BALANCE HISTÓRICO Y VERIFICACIÓN
+def obtener_balance_al(cuenta_id: int, fecha_hora: str) -> float:
+    """
+    Balance de la cuenta al momento 'fecha_hora' ("YYYY-MM-DD HH:MM:SS" o
+    "YYYY-MM-DD" = fin de ese día), derivado de los movimientos:
+    checkpoint anterior + movimientos posteriores hasta esa hora.
+
+    Ambas búsquedas son por índice (O(log n)) y después se suman como mucho
+    los movimientos entre dos checkpoints (SETTINGS["ledger_checkpoint_every"]).
+    """
+    if len(fecha_hora) == 10:
+        fecha_hora += " 23:59:59"
+
+    with conexion() as conn:
+        checkpoint = conn.execute("""
+            SELECT movement_id, created_at, balance
+            FROM account_checkpoints
+            WHERE account_id = ? AND created_at <= ?
+            ORDER BY created_at DESC, movement_id DESC
+            LIMIT 1
+        """, (cuenta_id, fecha_hora)).fetchone()
+
+        if checkpoint:
+            base, desde_id, desde_fecha = checkpoint['balance'], checkpoint['movement_id'], checkpoint['created_at']
+        else:
+            base, desde_id, desde_fecha = 0.0, 0, ""
+
+        fila = conn.execute("""
+            SELECT MIN(id) AS primero_id, SUM(new_balance - old_balance) AS delta
+            FROM account_movements
+            WHERE account_id = ? AND created_at >= ? AND created_at <= ? AND id > ?
+        """, (cuenta_id, desde_fecha, fecha_hora, desde_id)).fetchone()
+
+        if fila['primero_id'] is None:
+            return base
+        if not checkpoint:
+            # Sin checkpoint: se parte del saldo previo al primer movimiento
+            base = conn.execute("SELECT old_balance FROM account_movements WHERE id = ?",
+                                (fila['primero_id'],)).fetchone()['old_balance']
+        return base + fila['delta']
+
+def crear_checkpoints_cuentas(cada: Optional[int] = None) -> int:
+    """
+    Checkpoint para cada cuenta con 'cada' movimientos nuevos o más
+    (por defecto SETTINGS["ledger_checkpoint_every"]). Recorre todo el libro:
+    es mantenimiento (--verificar-libro); al escribir movimientos el
+    checkpoint se crea por cuenta con _checkpoint_tras_movimientos.
+    """
+    with conexion() as conn:
+        return _crear_checkpoints_cuentas(conn, cada or SETTINGS["ledger_checkpoint_every"])
+
+def verificar_libro_mayor(tolerancia: float = 0.005) -> Dict[str, Any]:
+    """
+    Recalcula TODAS las cuentas desde sus movimientos en una sola pasada y
+    compara con lo guardado (también: python main.py --verificar-libro):
+
+    • cadena: old_balance de cada movimiento = balance calculado hasta ahí
+    • monto: deposit/withdrawal mueven exactamente 'amount';
+      adjustment deja el balance en 'amount'
+    • checkpoints: su balance = balance calculado en su movimiento
+    • final: balance calculado = financial_accounts.balance
+
+    Retorna {'cuentas', 'movimientos', 'errores': [dict], 'ok'}.
+    """
+    errores: List[Dict[str, Any]] = []
+
+    def error(cuenta_id, movimiento_id, tipo, esperado, encontrado):
+        errores.append({'cuenta_id': cuenta_id, 'movimiento_id': movimiento_id, 'tipo': tipo,
+                        'esperado': esperado, 'encontrado': encontrado})
+
+    # Una lectura consistente de todo el libro
+    with conexion() as conn:
+        cuentas = {r['id']: r['balance'] for r in conn.execute("SELECT id, balance FROM financial_accounts")}
+        checkpoints = {(r['account_id'], r['movement_id']): r['balance']
+                       for r in conn.execute("SELECT account_id, movement_id, balance FROM account_checkpoints")}
+        cur = conn.execute("""
+            SELECT id, account_id, type, amount, old_balance, new_balance
+            FROM account_movements
+            ORDER BY account_id, id
+        """)
+
+        movimientos = 0
+        con_movimientos = set()
+        cuenta_actual = None
+        calculado = 0.0
+        for m in cur:
+            movimientos += 1
+            if m['account_id'] != cuenta_actual:
+                if cuenta_actual is not None and abs(cuentas.get(cuenta_actual, 0.0) - calculado) > tolerancia:
+                    error(cuenta_actual, None, 'final', calculado, cuentas.get(cuenta_actual))
+                cuenta_actual = m['account_id']
+                con_movimientos.add(cuenta_actual)
+                calculado = 0.0
+
+            if abs(m['old_balance'] - calculado) > tolerancia:
+                error(cuenta_actual, m['id'], 'cadena', calculado, m['old_balance'])
+
+            if m['type'] == 'deposit':
+                calculado += m['amount']
+            elif m['type'] == 'withdrawal':
+                calculado -= m['amount']
+            else:  # adjustment
+                calculado = m['amount']
+
+            if abs(m['new_balance'] - calculado) > tolerancia:
+                error(cuenta_actual, m['id'], 'monto', calculado, m['new_balance'])
+
+            balance_checkpoint = checkpoints.get((cuenta_actual, m['id']))
+            if balance_checkpoint is not None and abs(balance_checkpoint - calculado) > tolerancia:
+                error(cuenta_actual, m['id'], 'checkpoint', calculado, balance_checkpoint)
+
+        if cuenta_actual is not None and abs(cuentas.get(cuenta_actual, 0.0) - calculado) > tolerancia:
+            error(cuenta_actual, None, 'final', calculado, cuentas.get(cuenta_actual))
+
+    # Cuentas sin movimientos: su balance calculado es 0
+    for cuenta_id, balance in cuentas.items():
+        if cuenta_id not in con_movimientos and abs(balance) > tolerancia:
+            error(cuenta_id, None, 'final', 0.0, balance)
+
+    return {
+        'cuentas': len(cuentas),
+        'movimientos': movimientos,
+        'errores': errores,
+        'ok': not errores,
+    }
+
 # 🔸 DEDUCCIONES / GASTOS PENDIENTES
 def agregar_deduccion(
     descripcion: str,
@@ -1147,279 +2043,428 @@ def agregar_deduccion(
     """
     Agrega una deducción pendiente (gasto, vuelto, etc.).
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        INSERT INTO financial_deductions (description, amount, account_id, due_date, notes)
-        VALUES (?, ?, ?, ?, ?)
-    """, (descripcion, monto, cuenta_id, fecha_limite, notas))
+        cur.execute("""
+            INSERT INTO financial_deductions (description, amount, account_id, due_date, notes)
+            VALUES (?, ?, ?, ?, ?)
+        """, (descripcion, monto, cuenta_id, fecha_limite, notas))
 
-    conn.commit()
-    deduccion_id = cur.lastrowid
-    conn.close()
+        deduccion_id = cur.lastrowid
     return deduccion_id
 
 def marcar_deduccion_resuelta(deduccion_id: int) -> bool:
     """
     Marca una deducción como resuelta.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        UPDATE financial_deductions
-        SET status = 'resolved', resolved_at = datetime('now')
-        WHERE id = ?
-    """, (deduccion_id,))
+        cur.execute("""
+            UPDATE financial_deductions
+            SET status = 'resolved', resolved_at = datetime('now')
+            WHERE id = ?
+        """, (deduccion_id,))
 
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+        ok = cur.rowcount > 0
     return ok
 
 def eliminar_deduccion(deduccion_id: int) -> bool:
     """
     Elimina físicamente una deducción.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM financial_deductions WHERE id = ?", (deduccion_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM financial_deductions WHERE id = ?", (deduccion_id,))
+        ok = cur.rowcount > 0
     return ok
 
 def listar_deducciones_pendientes() -> list[dict[str, Any]]:
     """
     Lista todas las deducciones pendientes.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            d.*,
-            a.name as account_name
-        FROM financial_deductions d
-        LEFT JOIN financial_accounts a ON d.account_id = a.id
-        WHERE d.status = 'pending'
-        ORDER BY
-            CASE WHEN d.due_date IS NULL THEN 1 ELSE 0 END,
-            d.due_date,
-            d.created_at
-    """)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT
+                d.*,
+                a.name as account_name
+            FROM financial_deductions d
+            LEFT JOIN financial_accounts a ON d.account_id = a.id
+            WHERE d.status = 'pending'
+            ORDER BY
+                CASE WHEN d.due_date IS NULL THEN 1 ELSE 0 END,
+                d.due_date,
+                d.created_at
+        """)
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 def listar_todas_deducciones(limite: int = 100) -> list[dict[str, Any]]:
     """
     Lista todas las deducciones (pendientes y resueltas).
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            d.*,
-            a.name as account_name
-        FROM financial_deductions d
-        LEFT JOIN financial_accounts a ON d.account_id = a.id
-        ORDER BY d.status, d.created_at DESC
-        LIMIT ?
-    """, (limite,))
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT
+                d.*,
+                a.name as account_name
+            FROM financial_deductions d
+            LEFT JOIN financial_accounts a ON d.account_id = a.id
+            ORDER BY d.status, d.created_at DESC
+            LIMIT ?
+        """, (limite,))
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 # 🔸 RESUMEN FINANCIERO
 def obtener_resumen_financiero() -> dict[str, Any]:
     """
-    Calcula el resumen financiero completo:
+    Calcula el resumen financiero completo en UNA consulta:
     - Subtotal (suma de todos los saldos)
     - Total deducciones pendientes
     - Total real
     - Desglose por tipo de cuenta
+    - Subtotales por moneda (el subtotal suma monedas distintas tal cual;
+      'subtotales_por_moneda' permite mostrarlas por separado)
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # Obtener suma de saldos de cuentas activas
-    cur.execute("""
-        SELECT
-            COALESCE(SUM(balance), 0) as subtotal,
-            COUNT(*) as total_cuentas
-        FROM financial_accounts
-        WHERE is_active = 1
-    """)
-    resultado = dict(cur.fetchone() or {})
-
-    # Obtener suma de deducciones pendientes
-    cur.execute("""
-        SELECT COALESCE(SUM(amount), 0) as total_deducciones
-        FROM financial_deductions
-        WHERE status = 'pending'
-    """)
-    deducciones = dict(cur.fetchone() or {})
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    # Obtener desglose por tipo de cuenta
-    cur.execute("""
-        SELECT
-            type,
-            COUNT(*) as cantidad,
-            COALESCE(SUM(balance), 0) as total
-        FROM financial_accounts
-        WHERE is_active = 1
-        GROUP BY type
-        ORDER BY total DESC
-    """)
-    desglose_tipos = [dict(r) for r in cur.fetchall()]
-
-    conn.close()
-
-    subtotal = resultado.get('subtotal', 0) or 0
-    total_deducciones = deducciones.get('total_deducciones', 0) or 0
+        # Un "ROLLUP" armado con UNION ALL: nivel dice qué agrupación es cada fila
+        cur.execute("""
+            WITH activas AS (
+                SELECT type, currency, balance
+                FROM financial_accounts
+                WHERE is_active = 1
+            )
+            SELECT 'total' AS nivel, NULL AS clave, COUNT(*) AS cantidad,
+                   COALESCE(SUM(balance), 0) AS total
+            FROM activas
+            UNION ALL
+            SELECT 'tipo', type, COUNT(*), COALESCE(SUM(balance), 0)
+            FROM activas
+            GROUP BY type
+            UNION ALL
+            SELECT 'moneda', currency, COUNT(*), COALESCE(SUM(balance), 0)
+            FROM activas
+            GROUP BY currency
+            UNION ALL
+            SELECT 'deducciones', NULL, COUNT(*), COALESCE(SUM(amount), 0)
+            FROM financial_deductions
+            WHERE status = 'pending'
+        """)
+        filas = cur.fetchall()
+
+    subtotal = total_cuentas = total_deducciones = 0
+    desglose_tipos = []
+    por_moneda = []
+    for fila in filas:
+        if fila['nivel'] == 'total':
+            subtotal, total_cuentas = fila['total'], fila['cantidad']
+        elif fila['nivel'] == 'deducciones':
+            total_deducciones = fila['total']
+        elif fila['nivel'] == 'tipo':
+            desglose_tipos.append({'type': fila['clave'], 'cantidad': fila['cantidad'], 'total': fila['total']})
+        else:
+            por_moneda.append({'currency': fila['clave'], 'cantidad': fila['cantidad'], 'total': fila['total']})
+
+    desglose_tipos.sort(key=lambda t: t['total'], reverse=True)
+    por_moneda.sort(key=lambda m: m['total'], reverse=True)
     total_real = subtotal - total_deducciones
 
     return {
         'subtotal': subtotal,
         'total_deducciones': total_deducciones,
         'total_real': total_real,
-        'total_cuentas': resultado.get('total_cuentas', 0) or 0,
+        'total_cuentas': total_cuentas,
         'desglose_por_tipo': desglose_tipos,
-        'cuentas_con_saldo': [t for t in desglose_tipos if t['total'] > 0]
+        'cuentas_con_saldo': [t for t in desglose_tipos if t['total'] > 0],
+        'subtotales_por_moneda': por_moneda
     }
 
 def obtener_saldos_por_tipo() -> dict[str, float]:
     """
     Obtiene los saldos agrupados por tipo de cuenta.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            type,
-            COALESCE(SUM(balance), 0) as total
-        FROM financial_accounts
-        WHERE is_active = 1
-        GROUP BY type
-    """)
-
-    resultados = {}
-    for row in cur.fetchall():
-        resultados[row['type']] = row['total']
-
-    conn.close()
-    return resultados
+    return {t['type']: t['total'] for t in obtener_resumen_financiero()['desglose_por_tipo']}
 
 # 🔸 SNAPSHOTS / HITOS
+# Los datos de cada snapshot (resumen + cuentas + deducciones) se guardan en
+# data_blob comprimidos con zlib. codec:
+#   'zlib'       → el JSON completo
+#   'zlib-delta' → solo lo que cambió respecto de base_snapshot_id
+#                  (resumen completo + filas nuevas/cambiadas + orden de ids)
+#   'json'       → snapshots viejos en snapshot_data (antes de la migración 6)
+# Cada _MAX_CADENA_DELTA deltas se guarda uno completo, así leer un snapshot
+# descomprime como mucho esa cantidad de blobs.
+_MAX_CADENA_DELTA = 10
+_LISTAS_SNAPSHOT = ("cuentas", "deducciones")
+
+def _comprimir_snapshot(datos: dict) -> bytes:
+    return zlib.compress(json.dumps(datos, default=str, ensure_ascii=False).encode("utf-8"))
+
+def _delta_snapshot(anterior: dict, actual: dict) -> dict:
+    """Lo que cambió de 'anterior' a 'actual' (filas comparadas por id)"""
+    delta = {"resumen": actual["resumen"], "timestamp": actual["timestamp"]}
+    for clave in _LISTAS_SNAPSHOT:
+        previas = {f["id"]: f for f in anterior.get(clave, [])}
+        delta[clave] = {
+            "orden": [f["id"] for f in actual[clave]],
+            "cambiadas": [f for f in actual[clave] if previas.get(f["id"]) != f],
+        }
+    return delta
+
+def _aplicar_delta_snapshot(base: dict, delta: dict) -> dict:
+    datos = {"resumen": delta["resumen"], "timestamp": delta["timestamp"]}
+    for clave in _LISTAS_SNAPSHOT:
+        filas = {f["id"]: f for f in base.get(clave, [])}
+        filas.update((f["id"], f) for f in delta[clave]["cambiadas"])
+        datos[clave] = [filas[i] for i in delta[clave]["orden"]]
+    return datos
+
+def _leer_datos_snapshot(conn: sqlite3.Connection, snapshot_id: int) -> Optional[dict]:
+    """Datos completos del snapshot: sigue la cadena de deltas hasta uno completo"""
+    deltas = []
+    actual = snapshot_id
+    while True:
+        fila = conn.execute(
+            "SELECT codec, data_blob, snapshot_data, base_snapshot_id FROM financial_snapshots WHERE id = ?",
+            (actual,)
+        ).fetchone()
+        if fila is None:
+            return None
+        if fila["codec"] == "json":
+            datos = json.loads(fila["snapshot_data"] or "{}")
+            break
+        contenido = json.loads(zlib.decompress(fila["data_blob"]).decode("utf-8"))
+        if fila["codec"] == "zlib":
+            datos = contenido
+            break
+        deltas.append(contenido)
+        actual = fila["base_snapshot_id"]
+
+    for delta in reversed(deltas):
+        datos = _aplicar_delta_snapshot(datos, delta)
+    return datos
+
+def _largo_cadena_delta(conn: sqlite3.Connection, snapshot_id: int) -> int:
+    """Cuántos deltas hay hasta llegar a un snapshot completo (sin leer blobs)"""
+    largo = 0
+    while snapshot_id is not None:
+        fila = conn.execute("SELECT codec, base_snapshot_id FROM financial_snapshots WHERE id = ?",
+                            (snapshot_id,)).fetchone()
+        if fila is None or fila["codec"] != "zlib-delta":
+            break
+        largo += 1
+        snapshot_id = fila["base_snapshot_id"]
+    return largo
+
 def crear_snapshot_financiero(
     nombre: str,
-    notas: Optional[str] = None
+    notas: Optional[str] = None,
+    delta: bool = True
 ) -> int:
     """
     Crea un snapshot de la situación financiera actual.
-    """
-    # Obtener resumen actual
-    resumen = obtener_resumen_financiero()
-
-    # Obtener detalles de cuentas
-    cuentas = listar_cuentas_financieras_activas()
-
-    # Obtener deducciones pendientes
-    deducciones = listar_deducciones_pendientes()
-
-    # Crear datos del snapshot
-    snapshot_data = {
-        'resumen': resumen,
-        'cuentas': cuentas,
-        'deducciones': deducciones,
-        'timestamp': datetime.now().isoformat()
-    }
 
-    # Convertir a JSON string
-    import json
-    data_str = json.dumps(snapshot_data, default=str, ensure_ascii=False)
-
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO financial_snapshots (name, total_balance, subtotal, total_deductions, notes, snapshot_data)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        nombre,
-        resumen['total_real'],
-        resumen['subtotal'],
-        resumen['total_deducciones'],
-        notas,
-        data_str
-    ))
-
-    conn.commit()
-    snapshot_id = cur.lastrowid
-    conn.close()
+    Resumen, cuentas y deducciones se leen en UNA transacción (la misma del
+    INSERT), así el snapshot es consistente aunque otra caja esté escribiendo.
+    Con delta=True se guarda solo la diferencia con el snapshot anterior
+    cuando ocupa menos que el completo.
+    """
+    with transaccion_inmediata() as conn:
+        # Las funciones anidadas usan esta misma conexión y transacción
+        snapshot_data = {
+            'resumen': obtener_resumen_financiero(),
+            'cuentas': listar_cuentas_financieras_activas(),
+            'deducciones': listar_deducciones_pendientes(),
+            'timestamp': datetime.now().isoformat()
+        }
+        # Mismos tipos que al leerlo de vuelta (fechas como texto, etc.)
+        snapshot_data = json.loads(json.dumps(snapshot_data, default=str, ensure_ascii=False))
+        resumen = snapshot_data['resumen']
+
+        blob, codec, base_id = _comprimir_snapshot(snapshot_data), "zlib", None
+        if delta:
+            anterior = conn.execute(
+                "SELECT id FROM financial_snapshots ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            if anterior and _largo_cadena_delta(conn, anterior["id"]) < _MAX_CADENA_DELTA:
+                datos_anteriores = _leer_datos_snapshot(conn, anterior["id"])
+                blob_delta = _comprimir_snapshot(_delta_snapshot(datos_anteriores, snapshot_data))
+                if len(blob_delta) < len(blob):
+                    blob, codec, base_id = blob_delta, "zlib-delta", anterior["id"]
+
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO financial_snapshots
+                (name, total_balance, subtotal, total_deductions, notes,
+                 snapshot_data, data_blob, codec, base_snapshot_id)
+            VALUES (?, ?, ?, ?, ?, '', ?, ?, ?)
+        """, (
+            nombre,
+            resumen['total_real'],
+            resumen['subtotal'],
+            resumen['total_deducciones'],
+            notas,
+            blob,
+            codec,
+            base_id
+        ))
+
+        snapshot_id = cur.lastrowid
     return snapshot_id
 
 def listar_snapshots_financieros(limite: int = 20) -> list[dict[str, Any]]:
     """
-    Lista todos los snapshots guardados.
+    Lista todos los snapshots guardados (sin leer los datos comprimidos).
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        SELECT id, name, total_balance, subtotal, total_deductions, notes, created_at
-        FROM financial_snapshots
-        ORDER BY created_at DESC
-        LIMIT ?
-    """, (limite,))
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+        cur.execute("""
+            SELECT id, name, total_balance, subtotal, total_deductions, notes, created_at
+            FROM financial_snapshots
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (limite,))
+
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 def obtener_snapshot_financiero(snapshot_id: int) -> Optional[dict[str, Any]]:
     """
-    Obtiene un snapshot específico.
+    Obtiene un snapshot específico; 'data_parsed' trae los datos completos
+    (resumen, cuentas, deducciones, timestamp) ya descomprimidos.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT id, name, total_balance, subtotal, total_deductions, notes, snapshot_data, created_at
-        FROM financial_snapshots
-        WHERE id = ?
-    """, (snapshot_id,))
-
-    row = cur.fetchone()
-    conn.close()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    if not row:
-        return None
+        cur.execute("""
+            SELECT id, name, total_balance, subtotal, total_deductions, notes, codec, created_at
+            FROM financial_snapshots
+            WHERE id = ?
+        """, (snapshot_id,))
 
-    resultado = dict(row)
+        row = cur.fetchone()
+        if not row:
+            return None
 
-    # Parsear JSON si existe
-    if resultado.get('snapshot_data'):
-        import json
+        resultado = dict(row)
         try:
-            resultado['data_parsed'] = json.loads(resultado['snapshot_data'])
-        except:
+            resultado['data_parsed'] = _leer_datos_snapshot(conn, snapshot_id) or {}
+        except (zlib.error, ValueError, KeyError) as e:
+            print(f"⚠️ Snapshot {snapshot_id} ilegible: {e}")
             resultado['data_parsed'] = {}
 
     return resultado
 
-def eliminar_snapshot_financiero(snapshot_id: int) -> bool:
+def comparar_snapshots_financieros(snapshot_antes: int, snapshot_despues: int) -> Optional[dict[str, Any]]:
     """
-    Elimina un snapshot.
+    Diferencias entre dos snapshots (p.ej. "antes de pagar proveedores" y
+    "después"). Las filas se cruzan por id con diccionarios.
+
+    Retorna None si alguno no existe; si no:
+    {
+        'antes' / 'despues': {id, name, created_at},
+        'resumen': {campo: {'antes', 'despues', 'diferencia'}},
+        'cuentas': [{id, name, type, currency, antes, despues, diferencia,
+                     estado: 'nueva' | 'cerrada' | 'cambio' | 'sin_cambio'}]
+                   (mayor diferencia absoluta primero),
+        'deducciones': {'nuevas': [...], 'resueltas': [...],  # resueltas o eliminadas
+                        'cambiadas': [{id, description, antes, despues, diferencia}]}
+    }
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM financial_snapshots WHERE id = ?", (snapshot_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
+    with conexion() as conn:
+        metadatos = {
+            r['id']: dict(r) for r in conn.execute(
+                "SELECT id, name, created_at FROM financial_snapshots WHERE id IN (?, ?)",
+                (snapshot_antes, snapshot_despues)
+            )
+        }
+        if snapshot_antes not in metadatos or snapshot_despues not in metadatos:
+            return None
+        datos_antes = _leer_datos_snapshot(conn, snapshot_antes)
+        datos_despues = _leer_datos_snapshot(conn, snapshot_despues)
+
+    # Resumen
+    resumen = {}
+    for campo in ('subtotal', 'total_deducciones', 'total_real', 'total_cuentas'):
+        antes = datos_antes.get('resumen', {}).get(campo, 0) or 0
+        despues = datos_despues.get('resumen', {}).get(campo, 0) or 0
+        resumen[campo] = {'antes': antes, 'despues': despues, 'diferencia': despues - antes}
+
+    # Cuentas: unión de ids, cruzadas por diccionario
+    cuentas_antes = {c['id']: c for c in datos_antes.get('cuentas', [])}
+    cuentas_despues = {c['id']: c for c in datos_despues.get('cuentas', [])}
+    cuentas = []
+    for cuenta_id in cuentas_antes.keys() | cuentas_despues.keys():
+        antes = cuentas_antes.get(cuenta_id)
+        despues = cuentas_despues.get(cuenta_id)
+        ficha = despues or antes
+        balance_antes = antes['balance'] if antes else 0.0
+        balance_despues = despues['balance'] if despues else 0.0
+        if antes is None:
+            estado = 'nueva'
+        elif despues is None:
+            estado = 'cerrada'
+        else:
+            estado = 'cambio' if balance_antes != balance_despues else 'sin_cambio'
+        cuentas.append({
+            'id': cuenta_id,
+            'name': ficha['name'],
+            'type': ficha.get('type'),
+            'currency': ficha.get('currency'),
+            'antes': balance_antes,
+            'despues': balance_despues,
+            'diferencia': balance_despues - balance_antes,
+            'estado': estado,
+        })
+    cuentas.sort(key=lambda c: (-abs(c['diferencia']), c['name']))
+
+    # Deducciones pendientes
+    deducciones_antes = {d['id']: d for d in datos_antes.get('deducciones', [])}
+    deducciones_despues = {d['id']: d for d in datos_despues.get('deducciones', [])}
+    cambiadas = [
+        {'id': i, 'description': d['description'], 'antes': deducciones_antes[i]['amount'],
+         'despues': d['amount'], 'diferencia': d['amount'] - deducciones_antes[i]['amount']}
+        for i, d in deducciones_despues.items()
+        if i in deducciones_antes and d['amount'] != deducciones_antes[i]['amount']
+    ]
+
+    return {
+        'antes': metadatos[snapshot_antes],
+        'despues': metadatos[snapshot_despues],
+        'resumen': resumen,
+        'cuentas': cuentas,
+        'deducciones': {
+            'nuevas': [d for i, d in deducciones_despues.items() if i not in deducciones_antes],
+            'resueltas': [d for i, d in deducciones_antes.items() if i not in deducciones_despues],
+            'cambiadas': cambiadas,
+        },
+    }
+
+def eliminar_snapshot_financiero(snapshot_id: int) -> bool:
+    """
+    Elimina un snapshot. Los snapshots guardados como delta de este se
+    reescriben completos antes, para que sigan pudiéndose leer.
+    """
+    with transaccion_inmediata() as conn:
+        cur = conn.cursor()
+        dependientes = cur.execute(
+            "SELECT id FROM financial_snapshots WHERE base_snapshot_id = ?", (snapshot_id,)
+        ).fetchall()
+        cur.executemany("""
+            UPDATE financial_snapshots
+            SET data_blob = ?, codec = 'zlib', base_snapshot_id = NULL
+            WHERE id = ?
+        """, [(_comprimir_snapshot(_leer_datos_snapshot(conn, d['id'])), d['id']) for d in dependientes])
+
+        cur.execute("DELETE FROM financial_snapshots WHERE id = ?", (snapshot_id,))
+        ok = cur.rowcount > 0
     return ok
 
 # 🔸 FUNCIONES DE BÚSQUEDA Y FILTRO
@@ -1427,191 +2472,246 @@ def buscar_cuentas_por_nombre(busqueda: str) -> list[dict[str, Any]]:
     """
     Busca cuentas por nombre.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        SELECT id, name, type, balance, currency, tags, notes
-        FROM financial_accounts
-        WHERE is_active = 1 AND name LIKE ?
-        ORDER BY name
-    """, (f"%{busqueda}%",))
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+        cur.execute("""
+            SELECT id, name, type, balance, currency, tags, notes
+            FROM financial_accounts
+            WHERE is_active = 1 AND name LIKE ?
+            ORDER BY name
+        """, (f"%{busqueda}%",))
+
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 def filtrar_cuentas_por_tipo(tipo: str) -> list[dict[str, Any]]:
     """
     Filtra cuentas por tipo.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        SELECT id, name, type, balance, currency, tags, notes
-        FROM financial_accounts
-        WHERE is_active = 1 AND type = ?
-        ORDER BY name
-    """, (tipo,))
-
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+        cur.execute("""
+            SELECT id, name, type, balance, currency, tags, notes
+            FROM financial_accounts
+            WHERE is_active = 1 AND type = ?
+            ORDER BY name
+        """, (tipo,))
+
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 def filtrar_cuentas_por_saldo(min_saldo: float = 0, max_saldo: Optional[float] = None) -> list[dict[str, Any]]:
     """
     Filtra cuentas por rango de saldo.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with conexion() as conn:
+        cur = conn.cursor()
 
-    if max_saldo is not None:
-        cur.execute("""
-            SELECT id, name, type, balance, currency, tags, notes
-            FROM financial_accounts
-            WHERE is_active = 1 AND balance BETWEEN ? AND ?
-            ORDER BY balance DESC
-        """, (min_saldo, max_saldo))
-    else:
-        cur.execute("""
-            SELECT id, name, type, balance, currency, tags, notes
-            FROM financial_accounts
-            WHERE is_active = 1 AND balance >= ?
-            ORDER BY balance DESC
-        """, (min_saldo,))
+        if max_saldo is not None:
+            cur.execute("""
+                SELECT id, name, type, balance, currency, tags, notes
+                FROM financial_accounts
+                WHERE is_active = 1 AND balance BETWEEN ? AND ?
+                ORDER BY balance DESC
+            """, (min_saldo, max_saldo))
+        else:
+            cur.execute("""
+                SELECT id, name, type, balance, currency, tags, notes
+                FROM financial_accounts
+                WHERE is_active = 1 AND balance >= ?
+                ORDER BY balance DESC
+            """, (min_saldo,))
 
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+        rows = [dict(r) for r in cur.fetchall()]
     return rows
 
 # ========================================
 # 📊 FUNCIONES PARA HISTORIAL/DASHBOARD
 # ========================================
 
-def obtener_resumen_ganancias(fecha_inicio: str = None, fecha_fin: str = None) -> dict:
-    """Obtiene resumen de ganancias en un rango de fechas"""
-    conn = get_connection()
-    cur = conn.cursor()
-
-    where_clause = ""
-    params = []
-
+def reconstruir_resumen_diario() -> int:
+    """
+    Recalcula daily_summary desde recharges y remittances.
+    Los triggers lo mantienen solo; esto es para reparar o tras importar
+    con triggers desactivados (también: python main.py --reconstruir-resumen).
+    """
+    with conexion() as conn:
+        return _reconstruir_resumen_diario(conn)
+
+# Memo de agregados por filtro: (fecha_inicio, fecha_fin) -> (versión, resultado).
+# Un clic en "Aplicar filtros" pide resumen, top y mis ganancias con el mismo
+# filtro; solo el primero consulta. Cualquier escritura cambia la versión.
+_TABLAS_AGREGADOS = ("recharges", "remittances", "workers")
+_MEMO_AGREGADOS_MAX = 32
+_memo_agregados: Dict[Tuple[Optional[str], Optional[str]], Tuple[int, dict]] = {}
+_memo_agregados_lock = threading.Lock()
+
+def obtener_agregados_ganancias(fecha_inicio: str = None, fecha_fin: str = None) -> dict:
+    """
+    ✅ Punto único de agregación para Dashboard/Historial.
+    En UNA consulta sobre daily_summary (agrupada por trabajador y tipo) calcula:
+      • 'resumen': lo mismo que obtener_resumen_ganancias()
+      • 'ranking': todos los trabajadores ordenados por ganancia generada,
+        con la ganancia neta para el dueño (formato de obtener_top_trabajadores)
+    Sin fechas el ranking incluye trabajadores sin movimientos.
+    """
+    clave = (fecha_inicio or None, fecha_fin or None)
+    version = obtener_version_datos(*_TABLAS_AGREGADOS)
+    with _memo_agregados_lock:
+        memo = _memo_agregados.get(clave)
+    if memo is not None and memo[0] == version:
+        return copy.deepcopy(memo[1])
+
+    condicion = ""
+    params: list = []
     if fecha_inicio and fecha_fin:
-        where_clause = "WHERE date BETWEEN ? AND ?"
+        condicion = "AND s.date BETWEEN ? AND ?"
         params = [fecha_inicio, fecha_fin]
     elif fecha_inicio:
-        where_clause = "WHERE date >= ?"
+        condicion = "AND s.date >= ?"
         params = [fecha_inicio]
     elif fecha_fin:
-        where_clause = "WHERE date <= ?"
+        condicion = "AND s.date <= ?"
         params = [fecha_fin]
 
-    # Obtener recargas en el periodo
-    recargas_query = f"""
-        SELECT
-            COUNT(*) as total_recargas,
-            COALESCE(SUM(amount_received_usd), 0) as total_recibido_usd,
-            COALESCE(SUM(profit_usd), 0) as ganancia_recargas_usd,
-            COALESCE(SUM(seller_commission_usd), 0) as comisiones_recargas_usd
-        FROM recharges
-        {where_clause}
-    """
-    cur.execute(recargas_query, params)
-    recargas = dict(cur.fetchone() or {})
-
-    # Obtener remesas en el periodo
-    remesas_query = f"""
-        SELECT
-            COUNT(*) as total_remesas,
-            COALESCE(SUM(amount_origin), 0) as total_origin,
-            COALESCE(SUM(profit_net_usdt), 0) as ganancia_remesas_usdt,
-            COALESCE(SUM(seller_commission_usdt), 0) as comisiones_remesas_usdt,
-            COALESCE(SUM(amount_destiny_bs), 0) as total_destiny_bs
-        FROM remittances
-        {where_clause}
-    """
-    cur.execute(remesas_query, params)
-    remesas = dict(cur.fetchone() or {})
-
-    conn.close()
-
-    # Calcular totales
-    total_recargas = recargas.get('total_recargas', 0) or 0
-    total_remesas = remesas.get('total_remesas', 0) or 0
-
-    ganancia_recargas = recargas.get('ganancia_recargas_usd', 0) or 0
-    ganancia_remesas = remesas.get('ganancia_remesas_usdt', 0) or 0
+    with conexion() as conn:
+        filas = conn.execute(f"""
+            SELECT
+                w.id, w.name, s.kind,
+                COALESCE(SUM(s.count), 0) as cantidad,
+                COALESCE(SUM(s.amount), 0) as monto,
+                COALESCE(SUM(s.amount_bs), 0) as monto_bs,
+                COALESCE(SUM(s.profit), 0) as ganancia,
+                COALESCE(SUM(s.commission), 0) as comision
+            FROM workers w
+            LEFT JOIN daily_summary s ON s.worker_id = w.id {condicion}
+            GROUP BY w.id, s.kind
+        """, params).fetchall()
+
+    recargas = {'total_recargas': 0, 'total_recibido_usd': 0,
+                'ganancia_recargas_usd': 0, 'comisiones_recargas_usd': 0}
+    remesas = {'total_remesas': 0, 'total_origin': 0, 'ganancia_remesas_usdt': 0,
+               'comisiones_remesas_usdt': 0, 'total_destiny_bs': 0}
+    por_trabajador: Dict[int, dict] = {}
+
+    for f in filas:
+        trabajador = por_trabajador.setdefault(f['id'], {
+            'id': f['id'], 'nombre': f['name'], 'total_recargas': 0, 'total_remesas': 0,
+            'venta_recargas_usd': 0, 'venta_remesas_origen': 0,
+            'ganancia_generada': 0, 'comisiones_ganadas': 0,
+        })
+        if f['kind'] == 'RECARGA':
+            recargas['total_recargas'] += f['cantidad']
+            recargas['total_recibido_usd'] += f['monto']
+            recargas['ganancia_recargas_usd'] += f['ganancia']
+            recargas['comisiones_recargas_usd'] += f['comision']
+            trabajador['total_recargas'] = f['cantidad']
+            trabajador['venta_recargas_usd'] = f['monto']
+        elif f['kind'] == 'REMESA':
+            remesas['total_remesas'] += f['cantidad']
+            remesas['total_origin'] += f['monto']
+            remesas['ganancia_remesas_usdt'] += f['ganancia']
+            remesas['comisiones_remesas_usdt'] += f['comision']
+            remesas['total_destiny_bs'] += f['monto_bs']
+            trabajador['total_remesas'] = f['cantidad']
+            trabajador['venta_remesas_origen'] = f['monto']
+        trabajador['ganancia_generada'] += f['ganancia']
+        trabajador['comisiones_ganadas'] += f['comision']
+
+    ranking = []
+    for t in por_trabajador.values():
+        t['total_transacciones'] = t['total_recargas'] + t['total_remesas']
+        if not t['nombre'] or (condicion and not t['total_transacciones']):
+            continue  # Con filtro de fechas solo aparecen quienes tuvieron movimientos
+        t['ganancia_neta_para_dueño'] = t['ganancia_generada'] - t['comisiones_ganadas']
+        ranking.append(t)
+    ranking.sort(key=lambda x: x['ganancia_generada'], reverse=True)
+
+    ganancia_recargas = recargas['ganancia_recargas_usd']
+    ganancia_remesas = remesas['ganancia_remesas_usdt']
+    comisiones_recargas = recargas['comisiones_recargas_usd']
+    comisiones_remesas = remesas['comisiones_remesas_usdt']
+
+    resultado = {
+        'resumen': {
+            'recargas': recargas,
+            'remesas': remesas,
+            'total_transacciones': recargas['total_recargas'] + remesas['total_remesas'],
+            'total_recargas': recargas['total_recargas'],
+            'total_remesas': remesas['total_remesas'],
+            'ganancia_total_usd': ganancia_recargas,
+            'ganancia_total_usdt': ganancia_remesas,
+            'comisiones_total_usd': comisiones_recargas,
+            'comisiones_total_usdt': comisiones_remesas,
+            'ganancia_neta_dueño_usd': ganancia_recargas - comisiones_recargas,
+            'ganancia_neta_dueño_usdt': ganancia_remesas - comisiones_remesas,
+            'total_destiny_bs': remesas['total_destiny_bs'],
+            'total_recibido_usd': recargas['total_recibido_usd'],
+            'total_origin': remesas['total_origin']
+        },
+        'ranking': ranking,
+    }
 
-    comisiones_recargas = recargas.get('comisiones_recargas_usd', 0) or 0
-    comisiones_remesas = remesas.get('comisiones_remesas_usdt', 0) or 0
+    with _memo_agregados_lock:
+        _memo_agregados[clave] = (version, resultado)
+        while len(_memo_agregados) > _MEMO_AGREGADOS_MAX:
+            del _memo_agregados[next(iter(_memo_agregados))]  # El más antiguo
+    return copy.deepcopy(resultado)
 
-    return {
-        'recargas': recargas,
-        'remesas': remesas,
-        'total_transacciones': total_recargas + total_remesas,
-        'total_recargas': total_recargas,
-        'total_remesas': total_remesas,
-        'ganancia_total_usd': ganancia_recargas,
-        'ganancia_total_usdt': ganancia_remesas,
-        'comisiones_total_usd': comisiones_recargas,
-        'comisiones_total_usdt': comisiones_remesas,
-        'ganancia_neta_dueño_usd': ganancia_recargas - comisiones_recargas,
-        'ganancia_neta_dueño_usdt': ganancia_remesas - comisiones_remesas,
-        'total_destiny_bs': remesas.get('total_destiny_bs', 0) or 0,
-        'total_recibido_usd': recargas.get('total_recibido_usd', 0) or 0,
-        'total_origin': remesas.get('total_origin', 0) or 0
-    }
+def obtener_resumen_ganancias(fecha_inicio: str = None, fecha_fin: str = None) -> dict:
+    """Obtiene resumen de ganancias en un rango de fechas"""
+    return obtener_agregados_ganancias(fecha_inicio, fecha_fin)['resumen']
 
 def obtener_comisiones_trabajador(worker_id: int, fecha_inicio: str = None, fecha_fin: str = None) -> dict:
     """Calcula comisiones de un trabajador en un periodo"""
-    conn = get_connection()
-    cur = conn.cursor()
-
-    where_clause = "WHERE worker_id = ?"
-    params = [worker_id]
-
-    if fecha_inicio and fecha_fin:
-        where_clause += " AND date BETWEEN ? AND ?"
-        params.extend([fecha_inicio, fecha_fin])
-    elif fecha_inicio:
-        where_clause += " AND date >= ?"
-        params.append(fecha_inicio)
-    elif fecha_fin:
-        where_clause += " AND date <= ?"
-        params.append(fecha_fin)
-
-    # Comisiones de recargas
-    recargas_query = f"""
-        SELECT
-            COUNT(*) as recargas_count,
-            COALESCE(SUM(amount_received_usd), 0) as total_recibido_usd,
-            COALESCE(SUM(seller_commission_usd), 0) as comisiones_recargas_usd,
-            COALESCE(SUM(profit_usd), 0) as ganancia_total_recargas_usd
-        FROM recharges
-        {where_clause}
-    """
-    cur.execute(recargas_query, params)
-    recargas = dict(cur.fetchone() or {})
-
-    # Comisiones de remesas
-    remesas_query = f"""
-        SELECT
-            COUNT(*) as remesas_count,
-            COALESCE(SUM(amount_origin), 0) as total_origin,
-            COALESCE(SUM(seller_commission_usdt), 0) as comisiones_remesas_usdt,
-            COALESCE(SUM(profit_net_usdt), 0) as ganancia_total_remesas_usdt
-        FROM remittances
-        {where_clause}
-    """
-    cur.execute(remesas_query, params)
-    remesas = dict(cur.fetchone() or {})
+    with conexion() as conn:
+        cur = conn.cursor()
+
+        where_clause = "WHERE worker_id = ?"
+        params = [worker_id]
+        # Solo se usan sumas: salen de daily_summary (índice worker_id, date)
+
+        if fecha_inicio and fecha_fin:
+            where_clause += " AND date BETWEEN ? AND ?"
+            params.extend([fecha_inicio, fecha_fin])
+        elif fecha_inicio:
+            where_clause += " AND date >= ?"
+            params.append(fecha_inicio)
+        elif fecha_fin:
+            where_clause += " AND date <= ?"
+            params.append(fecha_fin)
+
+        # Comisiones de recargas
+        recargas_query = f"""
+            SELECT
+                COALESCE(SUM(count), 0) as recargas_count,
+                COALESCE(SUM(amount), 0) as total_recibido_usd,
+                COALESCE(SUM(commission), 0) as comisiones_recargas_usd,
+                COALESCE(SUM(profit), 0) as ganancia_total_recargas_usd
+            FROM daily_summary
+            {where_clause} AND kind = 'RECARGA'
+        """
+        cur.execute(recargas_query, params)
+        recargas = dict(cur.fetchone() or {})
 
-    conn.close()
+        # Comisiones de remesas
+        remesas_query = f"""
+            SELECT
+                COALESCE(SUM(count), 0) as remesas_count,
+                COALESCE(SUM(amount), 0) as total_origin,
+                COALESCE(SUM(commission), 0) as comisiones_remesas_usdt,
+                COALESCE(SUM(profit), 0) as ganancia_total_remesas_usdt
+            FROM daily_summary
+            {where_clause} AND kind = 'REMESA'
+        """
+        cur.execute(remesas_query, params)
+        remesas = dict(cur.fetchone() or {})
 
     # Obtener nombre del trabajador
-    trabajadores = listar_trabajadores_activos()
-    nombre_trabajador = next((w['name'] for w in trabajadores if w['id'] == worker_id), f"Trabajador #{worker_id}")
+    nombre_trabajador = (obtener_catalogo("trabajadores").nombre_por_id(worker_id)
+                         or f"Trabajador #{worker_id}")
 
     return {
         'worker_id': worker_id,
@@ -1629,36 +2729,70 @@ def obtener_comisiones_trabajador(worker_id: int, fecha_inicio: str = None, fech
         'ganancia_generada_usdt': (remesas.get('ganancia_total_remesas_usdt', 0) or 0)
     }
 
-def obtener_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str = None,
-                                    worker_id: Optional[int] = None,
-                                    tipo: Optional[str] = None) -> list:
-    """Obtiene TODAS las transacciones (recargas + remesas) filtradas"""
-    conn = get_connection()
-    cur = conn.cursor()
-
-    transacciones = []
-
-    # Construir WHERE clause para recargas
-    where_recargas = []
-    params_recargas = []
-
-    if fecha_inicio and fecha_fin:
-        where_recargas.append("r.date BETWEEN ? AND ?")
-        params_recargas.extend([fecha_inicio, fecha_fin])
-
-    if worker_id:
-        where_recargas.append("r.worker_id = ?")
-        params_recargas.append(worker_id)
-
-    where_recargas_sql = " AND ".join(where_recargas) if where_recargas else "1=1"
+def _sql_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str = None,
+                                  worker_id: Optional[int] = None,
+                                  tipo: Optional[str] = None,
+                                  country_id: Optional[int] = None,
+                                  payment_method_id: Optional[int] = None,
+                                  game_id: Optional[int] = None,
+                                  currency_id: Optional[int] = None,
+                                  cursor: Optional[Tuple[str, int, str]] = None,
+                                  limite: Optional[int] = None) -> Tuple[Optional[str], list]:
+    """
+    Construye el UNION ALL de recargas + remesas con TODOS los filtros en el WHERE.
+    Retorna (sql_sin_order_by, params) o (None, []) si ningún tipo aplica.
+
+    • game_id solo existe en recargas → con ese filtro se omiten las remesas
+    • currency_id solo existe en remesas → con ese filtro se omiten las recargas
+    • cursor (date, id, tipo) + limite → cada rama devuelve solo las `limite`
+      filas siguientes al cursor, recorriendo el índice (date, id)
+    """
+    tipo = tipo.upper() if tipo else None
+    incluir_recargas = tipo != "REMESA" and currency_id is None
+    incluir_remesas = tipo != "RECARGA" and game_id is None
+
+    def _where(extra: list[tuple[str, Any]], tipo_rama: str) -> Tuple[str, list]:
+        condiciones = []
+        params = []
+
+        if cursor is not None:
+            condiciones.append(f"(r.date, r.id, '{tipo_rama}') < (?, ?, ?)")
+            params.extend(cursor)
+
+        if fecha_inicio and fecha_fin:
+            condiciones.append("r.date BETWEEN ? AND ?")
+            params.extend([fecha_inicio, fecha_fin])
+        elif fecha_inicio:
+            condiciones.append("r.date >= ?")
+            params.append(fecha_inicio)
+        elif fecha_fin:
+            condiciones.append("r.date <= ?")
+            params.append(fecha_fin)
+
+        for columna, valor in [("r.worker_id", worker_id),
+                               ("r.country_id", country_id),
+                               ("r.payment_method_id", payment_method_id)] + extra:
+            if valor is not None:
+                condiciones.append(f"{columna} = ?")
+                params.append(valor)
+
+        return (" AND ".join(condiciones) if condiciones else "1=1"), params
+
+    def _limitar(sql_rama: str) -> str:
+        if limite is None:
+            return sql_rama
+        return f"SELECT * FROM ({sql_rama} ORDER BY r.date DESC, r.id DESC LIMIT ?)"
+
+    partes = []
+    params = []
 
-    # Si tipo es específico y no es "RECARGA", saltar recargas
-    if tipo not in ["REMESA", "remesa"]:
-        recargas_query = f"""
+    if incluir_recargas:
+        where_sql, where_params = _where([("r.game_id", game_id)], "RECARGA")
+        partes.append(_limitar(f"""
             SELECT
                 'RECARGA' as tipo,
-                r.id,
-                r.date,
+                r.id as id,
+                r.date as date,
                 w.name as worker_name,
                 c.name as country_name,
                 g.name as game_name,
@@ -1686,35 +2820,19 @@ def obtener_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str =
             LEFT JOIN games g ON r.game_id = g.id
             LEFT JOIN products p ON r.product_id = p.id
             LEFT JOIN payment_methods pm ON r.payment_method_id = pm.id
-            WHERE {where_recargas_sql}
-            ORDER BY r.date DESC, r.id DESC
-        """
-
-        cur.execute(recargas_query, params_recargas)
-        for row in cur.fetchall():
-            transacciones.append(dict(row))
-
-    # Construir WHERE clause para remesas
-    where_remesas = []
-    params_remesas = []
-
-    if fecha_inicio and fecha_fin:
-        where_remesas.append("r.date BETWEEN ? AND ?")
-        params_remesas.extend([fecha_inicio, fecha_fin])
-
-    if worker_id:
-        where_remesas.append("r.worker_id = ?")
-        params_remesas.append(worker_id)
-
-    where_remesas_sql = " AND ".join(where_remesas) if where_remesas else "1=1"
-
-    # Si tipo es específico y no es "REMESA", saltar remesas
-    if tipo not in ["RECARGA", "recarga"]:
-        remesas_query = f"""
+            WHERE {where_sql}
+        """))
+        params.extend(where_params)
+        if limite is not None:
+            params.append(limite)
+
+    if incluir_remesas:
+        where_sql, where_params = _where([("r.currency_id", currency_id)], "REMESA")
+        partes.append(_limitar(f"""
             SELECT
                 'REMESA' as tipo,
-                r.id,
-                r.date,
+                r.id as id,
+                r.date as date,
                 w.name as worker_name,
                 c.name as country_name,
                 NULL as game_name,
@@ -1741,166 +2859,220 @@ def obtener_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str =
             LEFT JOIN countries c ON r.country_id = c.id
             LEFT JOIN payment_methods pm ON r.payment_method_id = pm.id
             LEFT JOIN currencies cu ON r.currency_id = cu.id
-            WHERE {where_remesas_sql}
-            ORDER BY r.date DESC, r.id DESC
-        """
-
-        cur.execute(remesas_query, params_remesas)
-        for row in cur.fetchall():
-            transacciones.append(dict(row))
-
-    conn.close()
+            WHERE {where_sql}
+        """))
+        params.extend(where_params)
+        if limite is not None:
+            params.append(limite)
 
-    # Ordenar todas las transacciones por fecha
-    transacciones.sort(key=lambda x: (x['date'], x['id']), reverse=True)
+    if not partes:
+        return None, []
 
-    return transacciones
+    return " UNION ALL ".join(partes), params
 
-def obtener_ganancias_por_dia(dias: int = 7) -> list:
-    """Obtiene ganancias diarias de los últimos N días"""
-    conn = get_connection()
-    cur = conn.cursor()
+def obtener_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str = None,
+                                    worker_id: Optional[int] = None,
+                                    tipo: Optional[str] = None,
+                                    country_id: Optional[int] = None,
+                                    payment_method_id: Optional[int] = None,
+                                    game_id: Optional[int] = None,
+                                    currency_id: Optional[int] = None) -> list:
+    """
+    Obtiene TODAS las transacciones (recargas + remesas) filtradas.
+    Una sola consulta UNION ALL ordenada por SQLite (fecha e id descendentes).
+    """
+    sql, params = _sql_transacciones_combinadas(
+        fecha_inicio, fecha_fin, worker_id, tipo,
+        country_id, payment_method_id, game_id, currency_id
+    )
+    if sql is None:
+        return []
 
-    # Calcular fecha de inicio
-    fecha_inicio = (datetime.now() - timedelta(days=dias)).strftime("%Y-%m-%d")
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(f"{sql} ORDER BY date DESC, id DESC", params)
+        transacciones = [dict(row) for row in cur.fetchall()]
 
-    # Recargas por día
-    recargas_query = """
-        SELECT
-            date,
-            COALESCE(SUM(profit_usd), 0) as ganancia_usd,
-            COALESCE(SUM(seller_commission_usd), 0) as comisiones_usd
-        FROM recharges
-        WHERE date >= ?
-        GROUP BY date
-        ORDER BY date
-    """
+    return transacciones
 
-    cur.execute(recargas_query, (fecha_inicio,))
-    recargas_por_dia = {row['date']: dict(row) for row in cur.fetchall()}
+def contar_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str = None,
+                                    worker_id: Optional[int] = None,
+                                    tipo: Optional[str] = None,
+                                    country_id: Optional[int] = None,
+                                    payment_method_id: Optional[int] = None,
+                                    game_id: Optional[int] = None,
+                                    currency_id: Optional[int] = None) -> int:
+    """Cantidad de transacciones con los filtros de obtener_transacciones_combinadas()"""
+    sql, params = _sql_transacciones_combinadas(
+        fecha_inicio, fecha_fin, worker_id, tipo,
+        country_id, payment_method_id, game_id, currency_id
+    )
+    if sql is None:
+        return 0
 
-    # Remesas por día
-    remesas_query = """
-        SELECT
-            date,
-            COALESCE(SUM(profit_net_usdt), 0) as ganancia_usdt,
-            COALESCE(SUM(seller_commission_usdt), 0) as comisiones_usdt
-        FROM remittances
-        WHERE date >= ?
-        GROUP BY date
-        ORDER BY date
-    """
-
-    cur.execute(remesas_query, (fecha_inicio,))
-    remesas_por_dia = {row['date']: dict(row) for row in cur.fetchall()}
-
-    conn.close()
-
-    # Combinar resultados
-    resultados = []
-    todas_fechas = set(list(recargas_por_dia.keys()) + list(remesas_por_dia.keys()))
-
-    for fecha in sorted(todas_fechas):
-        recarga = recargas_por_dia.get(fecha, {'ganancia_usd': 0, 'comisiones_usd': 0})
-        remesa = remesas_por_dia.get(fecha, {'ganancia_usdt': 0, 'comisiones_usdt': 0})
-
-        resultados.append({
-            'fecha': fecha,
-            'ganancia_recargas': recarga['ganancia_usd'],
-            'comisiones_recargas': recarga['comisiones_usd'],
-            'ganancia_remesas': remesa['ganancia_usdt'],
-            'comisiones_remesas': remesa['comisiones_usdt'],
-            'ganancia_total': recarga['ganancia_usd'] + remesa['ganancia_usdt'],
-            'comisiones_total': recarga['comisiones_usd'] + remesa['comisiones_usdt'],
-            'ganancia_neta': (recarga['ganancia_usd'] + remesa['ganancia_usdt']) -
-                            (recarga['comisiones_usd'] + remesa['comisiones_usdt'])
-        })
+    with conexion() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
 
-    return resultados
+def iterar_transacciones_combinadas(fecha_inicio: str = None, fecha_fin: str = None,
+                                    worker_id: Optional[int] = None,
+                                    tipo: Optional[str] = None,
+                                    country_id: Optional[int] = None,
+                                    payment_method_id: Optional[int] = None,
+                                    game_id: Optional[int] = None,
+                                    currency_id: Optional[int] = None,
+                                    tamano_lote: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Igual que obtener_transacciones_combinadas() pero entrega las filas de a
+    una, leyendo de a `tamano_lote` con fetchmany (memoria constante).
+
+    Usa una conexión de lectura PROPIA: el generador puede quedar a medias
+    sin dejar abierta una transacción en la conexión compartida del hilo.
+    """
+    sql, params = _sql_transacciones_combinadas(
+        fecha_inicio, fecha_fin, worker_id, tipo,
+        country_id, payment_method_id, game_id, currency_id
+    )
+    if sql is None:
+        return
 
-def obtener_top_trabajadores(limite: int = 5, fecha_inicio: str = None, fecha_fin: str = None) -> list:
-    """Obtiene los trabajadores más productivos"""
     conn = get_connection()
-    cur = conn.cursor()
-
-    where_clause = ""
-    params = []
-
-    if fecha_inicio and fecha_fin:
-        where_clause = "WHERE date BETWEEN ? AND ?"
-        params = [fecha_inicio, fecha_fin]
+    try:
+        cur = conn.execute(f"{sql} ORDER BY date DESC, id DESC", params)
+        while True:
+            filas = cur.fetchmany(tamano_lote)
+            if not filas:
+                break
+            for fila in filas:
+                yield dict(fila)
+    finally:
+        conn.close()
 
-    # Recargas por trabajador
-    recargas_query = f"""
-        SELECT
-            w.id,
-            w.name,
-            COUNT(r.id) as total_recargas,
-            COALESCE(SUM(r.amount_received_usd), 0) as venta_recargas_usd,
-            COALESCE(SUM(r.profit_usd), 0) as ganancia_recargas_usd,
-            COALESCE(SUM(r.seller_commission_usd), 0) as comisiones_recargas_usd
-        FROM workers w
-        LEFT JOIN recharges r ON w.id = r.worker_id {where_clause}
-        GROUP BY w.id, w.name
-    """
-
-    cur.execute(recargas_query, params)
-    recargas_trabajadores = {row['id']: dict(row) for row in cur.fetchall()}
-
-    # Remesas por trabajador
-    remesas_query = f"""
+def obtener_transacciones_pagina(limite: int = 200,
+                                 cursor: Optional[Tuple[str, int, str]] = None,
+                                 fecha_inicio: str = None, fecha_fin: str = None,
+                                 worker_id: Optional[int] = None,
+                                 tipo: Optional[str] = None,
+                                 country_id: Optional[int] = None,
+                                 payment_method_id: Optional[int] = None,
+                                 game_id: Optional[int] = None,
+                                 currency_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Página keyset de transacciones combinadas, mismos filtros que
+    obtener_transacciones_combinadas().
+    Retorna {'filas': [...], 'cursor': (date, id, tipo) | None}; cursor None = no hay más.
+    """
+    sql, params = _sql_transacciones_combinadas(
+        fecha_inicio, fecha_fin, worker_id, tipo,
+        country_id, payment_method_id, game_id, currency_id,
+        cursor=cursor, limite=limite + 1
+    )
+    if sql is None:
+        return {'filas': [], 'cursor': None}
+
+    with conexion() as conn:
+        cur = conn.cursor()
+        # tipo desempata recargas y remesas con la misma (fecha, id)
+        cur.execute(f"{sql} ORDER BY date DESC, id DESC, tipo DESC LIMIT ?",
+                    params + [limite + 1])
+        filas = [dict(row) for row in cur.fetchall()]
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = (ultima['date'], ultima['id'], ultima['tipo'])
+    return {'filas': filas, 'cursor': siguiente}
+
+# Agrupaciones de la serie: (inicio del periodo que contiene la fecha X, periodo siguiente)
+_AGRUPACIONES_SERIE = {
+    "dia": ("date({x})", "date({x}, '+1 day')"),
+    "semana": ("date({x}, '-6 days', 'weekday 1')", "date({x}, '+7 days')"),  # Semanas de lunes
+    "mes": ("date({x}, 'start of month')", "date({x}, '+1 month')"),
+}
+
+# Columnas que retorna obtener_serie_ganancias (además de 'periodo')
+_COLUMNAS_SERIE = ("recargas", "remesas", "ganancia_recargas", "comisiones_recargas",
+                   "ganancia_remesas", "comisiones_remesas", "ganancia_total",
+                   "comisiones_total", "ganancia_neta")
+
+def obtener_serie_ganancias(fecha_inicio: str, fecha_fin: str, agrupacion: str = "dia") -> Dict[str, tuple]:
+    """
+    Serie de ganancias y comisiones por día / semana / mes entre dos fechas
+    (ambas incluidas), en una sola consulta sobre daily_summary.
+
+    Los periodos salen de un calendario generado con un CTE recursivo, así que
+    los periodos sin ventas aparecen con 0. Retorna columnas en vez de filas:
+    {'periodo': (...), 'ganancia_total': (...), ...} (ver _COLUMNAS_SERIE);
+    'periodo' es la fecha en que empieza cada periodo.
+    """
+    if agrupacion not in _AGRUPACIONES_SERIE:
+        raise ValueError(f"Agrupación no válida: '{agrupacion}' (usa {', '.join(_AGRUPACIONES_SERIE)})")
+    inicio_periodo, siguiente_periodo = _AGRUPACIONES_SERIE[agrupacion]
+
+    consulta = f"""
+        WITH RECURSIVE calendario(periodo) AS (
+            SELECT {inicio_periodo.format(x=':inicio')} WHERE date(:inicio) <= date(:fin)
+            UNION ALL
+            SELECT {siguiente_periodo.format(x='periodo')}
+            FROM calendario
+            WHERE {siguiente_periodo.format(x='periodo')} <= date(:fin)
+        ),
+        totales AS (
+            SELECT
+                {inicio_periodo.format(x='date')} AS periodo,
+                SUM(CASE WHEN kind = 'RECARGA' THEN count ELSE 0 END) AS recargas,
+                SUM(CASE WHEN kind = 'REMESA' THEN count ELSE 0 END) AS remesas,
+                SUM(CASE WHEN kind = 'RECARGA' THEN profit ELSE 0 END) AS ganancia_recargas,
+                SUM(CASE WHEN kind = 'RECARGA' THEN commission ELSE 0 END) AS comisiones_recargas,
+                SUM(CASE WHEN kind = 'REMESA' THEN profit ELSE 0 END) AS ganancia_remesas,
+                SUM(CASE WHEN kind = 'REMESA' THEN commission ELSE 0 END) AS comisiones_remesas
+            FROM daily_summary
+            WHERE date >= :inicio AND date < date(:fin, '+1 day')
+            GROUP BY 1
+        )
         SELECT
-            w.id,
-            w.name,
-            COUNT(rm.id) as total_remesas,
-            COALESCE(SUM(rm.amount_origin), 0) as venta_remesas_origen,
-            COALESCE(SUM(rm.profit_net_usdt), 0) as ganancia_remesas_usdt,
-            COALESCE(SUM(rm.seller_commission_usdt), 0) as comisiones_remesas_usdt
-        FROM workers w
-        LEFT JOIN remittances rm ON w.id = rm.worker_id {where_clause}
-        GROUP BY w.id, w.name
-    """
-
-    cur.execute(remesas_query, params)
-    remesas_trabajadores = {row['id']: dict(row) for row in cur.fetchall()}
-
-    conn.close()
-
-    # Combinar resultados
-    resultados = []
-    todos_ids = set(list(recargas_trabajadores.keys()) + list(remesas_trabajadores.keys()))
-
-    for worker_id in todos_ids:
-        rec = recargas_trabajadores.get(worker_id, {'name': '', 'total_recargas': 0, 'venta_recargas_usd': 0,
-                                                    'ganancia_recargas_usd': 0, 'comisiones_recargas_usd': 0})
-        rem = remesas_trabajadores.get(worker_id, {'name': '', 'total_remesas': 0, 'venta_remesas_origen': 0,
-                                                  'ganancia_remesas_usdt': 0, 'comisiones_remesas_usdt': 0})
-
-        nombre = rec['name'] or rem['name']
-        if not nombre:
-            continue
-
-        total_transacciones = (rec['total_recargas'] or 0) + (rem['total_remesas'] or 0)
-        ganancia_total = (rec['ganancia_recargas_usd'] or 0) + (rem['ganancia_remesas_usdt'] or 0)
-        comisiones_total = (rec['comisiones_recargas_usd'] or 0) + (rem['comisiones_remesas_usdt'] or 0)
-
-        resultados.append({
-            'id': worker_id,
-            'nombre': nombre,
-            'total_transacciones': total_transacciones,
-            'total_recargas': rec['total_recargas'] or 0,
-            'total_remesas': rem['total_remesas'] or 0,
-            'venta_recargas_usd': rec['venta_recargas_usd'] or 0,
-            'venta_remesas_origen': rem['venta_remesas_origen'] or 0,
-            'ganancia_generada': ganancia_total,
-            'comisiones_ganadas': comisiones_total,
-            'ganancia_neta_para_dueño': ganancia_total - comisiones_total
-        })
+            c.periodo,
+            COALESCE(t.recargas, 0),
+            COALESCE(t.remesas, 0),
+            COALESCE(t.ganancia_recargas, 0),
+            COALESCE(t.comisiones_recargas, 0),
+            COALESCE(t.ganancia_remesas, 0),
+            COALESCE(t.comisiones_remesas, 0),
+            COALESCE(t.ganancia_recargas + t.ganancia_remesas, 0),
+            COALESCE(t.comisiones_recargas + t.comisiones_remesas, 0),
+            COALESCE(t.ganancia_recargas + t.ganancia_remesas
+                     - t.comisiones_recargas - t.comisiones_remesas, 0)
+        FROM calendario c
+        LEFT JOIN totales t ON t.periodo = c.periodo
+        ORDER BY c.periodo
+    """
+
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute(consulta, {"inicio": fecha_inicio, "fin": fecha_fin})
+        filas = cur.fetchall()
+
+    # Filas -> columnas (tuplas, sin un dict por periodo)
+    columnas = list(zip(*filas)) if filas else [()] * (len(_COLUMNAS_SERIE) + 1)
+    return dict(zip(("periodo",) + _COLUMNAS_SERIE, columnas))
 
-    # Ordenar por ganancia generada (descendente)
-    resultados.sort(key=lambda x: x['ganancia_generada'], reverse=True)
+def obtener_ganancias_por_dia(dias: int = 7) -> list:
+    """Obtiene ganancias diarias de los últimos N días (días sin ventas en 0)"""
+    hoy = datetime.now()
+    serie = obtener_serie_ganancias(
+        (hoy - timedelta(days=dias)).strftime("%Y-%m-%d"), hoy.strftime("%Y-%m-%d"), "dia"
+    )
+    claves = ("fecha", "ganancia_recargas", "comisiones_recargas", "ganancia_remesas",
+              "comisiones_remesas", "ganancia_total", "comisiones_total", "ganancia_neta")
+    return [dict(zip(claves, valores)) for valores in zip(
+        serie["periodo"], *(serie[c] for c in claves[1:])
+    )]
 
-    return resultados[:limite]
+def obtener_top_trabajadores(limite: int = 5, fecha_inicio: str = None, fecha_fin: str = None) -> list:
+    """Obtiene los trabajadores más productivos (filtra por fechas solo con ambas)"""
+    if not (fecha_inicio and fecha_fin):
+        fecha_inicio = fecha_fin = None
+    return obtener_agregados_ganancias(fecha_inicio, fecha_fin)['ranking'][:limite]
 
 def obtener_resumen_mensual(mes: int, año: int) -> dict:
     """Obtiene resumen de un mes específico"""
@@ -12,10 +12,12 @@ gui/admin_panel.py - PANEL ADMINISTRATIVO TRYHARDS
 │ • Conectado a database/operations (CRUD real).
 """
 
+import queue
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 
 from utils.styles import TECH_COLORS
+from gui.ejecutor_consultas import obtener_ejecutor
 from database.operations import (
     # Trabajadores
     listar_trabajadores_activos,
@@ -47,6 +49,7 @@ from database.operations import (
     agregar_moneda,
     editar_moneda,
     eliminar_moneda,
+    obtener_catalogo,
 )
 
 
@@ -72,6 +75,7 @@ class AdminPanel(tk.Frame):
         # Secciones columna izquierda
         self._build_trabajadores_section(left_col)
         self._build_paises_section(left_col)
+        self._build_importacion_section(left_col)
 
         # Secciones columna derecha
         self._build_metodos_pago_section(right_col)
@@ -438,8 +442,7 @@ class AdminPanel(tk.Frame):
         for row in listar_juegos_activos():
             self.tree_juegos.insert("", "end", values=(row["id"], row["name"]))
         # También refrescamos combo de juegos en productos
-        juegos = [row["name"] for row in listar_juegos_activos()]
-        self.combo_prod_juego["values"] = juegos
+        self.combo_prod_juego["values"] = obtener_catalogo("juegos").etiquetas
 
     def _get_juego_seleccionado(self):
         sel = self.tree_juegos.selection()
@@ -583,11 +586,7 @@ class AdminPanel(tk.Frame):
             return
 
         # buscar id de juego
-        game_id = None
-        for row in listar_juegos_activos():
-            if row["name"] == juego_nombre:
-                game_id = row["id"]
-                break
+        game_id = obtener_catalogo("juegos").id_por_nombre(juego_nombre)
 
         agregar_producto(nombre, game_id, precio)
         self.entry_prod_nombre.delete(0, tk.END)
@@ -616,12 +615,7 @@ class AdminPanel(tk.Frame):
             nuevo_precio = float(item[3])
 
         # Buscar id de juego
-        game_id = None
-        if juego_nombre:
-            for row in listar_juegos_activos():
-                if row["name"] == juego_nombre:
-                    game_id = row["id"]
-                    break
+        game_id = obtener_catalogo("juegos").id_por_nombre(juego_nombre) if juego_nombre else None
 
         editar_producto(prod_id, nuevo_nombre, game_id, nuevo_precio)
         self._refrescar_productos()
@@ -742,6 +736,154 @@ class AdminPanel(tk.Frame):
             eliminar_moneda(moneda_id)
             self._refrescar_monedas()
 
+    # =================================
+    # IMPORTACIÓN MASIVA (CSV / EXCEL)
+    # =================================
+    def _build_importacion_section(self, parent):
+        frame = tk.LabelFrame(
+            parent,
+            text="IMPORTAR TRANSACCIONES (CSV / EXCEL)",
+            bg=TECH_COLORS["bg_primary"],
+            fg=TECH_COLORS["text_light"],
+            font=("Segoe UI", 11, "bold"),
+            labelanchor="nw",
+        )
+        frame.pack(fill=tk.X, pady=(0, 10))
+
+        top = tk.Frame(frame, bg=TECH_COLORS["bg_primary"])
+        top.pack(fill=tk.X, padx=10, pady=(5, 5))
+
+        self.btn_importar_recargas = ttk.Button(
+            top, text="📥 Recargas...", command=lambda: self._importar("recarga")
+        )
+        self.btn_importar_remesas = ttk.Button(
+            top, text="📥 Remesas...", command=lambda: self._importar("remesa")
+        )
+        self.btn_importar_recargas.pack(side=tk.LEFT, padx=2)
+        self.btn_importar_remesas.pack(side=tk.LEFT, padx=2)
+
+        # Por defecto primero se valida (simulación) y luego se confirma
+        self.simular_importacion_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            top, text="Validar antes de importar", variable=self.simular_importacion_var
+        ).pack(side=tk.LEFT, padx=(10, 0))
+
+        self.barra_importacion = ttk.Progressbar(frame, mode="indeterminate")
+        self.barra_importacion.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        self.label_importacion = tk.Label(
+            frame,
+            text="Primera fila = encabezados (fecha, trabajador, país, método de pago...)",
+            font=("Segoe UI", 9),
+            bg=TECH_COLORS["bg_primary"],
+            fg=TECH_COLORS["text_light"],
+            anchor="w",
+        )
+        self.label_importacion.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        self._progreso_importacion = queue.Queue()
+
+    def _importar(self, tipo, ruta=None, simular=None):
+        if ruta is None:
+            ruta = filedialog.askopenfilename(
+                title=f"Importar {tipo}s",
+                filetypes=[("CSV o Excel", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")],
+            )
+            if not ruta:
+                return
+        if simular is None:
+            simular = self.simular_importacion_var.get()
+
+        # El importador (y openpyxl) se cargan solo al usarlo
+        from database.importador import importar_transacciones
+
+        self.btn_importar_recargas.config(state="disabled")
+        self.btn_importar_remesas.config(state="disabled")
+        self.barra_importacion.start(15)
+        self.label_importacion.config(text="⏳ Validando..." if simular else "⏳ Importando...")
+
+        ejecutor = obtener_ejecutor(self)
+        ejecutor.enviar(
+            "admin_importacion",
+            importar_transacciones, ruta, tipo,
+            simular=simular,
+            # Se llama desde el hilo de consultas: solo deja el dato en la cola
+            al_progresar=lambda leidas, insertadas: self._progreso_importacion.put((leidas, insertadas)),
+            al_terminar=lambda reporte: self._mostrar_reporte_importacion(tipo, ruta, reporte),
+            al_fallar=self._error_importacion,
+        )
+        self.after(200, self._revisar_progreso_importacion)
+
+    def _revisar_progreso_importacion(self):
+        ultimo = None
+        while not self._progreso_importacion.empty():
+            ultimo = self._progreso_importacion.get_nowait()
+        if ultimo:
+            self.label_importacion.config(
+                text=f"⏳ {ultimo[0]:,} filas leídas, {ultimo[1]:,} insertadas"
+            )
+        if obtener_ejecutor(self).en_curso("admin_importacion"):
+            self.after(200, self._revisar_progreso_importacion)
+
+    def _terminar_importacion(self, texto):
+        self.barra_importacion.stop()
+        self.btn_importar_recargas.config(state="normal")
+        self.btn_importar_remesas.config(state="normal")
+        self.label_importacion.config(text=texto)
+
+    def _error_importacion(self, error):
+        self._terminar_importacion("❌ Importación cancelada")
+        messagebox.showerror("Error", f"No se pudo importar el archivo:\n{error}")
+
+    def _mostrar_reporte_importacion(self, tipo, ruta, reporte):
+        errores = reporte["errores"]
+        detalle = "\n".join(f"Fila {linea}: {msg}" for linea, msg in errores[:15])
+        if len(errores) > 15:
+            detalle += f"\n... y {len(errores) - 15} errores más"
+
+        if reporte["simulacion"]:
+            if reporte["interrumpida"]:
+                linea, motivo = reporte["interrumpida"]
+                self._terminar_importacion("❌ Validación interrumpida")
+                messagebox.showerror(
+                    "Validación", f"No se pudo leer el archivo tras la fila {linea}:\n{motivo}"
+                )
+                return
+            self._terminar_importacion(
+                f"✅ Validación: {reporte['validas']:,} de {reporte['leidas']:,} filas válidas"
+            )
+            mensaje = (f"Filas leídas: {reporte['leidas']:,}\n"
+                       f"Filas válidas: {reporte['validas']:,}\n"
+                       f"Filas con errores: {len(errores):,}")
+            if detalle:
+                mensaje += f"\n\n{detalle}"
+            if not reporte["validas"]:
+                messagebox.showwarning("Validación", mensaje)
+            elif messagebox.askyesno("Validación", f"{mensaje}\n\n¿Importar las filas válidas?"):
+                self._importar(tipo, ruta, simular=False)
+            return
+
+        if reporte["interrumpida"]:
+            # Los lotes ya confirmados no se deshacen: se dice exactamente qué quedó guardado
+            linea, motivo = reporte["interrumpida"]
+            self._terminar_importacion(
+                f"⚠️ Importación interrumpida: {reporte['insertadas']:,} {tipo}s guardadas"
+            )
+            mensaje = (f"La importación se detuvo tras la fila {linea}:\n{motivo}\n\n"
+                       f"Se guardaron {reporte['insertadas']:,} {tipo}s "
+                       f"(hasta la fila {reporte['ultima_linea_guardada']} del archivo).\n"
+                       f"Para completar, importa solo las filas posteriores.")
+            if detalle:
+                mensaje += f"\n\nFilas omitidas ({len(errores):,}):\n{detalle}"
+            messagebox.showwarning("Importación", mensaje)
+            return
+
+        self._terminar_importacion(f"✅ {reporte['insertadas']:,} {tipo}s importadas")
+        mensaje = f"Se importaron {reporte['insertadas']:,} {tipo}s."
+        if detalle:
+            mensaje += f"\n\nFilas omitidas ({len(errores):,}):\n{detalle}"
+        messagebox.showinfo("Importación", mensaje)
+
     # =================================
     # CARGA INICIAL
     # =================================
@@ -0,0 +1,176 @@
+"""
+gui/ejecutor_consultas.py - CONSULTAS A LA BD FUERA DEL HILO DE TK
+│
+│ Propósito:
+│ • Ejecutar funciones de database.operations en un pool de hilos
+│ • Cada hilo usa su propia conexión SQLite (pool por hilo de conexion())
+│ • Entregar los resultados en el hilo de Tk mediante root.after
+│ • Descartar resultados viejos cuando el usuario cambia filtros rápido
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional
+
+from utils.config import SETTINGS
+
+
+class EjecutorConsultas:
+    """
+    Pool de hilos para consultas + entrega segura en el mainloop de Tk.
+
+    Cada envío lleva una 'clave' (p.ej. "filtros", "graficos"); un envío
+    nuevo con la misma clave invalida al anterior, cuyo resultado se descarta.
+    Tk no es thread-safe: los hilos solo dejan resultados en una cola y
+    el hilo de Tk la vacía con after().
+    """
+
+    def __init__(self, widget, max_hilos: int = 2, intervalo_ms: int = 30,
+                 nombre_hilos: str = "consulta_bd"):
+        self.widget = widget
+        self.intervalo_ms = intervalo_ms
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos,
+                                        thread_name_prefix=nombre_hilos)
+        self._resultados: "queue.Queue[tuple]" = queue.Queue()
+        self._generaciones: Dict[str, int] = {}
+        self._futuros: Dict[str, Future] = {}
+        self._pendientes = 0
+        self._revisando = False
+        self._cerrado = False
+
+    # ========================================
+    # 📤 ENVÍO Y CANCELACIÓN
+    # ========================================
+    def enviar(self, clave: str, funcion: Callable, *args,
+               al_terminar: Optional[Callable[[Any], None]] = None,
+               al_fallar: Optional[Callable[[Exception], None]] = None,
+               **kwargs) -> Optional[Future]:
+        """
+        Ejecuta funcion(*args, **kwargs) en segundo plano.
+        al_terminar(resultado) / al_fallar(error) se llaman en el hilo de Tk,
+        solo si este sigue siendo el envío más reciente para 'clave'.
+        """
+        if self._cerrado:
+            return None
+
+        self.cancelar(clave)
+        generacion = self._generaciones.get(clave, 0) + 1
+        self._generaciones[clave] = generacion
+
+        def _tarea():
+            try:
+                resultado = funcion(*args, **kwargs)
+                self._resultados.put((clave, generacion, True, resultado, al_terminar, al_fallar))
+            except Exception as e:
+                self._resultados.put((clave, generacion, False, e, al_terminar, al_fallar))
+
+        futuro = self._pool.submit(_tarea)
+        self._futuros[clave] = futuro
+        self._pendientes += 1
+        futuro.add_done_callback(self._on_futuro_cancelado)
+        self._programar_revision()
+        return futuro
+
+    def cancelar(self, clave: str):
+        """Invalida el envío en curso para 'clave' (y lo quita de la cola si no empezó)"""
+        if clave in self._generaciones:
+            self._generaciones[clave] += 1
+        futuro = self._futuros.pop(clave, None)
+        if futuro is not None:
+            futuro.cancel()
+
+    def en_curso(self, clave: str) -> bool:
+        futuro = self._futuros.get(clave)
+        return futuro is not None and not futuro.done()
+
+    def _on_futuro_cancelado(self, futuro: Future):
+        # Un futuro cancelado nunca llega a la cola: se avisa para el contador
+        if futuro.cancelled():
+            self._resultados.put(None)
+
+    # ========================================
+    # 📥 ENTREGA EN EL HILO DE TK
+    # ========================================
+    def _programar_revision(self):
+        if not self._revisando and not self._cerrado:
+            self._revisando = True
+            self.widget.after(self.intervalo_ms, self._revisar_cola)
+
+    def _revisar_cola(self):
+        self._revisando = False
+        if self._cerrado:
+            return
+
+        while True:
+            try:
+                item = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+
+            self._pendientes -= 1
+            if item is None:
+                continue
+
+            clave, generacion, ok, valor, al_terminar, al_fallar = item
+            if self._generaciones.get(clave) != generacion:
+                continue  # Resultado viejo: el usuario ya pidió otra cosa
+            self._futuros.pop(clave, None)
+
+            try:
+                if ok:
+                    if al_terminar:
+                        al_terminar(valor)
+                elif al_fallar:
+                    al_fallar(valor)
+                else:
+                    print(f"Error en consulta '{clave}': {valor}")
+            except Exception as e:
+                print(f"Error al mostrar resultado de '{clave}': {e}")
+
+        if self._pendientes > 0:
+            self._programar_revision()
+
+    # ========================================
+    # 🔒 CIERRE
+    # ========================================
+    def cerrar(self):
+        """Cancela lo pendiente y deja terminar los hilos del pool"""
+        if self._cerrado:
+            return
+        self._cerrado = True
+        # Al terminar cada hilo se libera su conexión del pool por hilo
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_ejecutor: Optional[EjecutorConsultas] = None
+_ejecutor_exportaciones: Optional[EjecutorConsultas] = None
+
+
+def obtener_ejecutor(widget) -> EjecutorConsultas:
+    """Ejecutor compartido por todas las pestañas (ligado a la ventana raíz)"""
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = EjecutorConsultas(widget.winfo_toplevel(),
+                                      max_hilos=SETTINGS["query_threads"])
+    return _ejecutor
+
+
+def obtener_ejecutor_exportaciones(widget) -> EjecutorConsultas:
+    """
+    Ejecutor de un solo hilo para exportaciones (Excel/CSV): un reporte
+    largo no ocupa los hilos de consultas y los demás esperan en fila.
+    """
+    global _ejecutor_exportaciones
+    if _ejecutor_exportaciones is None:
+        _ejecutor_exportaciones = EjecutorConsultas(widget.winfo_toplevel(), max_hilos=1,
+                                                    nombre_hilos="exportacion")
+    return _ejecutor_exportaciones
+
+
+def cerrar_ejecutor():
+    """Detiene los ejecutores compartidos (llamar al salir de la aplicación)"""
+    global _ejecutor, _ejecutor_exportaciones
+    for ejecutor in (_ejecutor, _ejecutor_exportaciones):
+        if ejecutor is not None:
+            ejecutor.cerrar()
+    _ejecutor = _ejecutor_exportaciones = None
@@ -15,31 +15,27 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import matplotlib
-matplotlib.use('Agg')  # Para compatibilidad con Tkinter
-
 from database.operations import (
-    obtener_transacciones_combinadas,
+    obtener_transacciones_pagina,
     obtener_resumen_ganancias,
     obtener_comisiones_trabajador,
-    obtener_ganancias_por_dia,
-    obtener_top_trabajadores,
-    listar_trabajadores_activos,
-    listar_paises_activos,
+    obtener_serie_ganancias,
+    obtener_agregados_ganancias,
+    obtener_catalogo,
+    obtener_version_datos,
     listar_recargas,
     listar_remesas
 )
-from reports.generator import (
-    exportar_a_excel,
-    exportar_a_pdf,
-    exportar_dashboard,
-    generar_reporte_comisiones
-)
 from utils.helpers import format_currency
 from utils.styles import TECH_COLORS
+from utils.config import SETTINGS
+from database.catalogos import Catalogo
+from gui.tabla_virtual import TablaVirtual
+from gui.ejecutor_consultas import obtener_ejecutor, obtener_ejecutor_exportaciones
+
+# Tablas que alimentan la tabla, el resumen y los gráficos
+_TABLAS_HISTORIAL = ("recharges", "remittances", "workers", "countries",
+                     "games", "products", "payment_methods", "currencies")
 
 class HistorialTab(ttk.Frame):
     def __init__(self, parent, colors):
@@ -58,9 +54,37 @@ class HistorialTab(ttk.Frame):
         self.figuras_graficos = []  # Para mantener referencia a las figuras
         self.canvas_graficos = []   # Para mantener referencia a los canvas
 
+        # Los gráficos se crean una vez y luego solo se actualizan sus barras
+        self._ax_diario = None
+        self._barras_diario = None     # (barras de ganancia, barras de comisiones)
+        self._ax_tipo = None
+        self._barras_tipo = None
+        self._textos_tipo = []
+        self._firma_graficos = None      # Datos ya dibujados (si no cambian no se redibuja)
+        self._graficos_pendientes = None  # Datos que esperan a que la sección se vea
+
         # Caches
-        self.trabajadores = []
-        self.paises = []
+        self.trabajadores = Catalogo([])
+        self.paises = Catalogo([])
+
+        # (versión de datos, fecha) ya mostrada: si no cambia no se recarga
+        self._clave_datos = None
+
+        # Paginación keyset de la tabla (filtros activos + cursor siguiente)
+        self._filtros_tabla = {}
+        self._cursor_tabla = None
+
+        # Consultas a la BD fuera del hilo de Tk
+        self.ejecutor = obtener_ejecutor(parent)
+
+        # Exportaciones en su propio hilo; clave del ejecutor -> descripción
+        self.ejecutor_exportaciones = obtener_ejecutor_exportaciones(parent)
+        self._exportaciones_en_curso = {}
+        self._contador_exportaciones = 0
+
+        # Exportación a PDF en curso (proceso aparte) y momento en que se pidió cancelarla
+        self._exportacion_pdf = None
+        self._cancelacion_pdf_en = None
 
         # Crear canvas con scroll
         self._crear_scrollable_frame()
@@ -103,7 +127,7 @@ class HistorialTab(ttk.Frame):
 
         # Crear ventana en el canvas
         self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self._al_desplazar)
 
         # Empaquetar
         self.canvas.pack(side="left", fill="both", expand=True, padx=0, pady=0)
@@ -366,34 +390,18 @@ class HistorialTab(ttk.Frame):
         tabla_inner_frame = ttk.Frame(tabla_frame)
         tabla_inner_frame.pack(fill="both", expand=True)
 
-        # Treeview con scroll
-        tree_scroll_y = ttk.Scrollbar(
-            tabla_inner_frame,
-            style="Vertical.TScrollbar"
-        )
-        tree_scroll_y.pack(side="right", fill="y")
-
-        tree_scroll_x = ttk.Scrollbar(
-            tabla_inner_frame,
-            orient="horizontal",
-            style="Horizontal.TScrollbar"
-        )
-        tree_scroll_x.pack(side="bottom", fill="x")
-
-        # Definir columnas
+        # Tabla virtual: solo se materializan las filas visibles
         cols = ("id", "fecha", "tipo", "trabajador", "pais", "moneda", "monto", "ganancia", "comision", "notas")
-        self.tree_transacciones = ttk.Treeview(
+        self.tabla_transacciones = TablaVirtual(
             tabla_inner_frame,
-            columns=cols,
-            show="headings",
-            height=12,
-            yscrollcommand=tree_scroll_y.set,
-            xscrollcommand=tree_scroll_x.set,
-            style="Custom.Treeview"
+            cols,
+            formateador=self._formatear_transaccion,
+            altura=12,
+            al_final=self._cargar_siguiente_pagina,
+            xscroll=True
         )
-
-        tree_scroll_y.config(command=self.tree_transacciones.yview)
-        tree_scroll_x.config(command=self.tree_transacciones.xview)
+        self.tabla_transacciones.pack(fill="both", expand=True)
+        self.tree_transacciones = self.tabla_transacciones.tree
 
         # Configurar columnas
         column_widths = {
@@ -423,8 +431,6 @@ class HistorialTab(ttk.Frame):
             self.tree_transacciones.heading(col, text=display_name)
             self.tree_transacciones.column(col, width=column_widths.get(col, 100))
 
-        self.tree_transacciones.pack(side="left", fill="both", expand=True)
-
         # Configurar tags para filas alternadas
         self.tree_transacciones.tag_configure('oddrow', background=self.colors["table_odd"])
         self.tree_transacciones.tag_configure('evenrow', background=self.colors["table_even"])
@@ -451,6 +457,10 @@ class HistorialTab(ttk.Frame):
             padding=15
         )
         graficos_frame.pack(fill="x", padx=20, pady=10)
+        self.graficos_frame = graficos_frame
+
+        # Al mostrarse la pestaña se dibujan los gráficos que quedaron pendientes
+        self.master.bind("<Map>", lambda e: self.after_idle(self._dibujar_graficos_pendientes), add="+")
 
         # Contenedor para gráficos (2 columnas)
         graficos_container = ttk.Frame(graficos_frame)
@@ -698,11 +708,34 @@ class HistorialTab(ttk.Frame):
             command=self._exportar_transacciones_excel
         ).pack(side="left", padx=5, pady=5)
 
-        ttk.Button(
+        self.btn_exportar_pdf = ttk.Button(
             btn_export_frame,
             text="📄 EXPORTAR A PDF",
             command=self._exportar_a_pdf
-        ).pack(side="left", padx=5, pady=5)
+        )
+        self.btn_exportar_pdf.pack(side="left", padx=5, pady=5)
+
+        # Progreso del PDF (se genera en otro proceso)
+        pdf_frame = ttk.Frame(export_frame)
+        pdf_frame.pack(fill="x", pady=(0, 10))
+
+        self.progreso_pdf = ttk.Progressbar(pdf_frame, mode="determinate", maximum=100)
+        self.progreso_pdf.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.lbl_progreso_pdf = ttk.Label(pdf_frame, text="", width=28)
+        self.lbl_progreso_pdf.pack(side="left", padx=5)
+
+        self.btn_cancelar_pdf = ttk.Button(
+            pdf_frame,
+            text="✖ CANCELAR",
+            command=self._cancelar_pdf,
+            state="disabled"
+        )
+        self.btn_cancelar_pdf.pack(side="left", padx=5)
+
+        # Exportaciones a Excel en curso (se generan en segundo plano)
+        self.lbl_exportando = ttk.Label(export_frame, text="")
+        self.lbl_exportando.pack(anchor="w", padx=5)
 
         # Información de exportación - Cambiado a color oscuro
         info_frame = tk.Frame(export_frame, bg=self.colors["bg_primary"])
@@ -726,26 +759,30 @@ class HistorialTab(ttk.Frame):
     # FUNCIONES DE CARGA DE DATOS
     # ========================================
     def _cargar_catalogos(self):
-        """Carga los catálogos necesarios"""
-        try:
-            # Trabajadores
-            self.trabajadores = listar_trabajadores_activos()
-            nombres_trab = ['todos'] + [t['name'] for t in self.trabajadores]
-            self.combo_trabajador['values'] = nombres_trab
-            self.combo_trabajador_comisiones['values'] = [t['name'] for t in self.trabajadores]
+        """Carga los catálogos necesarios (en segundo plano)"""
+        self.ejecutor.enviar(
+            "historial_catalogos",
+            lambda: (obtener_catalogo("trabajadores"), obtener_catalogo("paises")),
+            al_terminar=self._mostrar_catalogos,
+            al_fallar=lambda e: print(f"Error al cargar catálogos: {e}")
+        )
 
-            # Países
-            self.paises = listar_paises_activos()
-            nombres_pais = ['todos'] + [p['name'] for p in self.paises]
-            self.combo_pais['values'] = nombres_pais
+    def _mostrar_catalogos(self, catalogos):
+        """Llena los combos con los catálogos recibidos"""
+        # Trabajadores
+        self.trabajadores, self.paises = catalogos
+        nombres_trab = ['todos'] + self.trabajadores.etiquetas
+        self.combo_trabajador['values'] = nombres_trab
+        self.combo_trabajador_comisiones['values'] = self.trabajadores.etiquetas
 
-        except Exception as e:
-            print(f"Error al cargar catálogos: {e}")
+        # Países
+        nombres_pais = ['todos'] + self.paises.etiquetas
+        self.combo_pais['values'] = nombres_pais
 
     def _cargar_datos_iniciales(self):
         """Carga los datos iniciales al abrir la pestaña"""
+        self._clave_datos = self._clave_datos_actual()
         self._aplicar_filtros()
-        self._actualizar_resumen()
         self._actualizar_graficos()
 
     # ========================================
@@ -759,39 +796,57 @@ class HistorialTab(ttk.Frame):
             fecha_fin = self.fecha_fin_var.get()
             trabajador = self.trabajador_var.get()
             tipo = self.tipo_var.get()
-            pais = self.pais_var.get()
 
             # Convertir trabajador a ID si no es "todos"
-            worker_id = None
-            if trabajador != "todos":
-                for t in self.trabajadores:
-                    if t['name'] == trabajador:
-                        worker_id = t['id']
-                        break
-
-            # Obtener transacciones filtradas
-            transacciones = obtener_transacciones_combinadas(
-                fecha_inicio=fecha_inicio if fecha_inicio else None,
-                fecha_fin=fecha_fin if fecha_fin else None,
-                worker_id=worker_id,
-                tipo=tipo if tipo != "todos" else None
+            worker_id = self.trabajadores.id_por_nombre(trabajador) if trabajador != "todos" else None
+
+            # Convertir país a ID si no es "todos"
+            country_id = self._obtener_country_id_filtro()
+
+            # Obtener la primera página filtrada (el filtro de país se aplica en SQL)
+            self._filtros_tabla = {
+                'fecha_inicio': fecha_inicio if fecha_inicio else None,
+                'fecha_fin': fecha_fin if fecha_fin else None,
+                'worker_id': worker_id,
+                'tipo': tipo if tipo != "todos" else None,
+                'country_id': country_id
+            }
+
+            # Una página pendiente de los filtros anteriores ya no sirve
+            self.ejecutor.cancelar("historial_pagina")
+            self.ejecutor.enviar(
+                "historial_filtros",
+                self._consultar_filtros,
+                dict(self._filtros_tabla),
+                al_terminar=self._mostrar_filtros,
+                al_fallar=lambda e: messagebox.showerror(
+                    "Error", f"No se pudieron aplicar los filtros:\n{str(e)}"
+                )
             )
 
-            # Filtrar por país si es necesario
-            if pais != "todos":
-                transacciones = [t for t in transacciones if t.get('country_name') == pais]
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron aplicar los filtros:\n{str(e)}")
 
-            # Actualizar tabla
-            self._actualizar_tabla(transacciones)
+    @staticmethod
+    def _consultar_filtros(filtros):
+        """(Hilo de consultas) Primera página + resumen y ranking en una sola agregación"""
+        agregados = obtener_agregados_ganancias(filtros['fecha_inicio'], filtros['fecha_fin'])
+        return {
+            'pagina': obtener_transacciones_pagina(SETTINGS["page_size"], **filtros),
+            'resumen': agregados['resumen'],
+            'top': agregados['ranking'][:1]
+        }
 
-            # Actualizar resumen con los mismos filtros
-            self._actualizar_resumen(fecha_inicio, fecha_fin, worker_id)
+    def _mostrar_filtros(self, datos):
+        """(Hilo de Tk) Pinta tabla, resumen y mis ganancias"""
+        self._actualizar_tabla(datos['pagina']["filas"], datos['pagina']["cursor"])
+        self._mostrar_resumen(datos['resumen'], datos['top'])
+        self._mostrar_mis_ganancias(datos['resumen'])
 
-            # Actualizar mis ganancias
-            self._actualizar_mis_ganancias(fecha_inicio, fecha_fin)
-
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron aplicar los filtros:\n{str(e)}")
+    def _obtener_country_id_filtro(self):
+        """Convierte el país del filtro a ID (None si es "todos")"""
+        pais = self.pais_var.get()
+        return self.paises.id_por_nombre(pais) if pais != "todos" else None
 
     def _limpiar_filtros(self):
         """Limpia todos los filtros"""
@@ -831,60 +886,75 @@ class HistorialTab(ttk.Frame):
     # ========================================
     # FUNCIONES DE TABLA
     # ========================================
-    def _actualizar_tabla(self, transacciones):
-        """Actualiza la tabla con las transacciones proporcionadas"""
-        # Limpiar tabla
-        for item in self.tree_transacciones.get_children():
-            self.tree_transacciones.delete(item)
-
-        if not transacciones:
-            self.contador_registros.config(text="No hay registros para mostrar")
+    def _actualizar_tabla(self, transacciones, cursor=None):
+        """Actualiza la tabla con la primera página de transacciones"""
+        self._cursor_tabla = cursor
+        self.tabla_transacciones.cargar(transacciones)
+        self._actualizar_contador()
+
+    def _cargar_siguiente_pagina(self):
+        """La tabla llegó al final: trae la siguiente página con los mismos filtros"""
+        if self._cursor_tabla is None:
             return
+        self.ejecutor.enviar(
+            "historial_pagina",
+            obtener_transacciones_pagina,
+            SETTINGS["page_size"], self._cursor_tabla, **self._filtros_tabla,
+            al_terminar=self._agregar_pagina,
+            al_fallar=lambda e: print(f"Error al cargar más transacciones: {str(e)}")
+        )
 
-        # Llenar tabla
-        for i, trans in enumerate(transacciones):
-            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            tipo_tag = 'recarga' if trans.get('tipo') == 'RECARGA' else 'remesa'
-
-            # Formatear valores
-            monto = trans.get('monto', 0)
-            ganancia = trans.get('ganancia', 0)
-            comision = trans.get('comision', 0)
-
-            monto_str = f"${monto:,.2f}" if monto else ""
-            ganancia_str = f"${ganancia:,.2f}" if ganancia else ""
-            comision_str = f"${comision:,.2f}" if comision else ""
-
-            # Insertar en tabla
-            self.tree_transacciones.insert(
-                "",
-                "end",
-                tags=(tag, tipo_tag),
-                values=(
-                    trans.get('id', ''),
-                    trans.get('date', ''),
-                    trans.get('tipo', ''),
-                    trans.get('worker_name', ''),
-                    trans.get('country_name', ''),
-                    trans.get('currency_code', ''),
-                    monto_str,
-                    ganancia_str,
-                    comision_str,
-                    (trans.get('notes', '') or '')[:30] + ('...' if len(trans.get('notes', '') or '') > 30 else '')
-                )
-            )
+    def _agregar_pagina(self, pagina):
+        self._cursor_tabla = pagina["cursor"]
+        self.tabla_transacciones.agregar(pagina["filas"])
+        self._actualizar_contador()
 
-        self.contador_registros.config(text=f"Mostrando {len(transacciones)} registros")
+    def _actualizar_contador(self):
+        total = len(self.tabla_transacciones)
+        if not total:
+            self.contador_registros.config(text="No hay registros para mostrar")
+            return
+        sufijo = " (desplaza para cargar más)" if self._cursor_tabla is not None else ""
+        self.contador_registros.config(text=f"Mostrando {total} registros{sufijo}")
+
+    def _formatear_transaccion(self, trans: dict, indice: int) -> tuple:
+        """Convierte una transacción en (valores, tags) para la tabla virtual"""
+        tag = 'evenrow' if indice % 2 == 0 else 'oddrow'
+        tipo_tag = 'recarga' if trans.get('tipo') == 'RECARGA' else 'remesa'
+
+        # Formatear valores
+        monto = trans.get('monto', 0)
+        ganancia = trans.get('ganancia', 0)
+        comision = trans.get('comision', 0)
+
+        monto_str = f"${monto:,.2f}" if monto else ""
+        ganancia_str = f"${ganancia:,.2f}" if ganancia else ""
+        comision_str = f"${comision:,.2f}" if comision else ""
+
+        notas = trans.get('notes', '') or ''
+
+        return (
+            (
+                trans.get('id', ''),
+                trans.get('date', ''),
+                trans.get('tipo', ''),
+                trans.get('worker_name', ''),
+                trans.get('country_name', ''),
+                trans.get('currency_code', ''),
+                monto_str,
+                ganancia_str,
+                comision_str,
+                notas[:30] + ('...' if len(notas) > 30 else '')
+            ),
+            (tag, tipo_tag)
+        )
 
     # ========================================
     # FUNCIONES DE RESUMEN
     # ========================================
-    def _actualizar_resumen(self, fecha_inicio=None, fecha_fin=None, worker_id=None):
-        """Actualiza el resumen ejecutivo"""
+    def _mostrar_resumen(self, resumen, top_trabajadores):
+        """Pinta las tarjetas del resumen ejecutivo"""
         try:
-            # Obtener resumen de ganancias
-            resumen = obtener_resumen_ganancias(fecha_inicio, fecha_fin)
-
             # Actualizar tarjeta de ganancia total
             ganancia_neta = resumen.get('ganancia_neta_dueño_usd', 0) + resumen.get('ganancia_neta_dueño_usdt', 0)
             self.tarjeta_ganancia.config(text=f"${ganancia_neta:,.2f}")
@@ -898,7 +968,6 @@ class HistorialTab(ttk.Frame):
             self.tarjeta_comisiones.config(text=f"${comisiones_totales:,.2f}")
 
             # Actualizar tarjeta de top trabajador
-            top_trabajadores = obtener_top_trabajadores(1, fecha_inicio, fecha_fin)
             if top_trabajadores:
                 nombre_top = top_trabajadores[0]['nombre']
                 ganancia_top = top_trabajadores[0]['ganancia_generada']
@@ -913,31 +982,76 @@ class HistorialTab(ttk.Frame):
     # FUNCIONES DE GRÁFICOS
     # ========================================
     def _actualizar_graficos(self):
-        """Actualiza los gráficos con datos actuales"""
-        try:
-            # Limpiar gráficos anteriores
-            for canvas in self.canvas_graficos:
-                canvas.get_tk_widget().destroy()
-            self.figuras_graficos.clear()
-            self.canvas_graficos.clear()
+        """Actualiza los gráficos con datos actuales (consulta en segundo plano)"""
+        self.ejecutor.enviar(
+            "historial_graficos",
+            lambda: (self._serie_ultimos_dias(7), obtener_resumen_ganancias()),
+            al_terminar=lambda datos: self._dibujar_graficos(*datos),
+            al_fallar=lambda e: print(f"Error al actualizar gráficos: {e}")
+        )
+
+    def _serie_ultimos_dias(self, dias):
+        """Serie diaria de los últimos N días (los días sin ventas van en 0)"""
+        hoy = datetime.now()
+        return obtener_serie_ganancias(
+            (hoy - timedelta(days=dias)).strftime("%Y-%m-%d"), hoy.strftime("%Y-%m-%d"), "dia"
+        )
 
-            # Obtener datos para gráficos
-            ganancias_diarias = obtener_ganancias_por_dia(7)
-            resumen = obtener_resumen_ganancias()
+    def _dibujar_graficos(self, ganancias_diarias, resumen):
+        """Actualiza los gráficos si los datos cambiaron y la sección está a la vista"""
+        firma = (
+            ganancias_diarias['periodo'],
+            ganancias_diarias['ganancia_total'],
+            ganancias_diarias['comisiones_total'],
+            tuple(resumen.get(c, 0) for c in ('ganancia_total_usd', 'ganancia_total_usdt',
+                                              'comisiones_total_usd', 'comisiones_total_usdt'))
+        )
+        if firma == self._firma_graficos:
+            self._graficos_pendientes = None
+            return
+
+        # Oculta (otra pestaña o fuera del scroll): se dibuja cuando aparezca
+        if not self._graficos_visibles():
+            self._graficos_pendientes = (ganancias_diarias, resumen)
+            return
+        self._graficos_pendientes = None
 
-            # Crear gráfico 1: Ganancias diarias
-            self._crear_grafico_ganancias_diarias(ganancias_diarias)
+        try:
+            # Gráfico 1: Ganancias diarias
+            self._actualizar_grafico_ganancias_diarias(ganancias_diarias)
 
-            # Crear gráfico 2: Distribución por tipo
-            self._crear_grafico_distribucion_tipo(resumen)
+            # Gráfico 2: Distribución por tipo
+            self._actualizar_grafico_distribucion_tipo(resumen)
 
+            self._firma_graficos = firma
         except Exception as e:
             print(f"Error al actualizar gráficos: {e}")
 
-    def _crear_grafico_ganancias_diarias(self, datos):
-        """Crea gráfico de ganancias diarias"""
-        if not datos:
-            return
+    def _graficos_visibles(self):
+        """True si la sección de gráficos se ve (pestaña activa y dentro del scroll)"""
+        if not self.graficos_frame.winfo_viewable():
+            return False
+        arriba = self.canvas.canvasy(0)
+        abajo = arriba + self.canvas.winfo_height()
+        y = self.graficos_frame.winfo_y()
+        return y < abajo and y + self.graficos_frame.winfo_height() > arriba
+
+    def _dibujar_graficos_pendientes(self):
+        """Dibuja los datos que llegaron mientras los gráficos no se veían"""
+        if self._graficos_pendientes is not None and self._graficos_visibles():
+            self._dibujar_graficos(*self._graficos_pendientes)
+
+    def _al_desplazar(self, *args):
+        """yscrollcommand del canvas: mueve la barra y revisa si aparecieron los gráficos"""
+        self.scrollbar.set(*args)
+        if self._graficos_pendientes is not None:
+            self._dibujar_graficos_pendientes()
+
+    def _crear_grafico_ganancias_diarias(self):
+        """Crea (una sola vez) la figura de ganancias diarias"""
+        # matplotlib se importa solo cuando hay que dibujar (arranque rápido)
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
         fig = Figure(figsize=(6, 4), dpi=100, facecolor=self.colors["bg_card"])
         ax = fig.add_subplot(111)
@@ -946,50 +1060,80 @@ class HistorialTab(ttk.Frame):
         ax.set_facecolor(self.colors["bg_card"])
         fig.patch.set_facecolor(self.colors["bg_card"])
 
-        # Extraer datos
-        fechas = [d['fecha'] for d in datos]
-        ganancias = [d['ganancia_total'] for d in datos]
-        comisiones = [d['comisiones_total'] for d in datos]
-
-        # Crear gráfico de barras
-        x = range(len(fechas))
-        width = 0.35
-
-        ax.bar([i - width/2 for i in x], ganancias, width, label='Ganancia', color=self.colors["primary"])
-        ax.bar([i + width/2 for i in x], comisiones, width, label='Comisiones', color=self.colors["accent"])
-
-        # Configurar eje X
-        ax.set_xticks(x)
-        ax.set_xticklabels([f.split('-')[-1] for f in fechas], color="#333333")  # Gris oscuro
-
         # Configurar eje Y
         ax.set_ylabel('USD', color="#333333")  # Gris oscuro
         ax.tick_params(axis='y', colors="#333333")  # Gris oscuro
 
-        # Título y leyenda
+        # Título
         ax.set_title('Ganancias vs Comisiones (Últimos 7 días)', color=self.colors["primary"], fontweight='bold')
-        ax.legend(facecolor=self.colors["bg_card"], edgecolor=self.colors["primary"])
 
         # Añadir grid
         ax.grid(True, alpha=0.3, color="#666666")  # Gris medio
 
-        # Ajustar layout
-        fig.tight_layout()
-
         # Añadir al frame
         canvas = FigureCanvasTkAgg(fig, self.frame_grafico1)
-        canvas.draw()
         canvas.get_tk_widget().pack(fill="both", expand=True)
 
         # Guardar referencia
         self.figuras_graficos.append(fig)
         self.canvas_graficos.append(canvas)
+        self._ax_diario = ax
 
         # Hacer interactivo (click)
         canvas.mpl_connect('button_press_event', lambda event: self._on_grafico_click(event, 'diario'))
 
-    def _crear_grafico_distribucion_tipo(self, resumen):
-        """Crea gráfico de distribución por tipo"""
+    def _actualizar_grafico_ganancias_diarias(self, serie):
+        """Actualiza las barras de ganancias diarias sin recrear la figura"""
+        if self._ax_diario is None:
+            if not any(serie['ganancia_total']) and not any(serie['comisiones_total']):
+                return
+            self._crear_grafico_ganancias_diarias()
+            primera_vez = True
+        else:
+            primera_vez = False
+        ax = self._ax_diario
+
+        # Columnas de la serie
+        fechas = serie['periodo']
+        ganancias = serie['ganancia_total']
+        comisiones = serie['comisiones_total']
+        x = range(len(fechas))
+
+        if self._barras_diario is not None and len(self._barras_diario[0]) == len(fechas):
+            # Mismos días: solo cambian las alturas
+            for barra, valor in zip(self._barras_diario[0], ganancias):
+                barra.set_height(valor)
+            for barra, valor in zip(self._barras_diario[1], comisiones):
+                barra.set_height(valor)
+        else:
+            # Cambió la cantidad de días: se rehacen las barras (la figura se conserva)
+            if self._barras_diario is not None:
+                for barras in self._barras_diario:
+                    barras.remove()
+            width = 0.35
+            self._barras_diario = (
+                ax.bar([i - width/2 for i in x], ganancias, width, label='Ganancia', color=self.colors["primary"]),
+                ax.bar([i + width/2 for i in x], comisiones, width, label='Comisiones', color=self.colors["accent"]),
+            )
+            ax.set_xticks(list(x))
+            if ax.get_legend() is None:
+                ax.legend(facecolor=self.colors["bg_card"], edgecolor=self.colors["primary"])
+
+        # Configurar eje X (los días se corren aunque la cantidad sea la misma)
+        ax.set_xticklabels([f.split('-')[-1] for f in fechas], color="#333333")  # Gris oscuro
+        ax.relim()
+        ax.autoscale_view()
+
+        # El layout se ajusta una sola vez; después basta con redibujar
+        if primera_vez:
+            ax.figure.tight_layout()
+        ax.figure.canvas.draw_idle()
+
+    def _crear_grafico_distribucion_tipo(self):
+        """Crea (una sola vez) la figura de distribución por tipo"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         fig = Figure(figsize=(6, 4), dpi=100, facecolor=self.colors["bg_card"])
         ax = fig.add_subplot(111)
 
@@ -997,22 +1141,16 @@ class HistorialTab(ttk.Frame):
         ax.set_facecolor(self.colors["bg_card"])
         fig.patch.set_facecolor(self.colors["bg_card"])
 
-        # Datos
+        # Barras apiladas en cero: sus alturas se fijan en cada actualización
         labels = ['Recargas', 'Remesas']
-        ganancias = [
-            resumen.get('ganancia_total_usd', 0),
-            resumen.get('ganancia_total_usdt', 0)
-        ]
-        comisiones = [
-            resumen.get('comisiones_total_usd', 0),
-            resumen.get('comisiones_total_usdt', 0)
-        ]
-
-        # Crear gráfico de barras apiladas
         x = range(len(labels))
+        self._barras_tipo = (
+            ax.bar(x, [0, 0], label='Ganancia', color=self.colors["primary"]),
+            ax.bar(x, [0, 0], label='Comisiones', color=self.colors["accent"]),
+        )
 
-        ax.bar(x, ganancias, label='Ganancia', color=self.colors["primary"])
-        ax.bar(x, comisiones, bottom=ganancias, label='Comisiones', color=self.colors["accent"])
+        # Valores encima de las barras (se ocultan si el total es 0)
+        self._textos_tipo = [ax.text(i, 0, '', ha='center', color="#333333") for i in x]  # Gris oscuro
 
         # Configurar
         ax.set_xticks(x)
@@ -1024,28 +1162,56 @@ class HistorialTab(ttk.Frame):
         ax.set_title('Distribución por Tipo de Transacción', color=self.colors["primary"], fontweight='bold')
         ax.legend(facecolor=self.colors["bg_card"], edgecolor=self.colors["primary"])
 
-        # Añadir valores encima de las barras
-        for i, (g, c) in enumerate(zip(ganancias, comisiones)):
-            total = g + c
-            if total > 0:
-                ax.text(i, total + max(ganancias + comisiones) * 0.02,
-                       f'${total:,.0f}', ha='center', color="#333333")  # Gris oscuro
-
-        # Ajustar layout
-        fig.tight_layout()
-
         # Añadir al frame
         canvas = FigureCanvasTkAgg(fig, self.frame_grafico2)
-        canvas.draw()
         canvas.get_tk_widget().pack(fill="both", expand=True)
 
         # Guardar referencia
         self.figuras_graficos.append(fig)
         self.canvas_graficos.append(canvas)
+        self._ax_tipo = ax
 
         # Hacer interactivo
         canvas.mpl_connect('button_press_event', lambda event: self._on_grafico_click(event, 'distribucion'))
 
+    def _actualizar_grafico_distribucion_tipo(self, resumen):
+        """Actualiza las barras apiladas por tipo sin recrear la figura"""
+        primera_vez = self._ax_tipo is None
+        if primera_vez:
+            self._crear_grafico_distribucion_tipo()
+        ax = self._ax_tipo
+
+        # Datos
+        ganancias = [
+            resumen.get('ganancia_total_usd', 0),
+            resumen.get('ganancia_total_usdt', 0)
+        ]
+        comisiones = [
+            resumen.get('comisiones_total_usd', 0),
+            resumen.get('comisiones_total_usdt', 0)
+        ]
+
+        barras_ganancia, barras_comision = self._barras_tipo
+        maximo = max(ganancias + comisiones)
+        for i, (g, c) in enumerate(zip(ganancias, comisiones)):
+            barras_ganancia[i].set_height(g)
+            barras_comision[i].set_y(g)
+            barras_comision[i].set_height(c)
+
+            total = g + c
+            texto = self._textos_tipo[i]
+            texto.set_visible(total > 0)
+            texto.set_position((i, total + maximo * 0.02))
+            texto.set_text(f'${total:,.0f}')
+
+        ax.relim()
+        ax.autoscale_view()
+
+        # El layout se ajusta una sola vez; después basta con redibujar
+        if primera_vez:
+            ax.figure.tight_layout()
+        ax.figure.canvas.draw_idle()
+
     def _on_grafico_click(self, event, tipo_grafico):
         """Maneja clicks en los gráficos"""
         if event.inaxes:
@@ -1069,33 +1235,40 @@ class HistorialTab(ttk.Frame):
     # ========================================
     def _calcular_comisiones(self):
         """Calcula las comisiones para el trabajador seleccionado"""
-        try:
-            trabajador_nombre = self.combo_trabajador_comisiones.get()
-            fecha_inicio = self.fecha_comision_inicio.get()
-            fecha_fin = self.fecha_comision_fin.get()
+        trabajador_nombre = self.combo_trabajador_comisiones.get()
+        fecha_inicio = self.fecha_comision_inicio.get()
+        fecha_fin = self.fecha_comision_fin.get()
 
-            if not trabajador_nombre:
-                messagebox.showwarning("Advertencia", "Selecciona un trabajador")
-                return
+        if not trabajador_nombre:
+            messagebox.showwarning("Advertencia", "Selecciona un trabajador")
+            return
 
-            if not fecha_inicio or not fecha_fin:
-                messagebox.showwarning("Advertencia", "Ingresa las fechas")
-                return
+        if not fecha_inicio or not fecha_fin:
+            messagebox.showwarning("Advertencia", "Ingresa las fechas")
+            return
 
-            # Buscar ID del trabajador
-            worker_id = None
-            for t in self.trabajadores:
-                if t['name'] == trabajador_nombre:
-                    worker_id = t['id']
-                    break
+        # Buscar ID del trabajador
+        worker_id = self.trabajadores.id_por_nombre(trabajador_nombre)
 
-            if not worker_id:
-                messagebox.showerror("Error", "Trabajador no encontrado")
-                return
+        if not worker_id:
+            messagebox.showerror("Error", "Trabajador no encontrado")
+            return
 
-            # Obtener datos de comisiones
-            datos = obtener_comisiones_trabajador(worker_id, fecha_inicio, fecha_fin)
+        # Obtener datos de comisiones en el hilo de consultas
+        self.ejecutor.enviar(
+            "historial_comisiones",
+            obtener_comisiones_trabajador, worker_id, fecha_inicio, fecha_fin,
+            al_terminar=lambda datos: self._mostrar_comisiones(
+                trabajador_nombre, fecha_inicio, fecha_fin, datos
+            ),
+            al_fallar=lambda e: messagebox.showerror(
+                "Error", f"No se pudieron calcular las comisiones:\n{str(e)}"
+            )
+        )
 
+    def _mostrar_comisiones(self, trabajador_nombre, fecha_inicio, fecha_fin, datos):
+        """Muestra el reporte de comisiones (en el hilo de Tk)"""
+        try:
             # Limpiar frame de resultados
             for widget in self.resultados_frame.winfo_children():
                 widget.destroy()
@@ -1146,7 +1319,7 @@ class HistorialTab(ttk.Frame):
                 ).pack(side="left")
 
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron calcular las comisiones:\n{str(e)}")
+            messagebox.showerror("Error", f"No se pudieron mostrar las comisiones:\n{str(e)}")
 
     def _generar_reporte_comisiones(self):
         """Genera reporte de comisiones en Excel"""
@@ -1160,14 +1333,15 @@ class HistorialTab(ttk.Frame):
                 return
 
             # Buscar ID del trabajador
-            worker_id = None
-            for t in self.trabajadores:
-                if t['name'] == trabajador_nombre:
-                    worker_id = t['id']
-                    break
+            worker_id = self.trabajadores.id_por_nombre(trabajador_nombre)
 
             if worker_id:
-                generar_reporte_comisiones(worker_id, fecha_inicio, fecha_fin)
+                # openpyxl se carga solo al exportar
+                from reports.generator import generar_reporte_comisiones
+                self._exportar_en_segundo_plano(
+                    "reporte de comisiones",
+                    generar_reporte_comisiones, worker_id, fecha_inicio, fecha_fin
+                )
             else:
                 messagebox.showerror("Error", "Trabajador no encontrado")
 
@@ -1186,10 +1360,17 @@ class HistorialTab(ttk.Frame):
     # FUNCIONES DE MIS GANANCIAS
     # ========================================
     def _actualizar_mis_ganancias(self, fecha_inicio=None, fecha_fin=None):
-        """Actualiza la sección de mis ganancias"""
-        try:
-            resumen = obtener_resumen_ganancias(fecha_inicio, fecha_fin)
+        """Actualiza la sección de mis ganancias (consulta en segundo plano)"""
+        self.ejecutor.enviar(
+            "historial_mis_ganancias",
+            obtener_resumen_ganancias, fecha_inicio, fecha_fin,
+            al_terminar=self._mostrar_mis_ganancias,
+            al_fallar=lambda e: print(f"Error al actualizar mis ganancias: {e}")
+        )
 
+    def _mostrar_mis_ganancias(self, resumen):
+        """Pinta las métricas de mis ganancias"""
+        try:
             # Ganancia neta (dueño)
             ganancia_neta = resumen.get('ganancia_neta_dueño_usd', 0) + resumen.get('ganancia_neta_dueño_usdt', 0)
             self.metrica_ganancia_neta.config(text=f"${ganancia_neta:,.2f}")
@@ -1255,13 +1436,43 @@ class HistorialTab(ttk.Frame):
     # ========================================
     # FUNCIONES DE EXPORTACIÓN
     # ========================================
+    def _exportar_en_segundo_plano(self, descripcion, funcion, *args):
+        """Genera el reporte en el hilo de exportaciones y avisa la ruta al terminar"""
+        # Clave propia por exportación: una nueva no descarta el aviso de otra en curso
+        self._contador_exportaciones += 1
+        clave = f"historial_exportar_{self._contador_exportaciones}"
+        self._exportaciones_en_curso[clave] = descripcion
+        self._mostrar_exportaciones_en_curso()
+
+        def al_terminar(ruta):
+            self._terminar_exportacion(clave)
+            messagebox.showinfo("Éxito", f"✅ {descripcion.capitalize()} guardado en:\n{ruta}")
+
+        def al_fallar(e):
+            self._terminar_exportacion(clave)
+            messagebox.showerror("Error", f"No se pudo generar el {descripcion}:\n{str(e)}")
+
+        # Hilo propio (uno solo): las consultas de filtros, páginas y gráficos no esperan
+        self.ejecutor_exportaciones.enviar(clave, funcion, *args,
+                                           al_terminar=al_terminar, al_fallar=al_fallar)
+
+    def _terminar_exportacion(self, clave):
+        self._exportaciones_en_curso.pop(clave, None)
+        self._mostrar_exportaciones_en_curso()
+
+    def _mostrar_exportaciones_en_curso(self):
+        """Indica qué reportes se están generando"""
+        en_curso = list(self._exportaciones_en_curso.values())
+        self.lbl_exportando.config(text=f"⏳ Generando: {', '.join(en_curso)}..." if en_curso else "")
+
     def _exportar_dashboard_excel(self):
         """Exporta el dashboard completo a Excel"""
         try:
             fecha_inicio = self.fecha_inicio_var.get() or None
             fecha_fin = self.fecha_fin_var.get() or None
 
-            exportar_dashboard(fecha_inicio, fecha_fin)
+            from reports.generator import exportar_dashboard
+            self._exportar_en_segundo_plano("dashboard", exportar_dashboard, fecha_inicio, fecha_fin)
 
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo exportar el dashboard:\n{str(e)}")
@@ -1276,20 +1487,16 @@ class HistorialTab(ttk.Frame):
             tipo = self.tipo_var.get()
 
             # Convertir trabajador a ID
-            worker_id = None
-            if trabajador != "todos":
-                for t in self.trabajadores:
-                    if t['name'] == trabajador:
-                        worker_id = t['id']
-                        break
-
-            # Obtener transacciones
-            transacciones = obtener_transacciones_combinadas(
-                fecha_inicio=fecha_inicio,
-                fecha_fin=fecha_fin,
-                worker_id=worker_id,
-                tipo=tipo if tipo != "todos" else None
-            )
+            worker_id = self.trabajadores.id_por_nombre(trabajador) if trabajador != "todos" else None
+
+            # Filtros de la consulta: las filas se leen mientras se escribe el archivo
+            filtros_consulta = {
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin,
+                'worker_id': worker_id,
+                'tipo': tipo if tipo != "todos" else None,
+                'country_id': self._obtener_country_id_filtro()
+            }
 
             # Preparar filtros para el reporte
             filtros = {
@@ -1300,35 +1507,37 @@ class HistorialTab(ttk.Frame):
                 'País': self.pais_var.get()
             }
 
-            # Exportar
-            exportar_a_excel(transacciones, filtros)
+            # Exportar (el generador se importa solo al usarlo)
+            from reports.generator import exportar_transacciones_filtradas
+            self._exportar_en_segundo_plano(
+                "reporte de transacciones",
+                exportar_transacciones_filtradas, filtros_consulta, filtros
+            )
 
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo exportar las transacciones:\n{str(e)}")
 
     def _exportar_a_pdf(self):
-        """Exporta a PDF"""
+        """Exporta a PDF en un proceso aparte, con progreso y cancelación"""
+        if self._exportacion_pdf is not None:
+            return  # Ya hay un PDF en curso
+
         try:
-            # Obtener transacciones actuales
             fecha_inicio = self.fecha_inicio_var.get() or None
             fecha_fin = self.fecha_fin_var.get() or None
             trabajador = self.trabajador_var.get()
 
             # Convertir trabajador a ID
-            worker_id = None
-            if trabajador != "todos":
-                for t in self.trabajadores:
-                    if t['name'] == trabajador:
-                        worker_id = t['id']
-                        break
-
-            # Obtener transacciones
-            transacciones = obtener_transacciones_combinadas(
-                fecha_inicio=fecha_inicio,
-                fecha_fin=fecha_fin,
-                worker_id=worker_id,
-                tipo=self.tipo_var.get() if self.tipo_var.get() != "todos" else None
-            )
+            worker_id = self.trabajadores.id_por_nombre(trabajador) if trabajador != "todos" else None
+
+            # El proceso hijo lee las transacciones por su cuenta
+            filtros_consulta = {
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin,
+                'worker_id': worker_id,
+                'tipo': self.tipo_var.get() if self.tipo_var.get() != "todos" else None,
+                'country_id': self._obtener_country_id_filtro()
+            }
 
             # Preparar filtros
             filtros = {
@@ -1338,12 +1547,83 @@ class HistorialTab(ttk.Frame):
                 'País': self.pais_var.get()
             }
 
-            # Exportar
-            exportar_a_pdf(transacciones, "Reporte de Transacciones Tryhards", filtros)
+            # El generador (y reportlab, en el hijo) se importa solo al usarlo
+            from reports.generator import ExportacionPDF
+            self._exportacion_pdf = ExportacionPDF(
+                filtros_consulta, "Reporte de Transacciones Tryhards", filtros
+            )
+            self._cancelacion_pdf_en = None
+            self.progreso_pdf.configure(mode="indeterminate")
+            self.progreso_pdf.start(15)
+            self.lbl_progreso_pdf.config(text="Leyendo transacciones...")
+            self.btn_exportar_pdf.config(state="disabled")
+            self.btn_cancelar_pdf.config(state="normal")
+            self.after(200, self._revisar_exportacion_pdf)
 
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo exportar a PDF:\n{str(e)}")
 
+    def _revisar_exportacion_pdf(self):
+        """Lee los mensajes del proceso del PDF y actualiza la barra"""
+        exportacion = self._exportacion_pdf
+        if exportacion is None:
+            return
+
+        for mensaje in exportacion.mensajes():
+            if mensaje[0] == "progreso":
+                _, hechas, total = mensaje
+                if str(self.progreso_pdf.cget("mode")) != "determinate":
+                    self.progreso_pdf.stop()
+                    self.progreso_pdf.configure(mode="determinate")
+                self.progreso_pdf["value"] = hechas * 100 / total if total else 100
+                self.lbl_progreso_pdf.config(text=f"{hechas:,} de {total:,} filas")
+            elif mensaje[0] == "listo":
+                self._terminar_exportacion_pdf("✅ PDF listo")
+                messagebox.showinfo("Éxito", f"✅ PDF guardado en:\n{mensaje[1]}")
+                return
+            elif mensaje[0] == "cancelado":
+                self._terminar_exportacion_pdf("PDF cancelado")
+                return
+            elif mensaje[0] == "error":
+                self._terminar_exportacion_pdf("")
+                messagebox.showerror("Error", f"No se pudo exportar a PDF:\n{mensaje[1]}")
+                return
+
+        if not exportacion.activo():
+            # Terminó sin avisar (cerrado a la fuerza o falló al arrancar)
+            cancelado = self._cancelacion_pdf_en is not None
+            self._terminar_exportacion_pdf("PDF cancelado" if cancelado else "")
+            if not cancelado:
+                messagebox.showerror("Error", "El proceso del PDF terminó inesperadamente")
+            return
+
+        # Si el hijo no atiende la cancelación (p.ej. leyendo), se cierra a la fuerza
+        if self._cancelacion_pdf_en is not None and \
+                (datetime.now() - self._cancelacion_pdf_en).total_seconds() > 3:
+            exportacion.terminar()
+
+        self.after(200, self._revisar_exportacion_pdf)
+
+    def _cancelar_pdf(self):
+        """Pide al proceso del PDF que se detenga"""
+        if self._exportacion_pdf is None or self._cancelacion_pdf_en is not None:
+            return
+        self._exportacion_pdf.cancelar()
+        self._cancelacion_pdf_en = datetime.now()
+        self.lbl_progreso_pdf.config(text="Cancelando...")
+        self.btn_cancelar_pdf.config(state="disabled")
+
+    def _terminar_exportacion_pdf(self, texto):
+        """Deja la sección de PDF lista para otra exportación"""
+        self._exportacion_pdf.terminar()
+        self._exportacion_pdf = None
+        self.progreso_pdf.stop()
+        self.progreso_pdf.configure(mode="determinate")
+        self.progreso_pdf["value"] = 0
+        self.lbl_progreso_pdf.config(text=texto)
+        self.btn_exportar_pdf.config(state="normal")
+        self.btn_cancelar_pdf.config(state="disabled")
+
     def _abrir_carpeta_reportes(self):
         """Abre la carpeta de reportes en el explorador de archivos"""
         import os
@@ -1369,11 +1649,19 @@ class HistorialTab(ttk.Frame):
 
     # Función para refrescar el historial (usada desde main_window.py)
     def refrescar_historial(self):
-        """Refresca todos los datos del historial"""
+        """Refresca todos los datos del historial (nada si no hubo cambios)"""
+        clave = self._clave_datos_actual()
+        if clave == self._clave_datos:
+            return
+        self._clave_datos = clave
         self._cargar_catalogos()
         self._aplicar_filtros()
         self._actualizar_graficos()
 
+    def _clave_datos_actual(self):
+        """Versión de datos + fecha (el gráfico de 7 días depende del día actual)"""
+        return (obtener_version_datos(*_TABLAS_HISTORIAL), datetime.now().strftime("%Y-%m-%d"))
+
 # Función para crear la pestaña en main_window.py
 def create_historial_tab(notebook, colors):
     """Crea y retorna la pestaña de historial"""
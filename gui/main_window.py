@@ -10,10 +10,7 @@ import sys
 
 from utils.config import LOGO_PATH
 from utils.styles import apply_styles, TECH_COLORS
-from gui.admin_panel import AdminPanel
-from gui.recargas_tab import RecargasTab
-from gui.remesas_tab import RemesasTab
-from gui.historial_tab import HistorialTab
+from utils.helpers import medir_arranque, imprimir_tiempos_arranque
 
 class MainWindow:
     def __init__(self, root):  # CAMBIADO: Recibe root como parámetro
@@ -30,6 +27,10 @@ class MainWindow:
         self.historial_tab = None
         self.saldos_tab = None  # ✅ NUEVO: Referencia para gestión de saldos
 
+        # Pestañas aún no construidas: frame -> (nombre, función constructora, frame)
+        self._pestanas_pendientes = {}
+        self._pestana_actual = None
+
         # Cargar configuración del logo
         self.logo_config = self._cargar_configuracion_logo()
 
@@ -290,32 +291,67 @@ class MainWindow:
     # PESTAÑAS (CON NUEVA PESTAÑA DE SALDOS)
     # ---------------------------------
     def _create_tabs(self):
-        """CREA 6 PESTAÑAS MODERNAS (5 originales + 1 nueva)"""
+        """CREA 6 PESTAÑAS MODERNAS (5 originales + 1 nueva)
+
+        Solo se agregan frames vacíos: cada pestaña se construye (e importa
+        su módulo) la primera vez que se selecciona.
+        """
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=25, pady=(0, 25))
 
-        self._create_dashboard_tab(self.notebook)
-        self._create_saldos_tab(self.notebook)  # ✅ NUEVA PESTAÑA
-        self._create_admin_tab(self.notebook)
-        self._create_recargas_tab(self.notebook)
-        self._create_remesas_tab(self.notebook)
-        self._create_historial_tab(self.notebook)
+        pestanas = [
+            ("📈 Dashboard", self._create_dashboard_tab),
+            ("💰 Saldos", self._create_saldos_tab),  # ✅ NUEVA PESTAÑA
+            ("⚙️ Admin", self._create_admin_tab),
+            ("💳 Recargas", self._create_recargas_tab),
+            ("🌎 Remesas", self._create_remesas_tab),
+            ("📋 Historial", self._create_historial_tab),
+        ]
+        for texto, constructor in pestanas:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=texto)
+            self._pestanas_pendientes[str(frame)] = (texto, constructor, frame)
+
+        # Construir solo la pestaña visible al arrancar
+        self._pestana_actual = self.notebook.select()
+        self._construir_pestana(self._pestana_actual)
 
-        # cuando cambie de pestaña, refrescar catálogos si es necesario
+        # cuando cambie de pestaña, construirla o refrescar catálogos si es necesario
         self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
+    def _construir_pestana(self, tab_id) -> bool:
+        """Construye la pestaña si aún no existe. Retorna True si se construyó ahora."""
+        pendiente = self._pestanas_pendientes.pop(str(tab_id), None)
+        if pendiente is None:
+            return False
+        texto, constructor, frame = pendiente
+        with medir_arranque(f"Pestaña {texto}"):
+            constructor(frame)
+        return True
+
     # evento de cambio de pestaña
     def _on_tab_changed(self, event):
         if not self.notebook:
             return
         current_tab_id = self.notebook.select()
+
+        # Tk también avisa la selección inicial: no es un cambio real
+        if current_tab_id == self._pestana_actual:
+            return
+        self._pestana_actual = current_tab_id
+
+        # Recién construida: ya cargó datos frescos, no hace falta refrescar
+        if self._construir_pestana(current_tab_id):
+            imprimir_tiempos_arranque()
+            return
+
         tab_text = self.notebook.tab(current_tab_id, "text")
 
-        # Refrescar catálogos cuando entres a Recargas o Remesas
+        # Refrescar (solo lo que cambió) cuando entres a Recargas o Remesas
         if "Recargas" in tab_text and self.recargas_tab is not None:
-            self.recargas_tab.recargar_catalogos()
+            self.recargas_tab.refrescar()
         elif "Remesas" in tab_text and self.remesas_tab is not None:
-            self.remesas_tab.recargar_catalogos()
+            self.remesas_tab.refrescar()
         # Refrescar historial
         elif "Historial" in tab_text and self.historial_tab is not None:
             self.historial_tab.refrescar_historial()
@@ -324,19 +360,16 @@ class MainWindow:
             # Si el dashboard tiene método de refresco, llamarlo
             if hasattr(self.dashboard_tab, '_actualizar_todo'):
                 self.dashboard_tab._actualizar_todo()
-        # ✅ NUEVO: Refrescar saldos cuando entres a esa pestaña
+        # ✅ NUEVO: Refrescar saldos cuando entres a esa pestaña (si cambiaron)
         elif "💰 Saldos" in tab_text and self.saldos_tab is not None:
-            if hasattr(self.saldos_tab, 'recargar_datos'):
-                self.saldos_tab.recargar_datos()
+            if hasattr(self.saldos_tab, 'refrescar'):
+                self.saldos_tab.refrescar()
 
     # DASHBOARD - ¡ACTUALIZADO Y CORREGIDO!
-    def _create_dashboard_tab(self, notebook):
+    def _create_dashboard_tab(self, frame):
         """DASHBOARD EJECUTIVO COMPLETO CON PERSONALIZACIÓN"""
         from gui.dashboard_tab import DashboardTab  # Importar la clase, NO la función
 
-        frame = ttk.Frame(notebook)
-        notebook.add(frame, text="📈 Dashboard")
-
         # Crear la instancia del dashboard premium
         self.dashboard_tab = DashboardTab(frame, self.colors)
 
@@ -344,23 +377,19 @@ class MainWindow:
         self.dashboard_tab.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
     # ✅ NUEVA PESTAÑA: GESTIÓN DE SALDOS
-    def _create_saldos_tab(self, notebook):
+    def _create_saldos_tab(self, frame):
         """PESTAÑA DE GESTIÓN DE SALDOS FINANCIEROS"""
         # Importación condicional para evitar errores si no existe todavía
         try:
             from gui.saldos_tab import SaldosTab
 
-            frame = ttk.Frame(notebook)
-            notebook.add(frame, text="💰 Saldos")
-
             # Crear la instancia de la pestaña de saldos
             self.saldos_tab = SaldosTab(frame, self.colors)
             self.saldos_tab.pack(fill=tk.BOTH, expand=True)
 
         except ImportError:
             # Si el archivo no existe todavía, crear un placeholder
-            frame = ttk.Frame(notebook)
-            notebook.add(frame, text="💰 Saldos (En desarrollo)")
+            self.notebook.tab(frame, text="💰 Saldos (En desarrollo)")
 
             # Mensaje temporal
             placeholder_label = tk.Label(
@@ -382,10 +411,9 @@ class MainWindow:
             self.saldos_tab = None
 
     # ADMIN (scrollable)
-    def _create_admin_tab(self, notebook):
+    def _create_admin_tab(self, outer_frame):
         """PESTAÑA ADMIN: monta AdminPanel completo con scroll vertical"""
-        outer_frame = ttk.Frame(notebook)
-        notebook.add(outer_frame, text="⚙️ Admin")
+        from gui.admin_panel import AdminPanel
 
         # Canvas + Scrollbar vertical
         canvas = tk.Canvas(
@@ -425,28 +453,25 @@ class MainWindow:
         admin_panel.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
     # RECARGAS
-    def _create_recargas_tab(self, notebook):
+    def _create_recargas_tab(self, frame):
         """PESTAÑA RECARGAS: usa RecargasTab conectado a BD en USD"""
-        frame = ttk.Frame(notebook)
-        notebook.add(frame, text="💳 Recargas")
+        from gui.recargas_tab import RecargasTab
 
         self.recargas_tab = RecargasTab(frame, self.colors)
         self.recargas_tab.pack(fill=tk.BOTH, expand=True)
 
     # REMESAS
-    def _create_remesas_tab(self, notebook):
+    def _create_remesas_tab(self, frame):
         """PESTAÑA REMESAS: usa RemesasTab completamente funcional"""
-        frame = ttk.Frame(notebook)
-        notebook.add(frame, text="🌎 Remesas")
+        from gui.remesas_tab import RemesasTab
 
         self.remesas_tab = RemesasTab(frame, self.colors)
         self.remesas_tab.pack(fill=tk.BOTH, expand=True)
 
     # HISTORIAL
-    def _create_historial_tab(self, notebook):
+    def _create_historial_tab(self, frame):
         """Pestaña HISTORIAL: Dashboard ejecutivo completo"""
-        frame = ttk.Frame(notebook)
-        notebook.add(frame, text="📋 Historial")
+        from gui.historial_tab import HistorialTab
 
         self.historial_tab = HistorialTab(frame, self.colors)
         self.historial_tab.pack(fill=tk.BOTH, expand=True)
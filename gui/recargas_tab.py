@@ -12,15 +12,21 @@ from tkinter import ttk, messagebox
 from datetime import datetime
 
 from database.operations import (
-    listar_trabajadores_activos,
-    listar_paises_activos,
-    listar_juegos_activos,
-    listar_productos_activos,
-    listar_metodos_pago_activos,
+    obtener_catalogo,
     agregar_recarga,
-    listar_recargas,           # NUEVA FUNCIÓN
+    listar_recargas_pagina,
+    listar_recargas_por_ids,
+    contar_recargas_del_dia,
     eliminar_recarga,          # NUEVA FUNCIÓN
+    obtener_version_datos,
+    obtener_cambios,
 )
+from database.catalogos import Catalogo
+from gui.tabla_virtual import TablaVirtual
+from utils.config import SETTINGS
+
+# Tablas de las que salen los combos (y los nombres mostrados en la tabla)
+_TABLAS_CATALOGO = ("workers", "countries", "payment_methods", "games", "products")
 
 
 class RecargasTab(ttk.Frame):
@@ -30,15 +36,22 @@ class RecargasTab(ttk.Frame):
         self.configure(style="Card.TFrame")
 
         # caches de catálogos
-        self.trabajadores = []
-        self.paises = []
-        self.juegos = []
-        self.productos = []
-        self.metodos_pago = []
+        self.trabajadores = Catalogo([])
+        self.paises = Catalogo([])
+        self.juegos = Catalogo([])
+        self.productos = Catalogo([])
+        self.metodos_pago = Catalogo([])
 
         # Variables para el campo cliente (NUEVO)
         self.cliente_var = tk.StringVar()
 
+        # Paginación keyset del historial (None = no hay más páginas)
+        self._cursor_historial = None
+
+        # Versiones de datos ya mostradas (refresco incremental)
+        self._version_catalogos = None
+        self._version_historial = 0
+
         # Crear canvas con scroll
         self._crear_scrollable_frame()
 
@@ -51,8 +64,16 @@ class RecargasTab(ttk.Frame):
     # MÉTODO PÚBLICO PARA REFRESCAR
     # ---------------------------------
     def recargar_catalogos(self):
-        """Relee catálogos desde la BD y actualiza los combos."""
-        self._cargar_catalogos()
+        """Relee catálogos desde la BD solo si cambiaron y actualiza los combos."""
+        if obtener_version_datos(*_TABLAS_CATALOGO) != self._version_catalogos:
+            self._cargar_catalogos()
+            # Nombres de trabajador/juego pudieron cambiar en filas ya mostradas
+            self._cargar_historial()
+
+    def refrescar(self):
+        """Al volver a la pestaña: catálogos y recargas, solo lo que cambió."""
+        self.recargar_catalogos()
+        self._refrescar_historial()
 
     # ---------------------------------
     # SCROLLABLE FRAME
@@ -332,23 +353,17 @@ class RecargasTab(ttk.Frame):
         table_inner_frame = ttk.Frame(table_frame)
         table_inner_frame.pack(fill="both", expand=True)
 
-        # Treeview con scroll
-        tree_scroll = ttk.Scrollbar(
-            table_inner_frame,
-            style="Vertical.TScrollbar"
-        )
-        tree_scroll.pack(side="right", fill="y")
-
+        # Tabla virtual: solo se materializan las filas visibles
         cols = ("id", "fecha", "trabajador", "cliente", "juego", "recibido", "costo", "ganancia")  # ✅ AGREGADO "cliente"
-        self.tree_recargas = ttk.Treeview(
+        self.tabla_recargas = TablaVirtual(
             table_inner_frame,
-            columns=cols,
-            show="headings",
-            height=8,
-            yscrollcommand=tree_scroll.set,
-            style="Custom.Treeview"
+            cols,
+            formateador=self._formatear_recarga,
+            altura=8,
+            al_final=self._cargar_siguiente_pagina
         )
-        tree_scroll.config(command=self.tree_recargas.yview)
+        self.tabla_recargas.pack(fill="both", expand=True)
+        self.tree_recargas = self.tabla_recargas.tree
 
         # Configurar columnas
         column_widths = {
@@ -374,8 +389,6 @@ class RecargasTab(ttk.Frame):
             self.tree_recargas.heading(col, text=display_name)
             self.tree_recargas.column(col, width=column_widths.get(col, 100))
 
-        self.tree_recargas.pack(side="left", fill="both", expand=True)
-
         # Configurar tags para filas alternadas
         self.tree_recargas.tag_configure('oddrow', background=self.colors["table_odd"])
         self.tree_recargas.tag_configure('evenrow', background=self.colors["table_even"])
@@ -413,34 +426,35 @@ class RecargasTab(ttk.Frame):
     # ---------------------------------
     def _cargar_catalogos(self):
         """Carga todos los catálogos desde la base de datos"""
+        # Versión leída ANTES de consultar: un cambio concurrente no se pierde
+        self._version_catalogos = obtener_version_datos(*_TABLAS_CATALOGO)
         try:
             # Trabajadores
-            self.trabajadores = listar_trabajadores_activos()
-            nombres_trab = [t["name"] for t in self.trabajadores]
+            self.trabajadores = obtener_catalogo("trabajadores")
+            nombres_trab = self.trabajadores.etiquetas
             self.combo_trabajador["values"] = nombres_trab
             if nombres_trab:
                 self.combo_trabajador.current(0)
 
             # Países
-            self.paises = listar_paises_activos()
-            nombres_pais = [p["name"] for p in self.paises]
+            self.paises = obtener_catalogo("paises")
+            nombres_pais = self.paises.etiquetas
             self.combo_pais["values"] = nombres_pais
             if nombres_pais:
                 self.combo_pais.current(0)
 
             # Métodos de pago (solo tipo recarga o ambos)
-            self.metodos_pago = [
-                m for m in listar_metodos_pago_activos()
-                if m["type"] in ["recarga", "ambos"]
-            ]
-            nombres_mp = [m["name"] for m in self.metodos_pago]
+            self.metodos_pago = obtener_catalogo("metodos_pago").filtrar(
+                lambda m: m["type"] in ["recarga", "ambos"]
+            )
+            nombres_mp = self.metodos_pago.etiquetas
             self.combo_metodo["values"] = nombres_mp
             if nombres_mp:
                 self.combo_metodo.current(0)
 
             # Juegos - FORZAR CARGA
-            self.juegos = listar_juegos_activos()
-            nombres_juegos = [j["name"] for j in self.juegos]
+            self.juegos = obtener_catalogo("juegos")
+            nombres_juegos = self.juegos.etiquetas
             self.combo_juego["values"] = nombres_juegos
             if nombres_juegos:
                 self.combo_juego.current(0)
@@ -455,8 +469,8 @@ class RecargasTab(ttk.Frame):
     def _cargar_productos_forzado(self):
         """Carga productos forzadamente, asegurando que se actualicen"""
         try:
-            self.productos = listar_productos_activos()
-            nombres_prod = [p["name"] for p in self.productos]
+            self.productos = obtener_catalogo("productos")
+            nombres_prod = self.productos.etiquetas
             self.combo_producto["values"] = nombres_prod
             if nombres_prod:
                 self.combo_producto.current(0)
@@ -472,11 +486,12 @@ class RecargasTab(ttk.Frame):
         """Actualiza el combobox de productos según el juego seleccionado"""
         try:
             if juego_id is None:
-                prods = self.productos
+                nombres_prod = self.productos.etiquetas
             else:
-                prods = [p for p in self.productos if p.get("game_id") == juego_id]
+                nombres_prod = self.productos.etiquetas_de(
+                    self.productos.grupo("game_id", juego_id)
+                )
 
-            nombres_prod = [p["name"] for p in prods]
             self.combo_producto["values"] = nombres_prod
             if nombres_prod:
                 self.combo_producto.current(0)
@@ -488,12 +503,7 @@ class RecargasTab(ttk.Frame):
 
     def _filtrar_productos_por_juego(self, event=None):
         """Filtra productos cuando se selecciona un juego"""
-        nombre_juego = self.juego_var.get()
-        juego_id = None
-        for j in self.juegos:
-            if j["name"] == nombre_juego:
-                juego_id = j["id"]
-                break
+        juego_id = self.juegos.id_por_nombre(self.juego_var.get())
         self._refrescar_combo_productos(juego_id)
 
     # ---------------------------------
@@ -518,13 +528,6 @@ class RecargasTab(ttk.Frame):
     # ---------------------------------
     # LÓGICA: GUARDADO
     # ---------------------------------
-    def _obtener_id_seleccion(self, nombre: str, lista: list[dict], key_name: str = "name") -> int | None:
-        """Obtiene el ID de un elemento seleccionado en un combobox"""
-        for item in lista:
-            if item[key_name] == nombre:
-                return item["id"]
-        return None
-
     def _validar_formulario(self) -> bool:
         """Valida que todos los campos obligatorios estén llenos"""
         campos_obligatorios = [
@@ -561,11 +564,11 @@ class RecargasTab(ttk.Frame):
             cliente = self.cliente_var.get().strip() or None  # ✅ NUEVO: Obtener nombre del cliente
 
             # Obtener IDs de combobox
-            worker_id = self._obtener_id_seleccion(self.trabajador_var.get(), self.trabajadores)
-            country_id = self._obtener_id_seleccion(self.pais_var.get(), self.paises)
-            metodo_id = self._obtener_id_seleccion(self.metodo_var.get(), self.metodos_pago)
-            juego_id = self._obtener_id_seleccion(self.juego_var.get(), self.juegos)
-            producto_id = self._obtener_id_seleccion(self.producto_var.get(), self.productos)
+            worker_id = self.trabajadores.id_por_nombre(self.trabajador_var.get())
+            country_id = self.paises.id_por_nombre(self.pais_var.get())
+            metodo_id = self.metodos_pago.id_por_nombre(self.metodo_var.get())
+            juego_id = self.juegos.id_por_nombre(self.juego_var.get())
+            producto_id = self.productos.id_por_nombre(self.producto_var.get())
 
             if worker_id is None or country_id is None or metodo_id is None:
                 messagebox.showerror(
@@ -610,8 +613,8 @@ class RecargasTab(ttk.Frame):
                 # Limpiar formulario
                 self._limpiar_formulario()
 
-                # Cargar historial actualizado
-                self._cargar_historial()
+                # Agregar solo la recarga nueva a la tabla
+                self._refrescar_historial()
             else:
                 messagebox.showerror("❌ Error", "No se pudo guardar la recarga")
 
@@ -647,66 +650,101 @@ class RecargasTab(ttk.Frame):
     # TABLA HISTÓRICO - REAL
     # ---------------------------------
     def _cargar_historial(self):
-        """Carga el historial REAL de recargas desde la base de datos"""
-        # Limpiar tabla
-        for item in self.tree_recargas.get_children():
-            self.tree_recargas.delete(item)
+        """Carga la primera página REAL de recargas; el resto llega al hacer scroll"""
+        self._cursor_historial = None
 
         try:
-            # Obtener recargas desde operations.py
-            recargas = listar_recargas()
+            self._version_historial = obtener_version_datos("recharges")
 
-            if not recargas:
+            # Contar recargas de hoy directamente en SQLite
+            hoy = datetime.now().strftime("%Y-%m-%d")
+            self.contador_label.config(text=f"📊 Recargas hoy: {contar_recargas_del_dia(hoy)}")
+
+            pagina = listar_recargas_pagina(SETTINGS["page_size"])
+
+            if not pagina["filas"]:
                 # Si no hay recargas, mostrar mensaje
-                self.tree_recargas.insert("", "end", values=(
+                self.tabla_recargas.mostrar_mensaje((
                     "--", "--", "No hay recargas", "--", "--", "--", "--", "--"
                 ))
-                # Actualizar contador
-                self.contador_label.config(text="📊 Recargas hoy: 0")
                 return
 
-            # Contar recargas de hoy
-            hoy = datetime.now().strftime("%Y-%m-%d")
-            recargas_hoy = sum(1 for r in recargas if r["date"] == hoy)
-            self.contador_label.config(text=f"📊 Recargas hoy: {recargas_hoy}")
-
-            # Llenar tabla con datos reales
-            for i, r in enumerate(recargas):
-                tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-
-                # Obtener nombre del juego o mostrar "Sin juego"
-                juego_nombre = r.get("game_name", "Sin juego")
-                if not juego_nombre or juego_nombre == "None":
-                    juego_nombre = "Sin juego"
-
-                # Obtener nombre del cliente
-                cliente_nombre = r.get("customer_name", "")
-                if not cliente_nombre:
-                    cliente_nombre = "Sin cliente"
-
-                self.tree_recargas.insert(
-                    "",
-                    "end",
-                    tags=(tag,),
-                    values=(
-                        r.get("id", "--"),
-                        r.get("date", "--"),
-                        r.get("worker_name", "N/A"),
-                        cliente_nombre,  # ✅ AGREGADO: Mostrar cliente
-                        juego_nombre,
-                        f"${r.get('amount_received_usd', 0):.2f}",
-                        f"${r.get('cost_usd', 0):.2f}",
-                        f"${r.get('profit_usd', 0):.2f}"
-                    ),
-                )
+            self._cursor_historial = pagina["cursor"]
+            self.tabla_recargas.cargar(pagina["filas"])
 
         except Exception as e:
             print(f"Error al cargar recargas: {str(e)}")
             # Mostrar mensaje de error en tabla
-            self.tree_recargas.insert("", "end", values=(
+            self.tabla_recargas.mostrar_mensaje((
                 "--", "--", f"Error: {str(e)[:30]}...", "--", "--", "--", "--", "--"
             ))
 
+    def _refrescar_historial(self):
+        """Aplica solo las recargas nuevas/editadas/eliminadas desde la última carga"""
+        try:
+            cambios = obtener_cambios("recharges", self._version_historial)
+            if cambios is None:
+                self._cargar_historial()  # Registro podado: recarga completa
+                return
+            if not cambios["cambiados"] and not cambios["eliminados"]:
+                return
+
+            self.tabla_recargas.fusionar(
+                listar_recargas_por_ids(cambios["cambiados"]),
+                cambios["eliminados"],
+                clave_orden=lambda r: (r["date"], r["id"]),
+                limite=self._cursor_historial
+            )
+            self._version_historial = cambios["version"]
+
+            hoy = datetime.now().strftime("%Y-%m-%d")
+            self.contador_label.config(text=f"📊 Recargas hoy: {contar_recargas_del_dia(hoy)}")
+            if not len(self.tabla_recargas):
+                self.tabla_recargas.mostrar_mensaje((
+                    "--", "--", "No hay recargas", "--", "--", "--", "--", "--"
+                ))
+        except Exception as e:
+            print(f"Error al refrescar recargas: {str(e)}")
+
+    def _cargar_siguiente_pagina(self):
+        """La tabla llegó al final: agrega la siguiente página keyset"""
+        if self._cursor_historial is None:
+            return
+        try:
+            pagina = listar_recargas_pagina(SETTINGS["page_size"], self._cursor_historial)
+            self._cursor_historial = pagina["cursor"]
+            self.tabla_recargas.agregar(pagina["filas"])
+        except Exception as e:
+            print(f"Error al cargar más recargas: {str(e)}")
+
+    def _formatear_recarga(self, r: dict, indice: int) -> tuple:
+        """Convierte una recarga en (valores, tags) para la tabla virtual"""
+        tag = 'evenrow' if indice % 2 == 0 else 'oddrow'
+
+        # Obtener nombre del juego o mostrar "Sin juego"
+        juego_nombre = r.get("game_name", "Sin juego")
+        if not juego_nombre or juego_nombre == "None":
+            juego_nombre = "Sin juego"
+
+        # Obtener nombre del cliente
+        cliente_nombre = r.get("customer_name", "")
+        if not cliente_nombre:
+            cliente_nombre = "Sin cliente"
+
+        return (
+            (
+                r.get("id", "--"),
+                r.get("date", "--"),
+                r.get("worker_name", "N/A"),
+                cliente_nombre,  # ✅ AGREGADO: Mostrar cliente
+                juego_nombre,
+                f"${r.get('amount_received_usd', 0):.2f}",
+                f"${r.get('cost_usd', 0):.2f}",
+                f"${r.get('profit_usd', 0):.2f}"
+            ),
+            (tag,)
+        )
+
     def _eliminar_recarga(self):
         """Elimina la recarga seleccionada de la base de datos"""
         seleccion = self.tree_recargas.selection()
@@ -739,7 +777,7 @@ class RecargasTab(ttk.Frame):
                 # Llamar a la función de operations.py
                 if eliminar_recarga(recarga_id):
                     messagebox.showinfo("✅ Éxito", f"Recarga #{recarga_id} eliminada correctamente.")
-                    self._cargar_historial()  # Actualizar tabla
+                    self._refrescar_historial()  # Quitar solo esa fila
                 else:
                     messagebox.showerror("❌ Error", "No se pudo eliminar la recarga.")
             except Exception as e:
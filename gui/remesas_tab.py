@@ -15,15 +15,22 @@ from tkinter import ttk, messagebox
 from datetime import datetime
 
 from database.operations import (
-    listar_trabajadores_activos,
-    listar_paises_activos,
-    listar_monedas_activas,
-    listar_metodos_pago_activos,
+    obtener_catalogo,
     agregar_remesa,
     editar_remesa,
     eliminar_remesa,
-    listar_remesas,
+    listar_remesas_pagina,
+    listar_remesas_por_ids,
+    contar_remesas_del_dia,
+    obtener_version_datos,
+    obtener_cambios,
 )
+from database.catalogos import Catalogo
+from gui.tabla_virtual import TablaVirtual
+from utils.config import SETTINGS
+
+# Tablas de las que salen los combos (y los nombres mostrados en la tabla)
+_TABLAS_CATALOGO = ("workers", "countries", "payment_methods", "currencies")
 
 
 class RemesasTab(ttk.Frame):
@@ -33,10 +40,10 @@ class RemesasTab(ttk.Frame):
         self.configure(style="Card.TFrame")
 
         # Caches de catálogos
-        self.trabajadores = []
-        self.paises = []
-        self.monedas = []
-        self.metodos_pago = []
+        self.trabajadores = Catalogo([])
+        self.paises = Catalogo([])
+        self.monedas = Catalogo([])
+        self.metodos_pago = Catalogo([])
 
         # Variables para cálculos
         self.monto_bs_var = tk.StringVar(value="0.00")
@@ -45,6 +52,13 @@ class RemesasTab(ttk.Frame):
         self.ganancia_bruta_var = tk.StringVar(value="0.0000")
         self.ganancia_neta_var = tk.StringVar(value="0.0000")
 
+        # Paginación keyset de la tabla (None = no hay más páginas)
+        self._cursor_remesas = None
+
+        # Versiones de datos ya mostradas (refresco incremental)
+        self._version_catalogos = None
+        self._version_remesas = 0
+
         # Crear canvas con scroll
         self._crear_scrollable_frame()
 
@@ -57,8 +71,16 @@ class RemesasTab(ttk.Frame):
     # MÉTODO PÚBLICO PARA REFRESCAR
     # ---------------------------------
     def recargar_catalogos(self):
-        """Relee catálogos desde la BD y actualiza los combos."""
-        self._cargar_catalogos()
+        """Relee catálogos desde la BD solo si cambiaron y actualiza los combos."""
+        if obtener_version_datos(*_TABLAS_CATALOGO) != self._version_catalogos:
+            self._cargar_catalogos()
+            # Nombres de trabajador/moneda pudieron cambiar en filas ya mostradas
+            self._cargar_remesas()
+
+    def refrescar(self):
+        """Al volver a la pestaña: catálogos y remesas, solo lo que cambió."""
+        self.recargar_catalogos()
+        self._refrescar_remesas()
 
     # ---------------------------------
     # SCROLLABLE FRAME
@@ -477,23 +499,17 @@ class RemesasTab(ttk.Frame):
         table_inner_frame = ttk.Frame(table_frame)
         table_inner_frame.pack(fill="both", expand=True)
 
-        # Treeview con scroll
-        tree_scroll = ttk.Scrollbar(
-            table_inner_frame,
-            style="Vertical.TScrollbar"
-        )
-        tree_scroll.pack(side="right", fill="y")
-
+        # Tabla virtual: solo se materializan las filas visibles
         cols = ("id", "fecha", "trabajador", "remitente", "monto_origen", "monto_bs", "ganancia_usdt")
-        self.tree_remesas = ttk.Treeview(
+        self.tabla_remesas = TablaVirtual(
             table_inner_frame,
-            columns=cols,
-            show="headings",
-            height=10,
-            yscrollcommand=tree_scroll.set,
-            style="Custom.Treeview"
+            cols,
+            formateador=self._formatear_remesa,
+            altura=10,
+            al_final=self._cargar_siguiente_pagina
         )
-        tree_scroll.config(command=self.tree_remesas.yview)
+        self.tabla_remesas.pack(fill="both", expand=True)
+        self.tree_remesas = self.tabla_remesas.tree
 
         # Configurar columnas
         column_widths = {
@@ -518,8 +534,6 @@ class RemesasTab(ttk.Frame):
             self.tree_remesas.heading(col, text=display_name)
             self.tree_remesas.column(col, width=column_widths.get(col, 100))
 
-        self.tree_remesas.pack(side="left", fill="both", expand=True)
-
         # Configurar tags para filas alternadas
         self.tree_remesas.tag_configure('oddrow', background=self.colors["table_odd"])
         self.tree_remesas.tag_configure('evenrow', background=self.colors["table_even"])
@@ -559,33 +573,37 @@ class RemesasTab(ttk.Frame):
     # ---------------------------------
     def _cargar_catalogos(self):
         """Carga todos los catálogos desde la base de datos"""
+        # Versión leída ANTES de consultar: un cambio concurrente no se pierde
+        self._version_catalogos = obtener_version_datos(*_TABLAS_CATALOGO)
+
         # Trabajadores
-        self.trabajadores = listar_trabajadores_activos()
-        nombres_trab = [t["name"] for t in self.trabajadores]
+        self.trabajadores = obtener_catalogo("trabajadores")
+        nombres_trab = self.trabajadores.etiquetas
         self.combo_trabajador["values"] = nombres_trab
         if nombres_trab:
             self.combo_trabajador.current(0)
 
         # Países
-        self.paises = listar_paises_activos()
-        nombres_pais = [p["name"] for p in self.paises]
+        self.paises = obtener_catalogo("paises")
+        nombres_pais = self.paises.etiquetas
         self.combo_pais["values"] = nombres_pais
         if nombres_pais:
             self.combo_pais.current(0)
 
         # Métodos de pago (solo tipo remesa o ambos)
-        self.metodos_pago = [
-            m for m in listar_metodos_pago_activos()
-            if m["type"] in ["remesa", "ambos"]
-        ]
-        nombres_mp = [m["name"] for m in self.metodos_pago]
+        self.metodos_pago = obtener_catalogo("metodos_pago").filtrar(
+            lambda m: m["type"] in ["remesa", "ambos"]
+        )
+        nombres_mp = self.metodos_pago.etiquetas
         self.combo_metodo["values"] = nombres_mp
         if nombres_mp:
             self.combo_metodo.current(0)
 
         # Monedas
-        self.monedas = listar_monedas_activas()
-        nombres_monedas = [f"{m['code']} - {m['name']}" for m in self.monedas]
+        # Etiqueta "USD - Dólar": se indexa por ese texto completo
+        self.monedas = Catalogo(obtener_catalogo("monedas").filas, "code",
+                                etiqueta=lambda m: f"{m['code']} - {m['name']}")
+        nombres_monedas = self.monedas.etiquetas
         self.combo_moneda["values"] = nombres_monedas
         if nombres_monedas:
             self.combo_moneda.current(0)
@@ -650,28 +668,18 @@ class RemesasTab(ttk.Frame):
     # ---------------------------------
     # LÓGICA: GUARDADO
     # ---------------------------------
-    def _obtener_id_seleccion(self, nombre: str, lista: list[dict], key_name: str = "name") -> int | None:
-        """Obtiene el ID de un elemento seleccionado en un combobox"""
-        for item in lista:
-            if item[key_name] == nombre:
-                return item["id"]
-        return None
-
     def _obtener_currency_id_desde_combo(self) -> int | None:
         """Extrae el ID de moneda del combobox formato 'USD - Dólar'"""
         seleccion = self.moneda_var.get()
         if not seleccion:
             return None
 
-        try:
-            # Formato: "USD - Dólar estadounidense"
-            codigo = seleccion.split(" - ")[0].strip()
-            for moneda in self.monedas:
-                if moneda["code"] == codigo:
-                    return moneda["id"]
-        except:
-            pass
-        return None
+        currency_id = self.monedas.id_por_nombre(seleccion)
+        if currency_id is None:
+            # Texto escrito a mano: basta con el código ("USD - ...")
+            codigo = seleccion.split(" - ")[0].strip().upper()
+            currency_id = obtener_catalogo("monedas").id_por_nombre(codigo)
+        return currency_id
 
     def _validar_formulario(self) -> bool:
         """Valida que todos los campos obligatorios estén llenos"""
@@ -707,9 +715,9 @@ class RemesasTab(ttk.Frame):
 
         try:
             # Obtener IDs de combobox
-            worker_id = self._obtener_id_seleccion(self.trabajador_var.get(), self.trabajadores)
-            country_id = self._obtener_id_seleccion(self.pais_var.get(), self.paises)
-            metodo_id = self._obtener_id_seleccion(self.metodo_var.get(), self.metodos_pago)
+            worker_id = self.trabajadores.id_por_nombre(self.trabajador_var.get())
+            country_id = self.paises.id_por_nombre(self.pais_var.get())
+            metodo_id = self.metodos_pago.id_por_nombre(self.metodo_var.get())
             currency_id = self._obtener_currency_id_desde_combo()
 
             if not all([worker_id, country_id, metodo_id, currency_id]):
@@ -752,7 +760,7 @@ class RemesasTab(ttk.Frame):
                     f"💵 Ganancia neta: {self.ganancia_neta_label.cget('text')}"
                 )
                 self._limpiar_formulario()
-                self._cargar_remesas()
+                self._refrescar_remesas()
             else:
                 messagebox.showerror("❌ Error", "No se pudo guardar la remesa")
 
@@ -799,46 +807,78 @@ class RemesasTab(ttk.Frame):
     # TABLA DE REMESAS
     # ---------------------------------
     def _cargar_remesas(self):
-        """Carga las remesas desde la base de datos y actualiza la tabla"""
-        # Limpiar tabla
-        for item in self.tree_remesas.get_children():
-            self.tree_remesas.delete(item)
+        """Carga la primera página de remesas; el resto llega al hacer scroll"""
+        self._cursor_remesas = None
 
         try:
-            # Obtener remesas desde operations.py
-            remesas = listar_remesas()
+            self._version_remesas = obtener_version_datos("remittances")
 
-            # Contar remesas de hoy
+            # Contar remesas de hoy directamente en SQLite
             hoy = datetime.now().strftime("%Y-%m-%d")
-            remesas_hoy = sum(1 for r in remesas if r["date"] == hoy)
-            self.contador_label.config(text=f"📊 Remesas hoy: {remesas_hoy}")
-
-            # Llenar tabla con estilos alternados
-            for i, r in enumerate(remesas):
-                tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-
-                # Formatear valores
-                monto_bs_formatted = f"Bs {r['amount_destiny_bs']:,.2f}" if r['amount_destiny_bs'] else "Bs 0.00"
-
-                self.tree_remesas.insert(
-                    "",
-                    "end",
-                    tags=(tag,),  # Aplicar estilo alternado
-                    values=(
-                        r["id"],
-                        r["date"],
-                        r.get("worker_name", "N/A"),
-                        r.get("sender_name", "N/A"),
-                        f"{r['amount_origin']:.2f}",
-                        monto_bs_formatted,
-                        f"{r['profit_net_usdt']:.4f} USDT"
-                    ),
-                )
+            self.contador_label.config(text=f"📊 Remesas hoy: {contar_remesas_del_dia(hoy)}")
+
+            pagina = listar_remesas_pagina(SETTINGS["page_size"])
+            self._cursor_remesas = pagina["cursor"]
+            self.tabla_remesas.cargar(pagina["filas"])
 
         except Exception as e:
             print(f"Error al cargar remesas: {str(e)}")
             messagebox.showerror("❌ Error", f"No se pudieron cargar las remesas:\n{str(e)}")
 
+    def _refrescar_remesas(self):
+        """Aplica solo las remesas nuevas/editadas/eliminadas desde la última carga"""
+        try:
+            cambios = obtener_cambios("remittances", self._version_remesas)
+            if cambios is None:
+                self._cargar_remesas()  # Registro podado: recarga completa
+                return
+            if not cambios["cambiados"] and not cambios["eliminados"]:
+                return
+
+            self.tabla_remesas.fusionar(
+                listar_remesas_por_ids(cambios["cambiados"]),
+                cambios["eliminados"],
+                clave_orden=lambda r: (r["date"], r["id"]),
+                limite=self._cursor_remesas
+            )
+            self._version_remesas = cambios["version"]
+
+            hoy = datetime.now().strftime("%Y-%m-%d")
+            self.contador_label.config(text=f"📊 Remesas hoy: {contar_remesas_del_dia(hoy)}")
+        except Exception as e:
+            print(f"Error al refrescar remesas: {str(e)}")
+
+    def _cargar_siguiente_pagina(self):
+        """La tabla llegó al final: agrega la siguiente página keyset"""
+        if self._cursor_remesas is None:
+            return
+        try:
+            pagina = listar_remesas_pagina(SETTINGS["page_size"], self._cursor_remesas)
+            self._cursor_remesas = pagina["cursor"]
+            self.tabla_remesas.agregar(pagina["filas"])
+        except Exception as e:
+            print(f"Error al cargar más remesas: {str(e)}")
+
+    def _formatear_remesa(self, r: dict, indice: int) -> tuple:
+        """Convierte una remesa en (valores, tags) con estilos alternados"""
+        tag = 'evenrow' if indice % 2 == 0 else 'oddrow'
+
+        # Formatear valores
+        monto_bs_formatted = f"Bs {r['amount_destiny_bs']:,.2f}" if r['amount_destiny_bs'] else "Bs 0.00"
+
+        return (
+            (
+                r["id"],
+                r["date"],
+                r.get("worker_name", "N/A"),
+                r.get("sender_name", "N/A"),
+                f"{r['amount_origin']:.2f}",
+                monto_bs_formatted,
+                f"{r['profit_net_usdt']:.4f} USDT"
+            ),
+            (tag,)
+        )
+
     def _eliminar_remesa(self):
         """Elimina la remesa seleccionada de la tabla"""
         seleccion = self.tree_remesas.selection()
@@ -863,7 +903,7 @@ class RemesasTab(ttk.Frame):
                 # Llamar a la función de operations.py
                 if eliminar_remesa(remesa_id):
                     messagebox.showinfo("✅ Éxito", f"Remesa #{remesa_id} eliminada correctamente.")
-                    self._cargar_remesas()
+                    self._refrescar_remesas()
                 else:
                     messagebox.showerror("❌ Error", "No se pudo eliminar la remesa.")
             except Exception as e:
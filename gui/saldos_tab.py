@@ -20,7 +20,7 @@ from database.operations import (
     agregar_cuenta_financiera,
     editar_cuenta_financiera,
     eliminar_cuenta_financiera,
-    actualizar_balance_cuenta,
+    actualizar_balances_cuentas,
 
     # Funciones para deducciones
     listar_deducciones_pendientes,
@@ -33,12 +33,21 @@ from database.operations import (
     crear_snapshot_financiero,
     listar_snapshots_financieros,
     eliminar_snapshot_financiero,
+    comparar_snapshots_financieros,
 
     # Funciones de búsqueda/filtro
     buscar_cuentas_por_nombre,
     filtrar_cuentas_por_tipo,
     filtrar_cuentas_por_saldo,
+
+    # Versiones de datos (refresco incremental)
+    obtener_version_datos,
 )
+from database.catalogos import Catalogo
+
+# Tablas que alimentan esta pestaña
+_TABLAS_SALDOS = ("financial_accounts", "financial_deductions",
+                  "account_movements", "financial_snapshots")
 
 
 class SaldosTab(ttk.Frame):
@@ -49,8 +58,11 @@ class SaldosTab(ttk.Frame):
 
         # Caché de datos
         self.cuentas = []
+        self._indice_cuentas = Catalogo([])
         self.deducciones = []
         self.snapshots = []
+        self._indice_snapshots = Catalogo([])
+        self._version_datos = None
 
         # Variables para filtros
         self.filtro_tipo = tk.StringVar(value="todos")
@@ -67,8 +79,14 @@ class SaldosTab(ttk.Frame):
     # ---------------------------------
     # MÉTODO PÚBLICO PARA REFRESCAR
     # ---------------------------------
+    def refrescar(self):
+        """Al volver a la pestaña: recarga solo si algo cambió en las finanzas"""
+        if obtener_version_datos(*_TABLAS_SALDOS) != self._version_datos:
+            self.recargar_datos()
+
     def recargar_datos(self):
         """Recarga todos los datos desde la base de datos"""
+        self._version_datos = obtener_version_datos(*_TABLAS_SALDOS)
         self._cargar_cuentas()
         self._cargar_deducciones()
         self._cargar_snapshots()
@@ -462,6 +480,33 @@ class SaldosTab(ttk.Frame):
             style="Success.TButton"
         ).pack(pady=(10, 0))
 
+        # Comparar dos snapshots guardados
+        row2 = ttk.Frame(snapshots_frame)
+        row2.pack(fill="x", pady=(15, 0))
+
+        ttk.Label(
+            row2,
+            text="Comparar:",
+            foreground=self.colors["text_light"]
+        ).pack(side="left", padx=(0, 10))
+
+        self.snapshot_antes_var = tk.StringVar()
+        self.combo_snapshot_antes = ttk.Combobox(row2, textvariable=self.snapshot_antes_var, state="readonly", width=32)
+        self.combo_snapshot_antes.pack(side="left")
+
+        ttk.Label(row2, text="→", foreground=self.colors["text_light"]).pack(side="left", padx=10)
+
+        self.snapshot_despues_var = tk.StringVar()
+        self.combo_snapshot_despues = ttk.Combobox(row2, textvariable=self.snapshot_despues_var, state="readonly", width=32)
+        self.combo_snapshot_despues.pack(side="left", padx=(0, 20))
+
+        ttk.Button(
+            row2,
+            text="🔍 COMPARAR",
+            command=self._comparar_snapshots,
+            style="Secondary.TButton"
+        ).pack(side="left")
+
     # ---------------------------------
     # FUNCIONES DE CARGA DE DATOS
     # ---------------------------------
@@ -469,6 +514,7 @@ class SaldosTab(ttk.Frame):
         """Carga las cuentas desde la base de datos"""
         try:
             self.cuentas = listar_cuentas_financieras_activas()
+            self._indice_cuentas = Catalogo(self.cuentas)
             self._actualizar_tabla_cuentas()
             self._actualizar_actualizacion_masiva()
         except Exception as e:
@@ -486,7 +532,11 @@ class SaldosTab(ttk.Frame):
     def _cargar_snapshots(self):
         """Carga los snapshots guardados"""
         try:
-            self.snapshots = listar_snapshots_financieros(limite=10)
+            self.snapshots = listar_snapshots_financieros(limite=30)
+            self._indice_snapshots = Catalogo(
+                self.snapshots, etiqueta=lambda s: f"{s['name']} ({s['created_at'][:16]})"
+            )
+            self._actualizar_combos_snapshots()
         except Exception as e:
             print(f"Error al cargar snapshots: {e}")
 
@@ -504,8 +554,7 @@ class SaldosTab(ttk.Frame):
     def _actualizar_tabla_cuentas(self):
         """Actualiza la tabla de cuentas con los datos cargados"""
         # Limpiar tabla
-        for item in self.tree_cuentas.get_children():
-            self.tree_cuentas.delete(item)
+        self.tree_cuentas.delete(*self.tree_cuentas.get_children())
 
         if not self.cuentas:
             self.tree_cuentas.insert("", "end", values=(
@@ -667,7 +716,7 @@ class SaldosTab(ttk.Frame):
                     nuevo_saldo = float(widget.nuevo_saldo_var.get() or 0)
 
                     # Encontrar cuenta para obtener saldo actual
-                    cuenta = next((c for c in self.cuentas if c["id"] == cuenta_id), None)
+                    cuenta = self._indice_cuentas.por_id.get(cuenta_id)
                     if cuenta:
                         saldo_actual = cuenta["balance"]
                         if nuevo_saldo != saldo_actual:
@@ -693,14 +742,18 @@ class SaldosTab(ttk.Frame):
 
         if messagebox.askyesno("💾 Confirmar cambios", mensaje):
             try:
-                for cambio in cambios:
-                    actualizar_balance_cuenta(
-                        cambio["id"],
-                        cambio["nuevo"],
-                        f"Actualización masiva - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-                    )
-
-                messagebox.showinfo("✅ Éxito", f"{len(cambios)} cuentas actualizadas correctamente.")
+                # Una sola transacción: si algo falla no se guarda ninguna cuenta
+                resultados = actualizar_balances_cuentas(
+                    [(cambio["id"], cambio["nuevo"]) for cambio in cambios],
+                    f"Actualización masiva - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                )
+
+                actualizadas = sum(1 for r in resultados if r["estado"] == "actualizada")
+                mensaje = f"{actualizadas} cuentas actualizadas correctamente."
+                faltantes = [c["nombre"] for c, r in zip(cambios, resultados) if r["estado"] == "no_existe"]
+                if faltantes:
+                    mensaje += "\n\nYa no existen (no se actualizaron):\n• " + "\n• ".join(faltantes)
+                messagebox.showinfo("✅ Éxito", mensaje)
                 self.recargar_datos()
 
             except Exception as e:
@@ -844,6 +897,27 @@ class SaldosTab(ttk.Frame):
                         foreground=self.colors["text_light"]
                     ).pack(anchor="w")
 
+        # Con varias monedas el subtotal las suma tal cual: se muestran por separado
+        monedas = resumen.get('subtotales_por_moneda', [])
+        if len(monedas) > 1:
+            monedas_frame = ttk.Frame(self.frame_resumen)
+            monedas_frame.grid(row=2, column=0, columnspan=3, pady=(15, 0), sticky="w")
+
+            ttk.Label(
+                monedas_frame,
+                text="💱 Subtotal por moneda:",
+                font=("Segoe UI", 11, "bold"),
+                foreground=self.colors["text_light"]
+            ).pack(anchor="w")
+
+            for moneda in monedas:
+                texto = f"  • {moneda['currency']}: {moneda['total']:,.2f} ({moneda['cantidad']} cuentas)"
+                ttk.Label(
+                    monedas_frame,
+                    text=texto,
+                    foreground=self.colors["text_light"]
+                ).pack(anchor="w")
+
     # ---------------------------------
     # FUNCIONES PARA SNAPSHOTS
     # ---------------------------------
@@ -870,6 +944,130 @@ class SaldosTab(ttk.Frame):
         except Exception as e:
             messagebox.showerror("❌ Error", f"No se pudo crear el snapshot:\n{str(e)}")
 
+    def _actualizar_combos_snapshots(self):
+        """Llena los combos de comparación (por defecto: los dos últimos)"""
+        etiquetas = self._indice_snapshots.etiquetas
+        self.combo_snapshot_antes['values'] = etiquetas
+        self.combo_snapshot_despues['values'] = etiquetas
+
+        if self.snapshot_antes_var.get() not in etiquetas:
+            self.snapshot_antes_var.set(etiquetas[1] if len(etiquetas) > 1 else "")
+        if self.snapshot_despues_var.get() not in etiquetas:
+            self.snapshot_despues_var.set(etiquetas[0] if etiquetas else "")
+
+    def _comparar_snapshots(self):
+        """Compara los dos snapshots elegidos y muestra las diferencias"""
+        antes_id = self._indice_snapshots.id_por_nombre(self.snapshot_antes_var.get())
+        despues_id = self._indice_snapshots.id_por_nombre(self.snapshot_despues_var.get())
+
+        if antes_id is None or despues_id is None:
+            messagebox.showwarning("⚠️ Selección requerida", "Elige dos snapshots para comparar.")
+            return
+        if antes_id == despues_id:
+            messagebox.showwarning("⚠️ Mismo snapshot", "Elige dos snapshots distintos.")
+            return
+
+        try:
+            comparacion = comparar_snapshots_financieros(antes_id, despues_id)
+        except Exception as e:
+            messagebox.showerror("❌ Error", f"No se pudieron comparar los snapshots:\n{str(e)}")
+            return
+
+        if comparacion is None:
+            messagebox.showwarning("⚠️ No encontrado", "Uno de los snapshots ya no existe.")
+            self._cargar_snapshots()
+            return
+
+        self._mostrar_comparacion(comparacion)
+
+    def _mostrar_comparacion(self, comparacion):
+        """Ventana con el resumen, las cuentas y las deducciones que cambiaron"""
+        ventana = tk.Toplevel(self)
+        ventana.title("🔍 Comparación de snapshots")
+        ventana.geometry("760x560")
+        ventana.configure(bg=self.colors["bg_primary"])
+        ventana.transient(self)
+
+        main_frame = ttk.Frame(ventana, padding=20)
+        main_frame.pack(fill="both", expand=True)
+
+        antes, despues = comparacion["antes"], comparacion["despues"]
+        ttk.Label(
+            main_frame,
+            text=f"{antes['name']} ({antes['created_at'][:16]})  →  {despues['name']} ({despues['created_at'][:16]})",
+            font=("Segoe UI", 11, "bold"),
+            foreground=self.colors["primary"]
+        ).pack(anchor="w", pady=(0, 10))
+
+        # Resumen
+        resumen_frame = ttk.Frame(main_frame)
+        resumen_frame.pack(fill="x", pady=(0, 10))
+        titulos = {
+            "subtotal": "Subtotal cuentas",
+            "total_deducciones": "Deducciones",
+            "total_real": "Total real",
+        }
+        for col, (campo, titulo) in enumerate(titulos.items()):
+            valores = comparacion["resumen"][campo]
+            diferencia = valores["diferencia"]
+            signo = "+" if diferencia > 0 else ""
+            ttk.Label(
+                resumen_frame,
+                text=f"{titulo}\n${valores['antes']:,.2f} → ${valores['despues']:,.2f}\n({signo}${diferencia:,.2f})",
+                foreground=self.colors["text_light"],
+                justify="center"
+            ).grid(row=0, column=col, padx=15, sticky="w")
+
+        # Cuentas
+        tabla_frame = ttk.Frame(main_frame)
+        tabla_frame.pack(fill="both", expand=True)
+
+        tree_scroll = ttk.Scrollbar(tabla_frame)
+        tree_scroll.pack(side="right", fill="y")
+
+        cols = ("cuenta", "antes", "despues", "diferencia", "estado")
+        tree = ttk.Treeview(
+            tabla_frame,
+            columns=cols,
+            show="headings",
+            height=12,
+            yscrollcommand=tree_scroll.set,
+            style="Custom.Treeview"
+        )
+        tree_scroll.config(command=tree.yview)
+
+        for col, titulo, ancho in (("cuenta", "CUENTA", 200), ("antes", "ANTES", 120),
+                                   ("despues", "DESPUÉS", 120), ("diferencia", "DIFERENCIA", 120),
+                                   ("estado", "ESTADO", 100)):
+            tree.heading(col, text=titulo)
+            tree.column(col, width=ancho, anchor="w" if col == "cuenta" else "center")
+        tree.pack(fill="both", expand=True)
+
+        estados = {"nueva": "🆕 Nueva", "cerrada": "🔒 Cerrada", "cambio": "✏️ Cambió", "sin_cambio": "—"}
+        for cuenta in comparacion["cuentas"]:
+            signo = "+" if cuenta["diferencia"] > 0 else ""
+            tree.insert("", "end", values=(
+                cuenta["name"],
+                f"${cuenta['antes']:,.2f}",
+                f"${cuenta['despues']:,.2f}",
+                f"{signo}${cuenta['diferencia']:,.2f}",
+                estados[cuenta["estado"]]
+            ))
+
+        # Deducciones
+        deducciones = comparacion["deducciones"]
+        lineas = [f"🆕 {d['description']}: ${d['amount']:,.2f}" for d in deducciones["nuevas"]]
+        lineas += [f"✅ {d['description']}: ${d['amount']:,.2f} (ya no pendiente)" for d in deducciones["resueltas"]]
+        lineas += [f"✏️ {d['description']}: ${d['antes']:,.2f} → ${d['despues']:,.2f}" for d in deducciones["cambiadas"]]
+        ttk.Label(
+            main_frame,
+            text="Deducciones:\n" + ("\n".join(lineas) if lineas else "Sin cambios"),
+            foreground=self.colors["text_light"],
+            justify="left"
+        ).pack(anchor="w", pady=(10, 0))
+
+        ttk.Button(main_frame, text="Cerrar", command=ventana.destroy).pack(pady=(10, 0))
+
     # ---------------------------------
     # FUNCIONES PARA AGREGAR/EDITAR CUENTAS
     # ---------------------------------
@@ -958,7 +1156,7 @@ class SaldosTab(ttk.Frame):
 
         # Si es edición, cargar datos existentes
         if cuenta_id is not None:
-            cuenta = next((c for c in self.cuentas if c["id"] == cuenta_id), None)
+            cuenta = self._indice_cuentas.por_id.get(cuenta_id)
             if cuenta:
                 nombre_var.set(cuenta["name"])
                 tipo_var.set(cuenta["type"])
@@ -1098,7 +1296,7 @@ class SaldosTab(ttk.Frame):
 
         ttk.Label(main_frame, text="Cuenta relacionada (opcional):", foreground=self.colors["text_light"]).grid(row=2, column=0, sticky="w", pady=10)
         cuenta_var = tk.StringVar()
-        nombres_cuentas = [c["name"] for c in self.cuentas]
+        nombres_cuentas = self._indice_cuentas.etiquetas
         combo_cuenta = ttk.Combobox(main_frame, textvariable=cuenta_var, values=nombres_cuentas, width=37)
         combo_cuenta.grid(row=2, column=1, pady=10, padx=(10, 0))
 
@@ -1133,9 +1331,7 @@ class SaldosTab(ttk.Frame):
                 # Obtener ID de la cuenta si se seleccionó una
                 cuenta_id = None
                 if cuenta_nombre:
-                    cuenta = next((c for c in self.cuentas if c["name"] == cuenta_nombre), None)
-                    if cuenta:
-                        cuenta_id = cuenta["id"]
+                    cuenta_id = self._indice_cuentas.id_por_nombre(cuenta_nombre)
 
                 # Agregar deducción
                 nueva_id = agregar_deduccion(descripcion, monto, cuenta_id, fecha_limite, notas)
@@ -0,0 +1,241 @@
+"""
+gui/tabla_virtual.py - TABLA VIRTUALIZADA SOBRE TTK.TREEVIEW
+│
+│ Propósito:
+│ • Mostrar miles de filas sin congelar el mainloop de Tk
+│ • Solo existen en el Treeview las filas visibles + un pequeño buffer
+│ • Las filas se reciclan: al desplazarse se reescriben sus valores
+│ • Avisa cuando se llega al final para cargar la siguiente página
+"""
+
+from tkinter import ttk
+from typing import Any, Callable, Optional, Sequence
+
+
+class TablaVirtual(ttk.Frame):
+    """
+    Treeview que materializa solo la ventana visible de una lista de filas.
+
+    • formateador(fila, indice) -> (valores, tags) convierte cada fila de datos
+    • al_final() se llama cuando la ventana alcanza el final de los datos
+    • self.tree queda expuesto para heading/column/tag_configure/selection
+    """
+
+    def __init__(self, parent, columnas: Sequence[str],
+                 formateador: Callable[[Any, int], tuple],
+                 altura: int = 12,
+                 buffer: int = 5,
+                 al_final: Optional[Callable[[], None]] = None,
+                 style: str = "Custom.Treeview",
+                 xscroll: bool = False):
+        super().__init__(parent)
+
+        self.formateador = formateador
+        self.al_final = al_final
+        self.buffer = buffer
+
+        self._datos: list = []
+        self._inicio = 0                 # Índice de datos de la primera fila visible
+        self._visibles = altura          # Filas que caben en pantalla
+        self._items: list[str] = []      # Pool de filas recicladas del Treeview
+        self._seleccion: set[int] = set()  # Índices de datos seleccionados
+        self._seleccion_programada: tuple = ()
+        self._pidiendo_mas = False
+
+        self._rowheight = int(ttk.Style().lookup(style, "rowheight") or 20)
+
+        # Scrollbar propio: el Treeview nunca se desplaza por sí mismo
+        self.scroll_y = ttk.Scrollbar(self, orient="vertical",
+                                      command=self._on_scrollbar,
+                                      style="Vertical.TScrollbar")
+        self.scroll_y.pack(side="right", fill="y")
+
+        self.tree = ttk.Treeview(self, columns=columnas, show="headings",
+                                 height=altura, style=style)
+
+        if xscroll:
+            scroll_x = ttk.Scrollbar(self, orient="horizontal",
+                                     command=self.tree.xview,
+                                     style="Horizontal.TScrollbar")
+            scroll_x.pack(side="bottom", fill="x")
+            self.tree.configure(xscrollcommand=scroll_x.set)
+
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        # Desplazamiento con rueda y teclado sobre los datos, no sobre el widget
+        self.tree.bind("<MouseWheel>", self._on_rueda)
+        self.tree.bind("<Button-4>", lambda e: self._desplazar(-3))
+        self.tree.bind("<Button-5>", lambda e: self._desplazar(3))
+        self.tree.bind("<Down>", lambda e: self._mover_seleccion(1))
+        self.tree.bind("<Up>", lambda e: self._mover_seleccion(-1))
+        self.tree.bind("<Next>", lambda e: self._desplazar(self._visibles))
+        self.tree.bind("<Prior>", lambda e: self._desplazar(-self._visibles))
+        self.tree.bind("<<TreeviewSelect>>", self._on_seleccion, add="+")
+        self.tree.bind("<Configure>", self._on_configure)
+
+    # ========================================
+    # 📥 DATOS
+    # ========================================
+    def cargar(self, filas: list):
+        """Reemplaza todos los datos y vuelve al inicio"""
+        self._datos = list(filas)
+        self._inicio = 0
+        self._seleccion.clear()
+        self._pidiendo_mas = False
+        self._renderizar()
+
+    def agregar(self, filas: list):
+        """Agrega filas al final (p.ej. la siguiente página keyset)"""
+        self._datos.extend(filas)
+        self._pidiendo_mas = False
+        self._renderizar()
+
+    def fusionar(self, cambiadas: list, eliminados: list,
+                 clave_orden: Callable[[Any], Any],
+                 limite: Any = None,
+                 clave: Callable[[Any], Any] = lambda f: f["id"]):
+        """
+        Aplica cambios incrementales sin recargar ni volver al inicio.
+        Quita 'eliminados', reemplaza/inserta 'cambiadas' y mantiene el orden
+        descendente de clave_orden. Con 'limite' (clave de la última fila
+        cargada) se ignoran filas más viejas: llegarán con la siguiente página.
+        """
+        quitar = set(eliminados) | {clave(f) for f in cambiadas}
+        datos = [f for f in self._datos if clave(f) not in quitar]
+        datos.extend(f for f in cambiadas if limite is None or clave_orden(f) >= limite)
+        datos.sort(key=clave_orden, reverse=True)
+        self._datos = datos
+        self._seleccion.clear()
+        self._renderizar()
+
+    def limpiar(self):
+        """Vacía la tabla de un solo golpe"""
+        self._datos = []
+        self._inicio = 0
+        self._seleccion.clear()
+        if self._items:
+            self.tree.delete(*self._items)
+            self._items = []
+        self._actualizar_scrollbar()
+
+    def mostrar_mensaje(self, valores: tuple):
+        """Vacía la tabla y muestra una única fila informativa"""
+        self.limpiar()
+        self._items.append(self.tree.insert("", "end", values=valores))
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    @property
+    def datos(self) -> list:
+        return self._datos
+
+    def filas_seleccionadas(self) -> list:
+        """Filas de datos seleccionadas (no solo las visibles)"""
+        return [self._datos[i] for i in sorted(self._seleccion) if i < len(self._datos)]
+
+    # ========================================
+    # 🖼️ RENDERIZADO CON RECICLAJE
+    # ========================================
+    def _renderizar(self):
+        """Reescribe el pool de filas con la ventana actual de datos"""
+        total = len(self._datos)
+        self._inicio = max(0, min(self._inicio, total - self._visibles))
+        ventana = self._datos[self._inicio:self._inicio + self._visibles + self.buffer]
+
+        # Ajustar el tamaño del pool (inserciones/borrados en bloque)
+        faltan = len(ventana) - len(self._items)
+        if faltan > 0:
+            for _ in range(faltan):
+                self._items.append(self.tree.insert("", "end"))
+        elif faltan < 0:
+            self.tree.delete(*self._items[faltan:])
+            del self._items[faltan:]
+
+        seleccionados = []
+        for desplazamiento, (iid, fila) in enumerate(zip(self._items, ventana)):
+            indice = self._inicio + desplazamiento
+            valores, tags = self.formateador(fila, indice)
+            self.tree.item(iid, values=valores, tags=tags)
+            if indice in self._seleccion:
+                seleccionados.append(iid)
+
+        # El Treeview siempre muestra su primera fila; el desplazamiento es nuestro
+        self.tree.yview_moveto(0)
+        self._seleccion_programada = tuple(seleccionados)
+        self.tree.selection_set(seleccionados)
+        self._actualizar_scrollbar()
+        self._verificar_final()
+
+    def _actualizar_scrollbar(self):
+        total = len(self._datos)
+        if total <= self._visibles:
+            self.scroll_y.set(0.0, 1.0)
+        else:
+            self.scroll_y.set(self._inicio / total,
+                              (self._inicio + self._visibles) / total)
+
+    def _verificar_final(self):
+        """Pide más datos cuando la ventana toca el final"""
+        if self.al_final is None or self._pidiendo_mas:
+            return
+        if self._inicio + self._visibles + self.buffer >= len(self._datos):
+            # agregar() libera la bandera; si no llega nada no se vuelve a
+            # pedir hasta la próxima carga()
+            self._pidiendo_mas = True
+            self.after_idle(self.al_final)
+
+    # ========================================
+    # 🖱️ DESPLAZAMIENTO
+    # ========================================
+    def _desplazar(self, filas: int):
+        nuevo = max(0, min(self._inicio + filas, len(self._datos) - self._visibles))
+        if nuevo != self._inicio:
+            self._inicio = nuevo
+            self._renderizar()
+        return "break"
+
+    def _on_rueda(self, event):
+        return self._desplazar(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self._inicio = int(float(cantidad) * len(self._datos))
+            self._renderizar()
+        elif accion == "scroll":
+            paso = self._visibles if unidad == "pages" else 1
+            self._desplazar(int(cantidad) * paso)
+
+    def _mover_seleccion(self, paso: int):
+        """Flechas: mueve la selección desplazando la ventana en los bordes"""
+        if not self._datos:
+            return "break"
+        if self._seleccion:
+            actual = max(self._seleccion) if paso > 0 else min(self._seleccion)
+        else:
+            actual = self._inicio - paso
+        destino = max(0, min(actual + paso, len(self._datos) - 1))
+        self._seleccion = {destino}
+        if destino < self._inicio:
+            self._inicio = destino
+        elif destino >= self._inicio + self._visibles:
+            self._inicio = destino - self._visibles + 1
+        self._renderizar()
+        return "break"
+
+    def _on_seleccion(self, event=None):
+        """Traduce la selección del Treeview a índices de datos"""
+        seleccion = self.tree.selection()
+        # Ignorar el evento que genera el propio _renderizar()
+        if not self._datos or tuple(seleccion) == self._seleccion_programada:
+            return
+        visibles = {iid: self._inicio + i for i, iid in enumerate(self._items)}
+        self._seleccion = {visibles[iid] for iid in seleccion if iid in visibles}
+
+    def _on_configure(self, event):
+        """Recalcula cuántas filas caben al redimensionar"""
+        encabezado = self._rowheight
+        visibles = max(1, (event.height - encabezado) // self._rowheight)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._renderizar()
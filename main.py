@@ -7,14 +7,21 @@ main.py - [translate:APUNTAL PRINCIPAL - VENTANA CON PESTAÑAS]
 │ • Centrada 1200x800 profesional
 """
 
+import time
+_INICIO_PROCESO = time.perf_counter()
+
 import tkinter as tk
+import multiprocessing
 import os
 import sys
 from PIL import Image, ImageTk
+from utils.helpers import medir_arranque, registrar_arranque, imprimir_tiempos_arranque
 from database.operations import (
     inicializar_base_de_datos,
+    cerrar_conexiones,
 )
 from gui.main_window import MainWindow
+from gui.ejecutor_consultas import cerrar_ejecutor
 
 
 # ========================================
@@ -34,10 +41,14 @@ def get_resource_path(relative_path):
 # ========================================
 def main():
     """BLOQUE 1: Inicializa DB + lanza MainWindow con pestañas"""
+    registrar_arranque("Imports de módulos", time.perf_counter() - _INICIO_PROCESO)
+
     # Inicializa base de datos (sin prints de debug)
-    inicializar_base_de_datos()
+    with medir_arranque("Base de datos"):
+        inicializar_base_de_datos()
 
     # Crea ventana principal
+    inicio_ventana = time.perf_counter()
     root = tk.Tk()
     root.title("Sistema De Gestión Tryhards")
     root.geometry("1400x900")
@@ -94,13 +105,48 @@ def main():
         import traceback
         traceback.print_exc()
 
+    registrar_arranque("Ventana e ícono", time.perf_counter() - inicio_ventana)
+
     # Crea y ejecuta la aplicación
-    app = MainWindow(root)  # Pasa la ventana ya creada
+    with medir_arranque("MainWindow (con pestaña inicial)"):
+        app = MainWindow(root)  # Pasa la ventana ya creada
+
+    # Desglose del arranque cuando la ventana ya es usable (solo en debug)
+    root.after_idle(lambda: imprimir_tiempos_arranque(time.perf_counter() - _INICIO_PROCESO))
     root.mainloop()
 
+    # Detiene los hilos de consulta y cierra la conexión persistente de la BD
+    cerrar_ejecutor()
+    cerrar_conexiones()
+
 
 # ========================================
 # 🏃‍♂️ EJECUTAR
 # ========================================
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # El PDF se genera en un proceso hijo: necesario en el .exe de PyInstaller
+    multiprocessing.freeze_support()
+    if "--reconstruir-resumen" in sys.argv:
+        # Mantenimiento: recalcula daily_summary sin abrir la ventana
+        from database.operations import reconstruir_resumen_diario
+        inicializar_base_de_datos()
+        print(f"✅ Resumen diario reconstruido: {reconstruir_resumen_diario()} filas")
+        cerrar_conexiones()
+    elif "--verificar-libro" in sys.argv:
+        # Auditoría: recalcula todas las cuentas desde account_movements
+        from database.operations import verificar_libro_mayor, crear_checkpoints_cuentas
+        inicializar_base_de_datos()
+        resultado = verificar_libro_mayor()
+        print(f"📒 {resultado['cuentas']} cuentas, {resultado['movimientos']} movimientos")
+        for e in resultado['errores']:
+            print(f"   ❌ Cuenta {e['cuenta_id']} mov. {e['movimiento_id']} ({e['tipo']}): "
+                  f"esperado {e['esperado']}, encontrado {e['encontrado']}")
+        if resultado['ok']:
+            # Solo sobre un libro verificado: pone al día los checkpoints atrasados
+            print(f"✅ Libro mayor consistente ({crear_checkpoints_cuentas()} checkpoints nuevos)")
+        else:
+            print(f"⚠️ {len(resultado['errores'])} diferencias")
+        cerrar_conexiones()
+        sys.exit(0 if resultado['ok'] else 1)
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,381 @@
+"""
+reports/generator.py - [translate:EXPORTACIÓN DE REPORTES (EXCEL / CSV / PDF)]
+│
+│ Propósito:
+│ • Exportar transacciones, dashboard y comisiones a Excel (carpeta reports/)
+│ • Las filas se escriben a medida que llegan (openpyxl write-only):
+│   exportar un año de transacciones usa memoria constante
+│ • Sin openpyxl instalado se exporta a CSV con las mismas columnas
+│ • Exportación a PDF con reportlab, en un proceso aparte con progreso
+│   y cancelación (ExportacionPDF)
+"""
+
+import csv
+import importlib.util
+import multiprocessing
+import os
+import queue
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.config import REPORTS_DIR
+from database.operations import (
+    contar_transacciones_combinadas,
+    iterar_transacciones_combinadas,
+    obtener_agregados_ganancias,
+    obtener_comisiones_trabajador,
+    obtener_serie_ganancias,
+)
+
+# Límite de filas de una hoja de Excel (con encabezado); al llenarse se abre otra
+_MAX_FILAS_HOJA = 1_048_575
+
+# (clave de la fila, encabezado) de cada columna exportada
+COLUMNAS_TRANSACCIONES: List[Tuple[str, str]] = [
+    ("tipo", "Tipo"),
+    ("id", "ID"),
+    ("date", "Fecha"),
+    ("worker_name", "Trabajador"),
+    ("country_name", "País"),
+    ("payment_method_name", "Método de pago"),
+    ("game_name", "Juego"),
+    ("product_name", "Producto"),
+    ("cliente_nombre", "Cliente"),
+    ("monto", "Monto"),
+    ("costo", "Costo"),
+    ("comision", "Comisión"),
+    ("ganancia", "Ganancia"),
+    ("currency_code", "Moneda"),
+    ("amount_origin", "Monto origen"),
+    ("rate_origin_to_bs", "Tasa Bs"),
+    ("amount_destiny_bs", "Monto Bs"),
+    ("usdt_received", "USDT recibidos"),
+    ("usdt_spent", "USDT gastados"),
+    ("profit_gross_usdt", "Ganancia bruta USDT"),
+    ("profit_net_usdt", "Ganancia neta USDT"),
+    ("sender_name", "Remitente"),
+    ("receiver_name", "Beneficiario"),
+    ("notes", "Notas"),
+]
+
+# Hoja: (nombre, encabezados, filas como tuplas — puede ser un generador)
+Hoja = Tuple[str, Sequence[str], Iterable[Sequence[Any]]]
+
+# ========================================
+# 🛠️ ESCRITURA EN STREAMING
+# ========================================
+
+def _ruta_reporte(prefijo: str, extension: str) -> str:
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(REPORTS_DIR, f"{prefijo}_{marca}.{extension}")
+
+def _filas_transacciones(transacciones: Iterable[Dict[str, Any]]) -> Iterable[tuple]:
+    claves = [clave for clave, _ in COLUMNAS_TRANSACCIONES]
+    for t in transacciones:
+        yield tuple(t.get(clave) for clave in claves)
+
+def _escribir_xlsx(ruta: str, hojas: List[Hoja]) -> None:
+    from openpyxl import Workbook
+
+    # write_only: cada fila se serializa al agregarla y no queda en memoria
+    libro = Workbook(write_only=True)
+    for nombre, encabezados, filas in hojas:
+        hoja, parte, en_hoja = None, 0, _MAX_FILAS_HOJA
+        for fila in filas:
+            if en_hoja >= _MAX_FILAS_HOJA:
+                parte += 1
+                hoja = libro.create_sheet(nombre if parte == 1 else f"{nombre} ({parte})")
+                hoja.append(list(encabezados))
+                en_hoja = 0
+            hoja.append(list(fila))
+            en_hoja += 1
+        if hoja is None:
+            libro.create_sheet(nombre).append(list(encabezados))
+    libro.save(ruta)
+
+def _escribir_csv(ruta: str, hojas: List[Hoja]) -> List[str]:
+    """Una hoja -> un CSV (ruta, ruta_<hoja>.csv...). Retorna los archivos."""
+    base, _ = os.path.splitext(ruta)
+    archivos = []
+    for i, (nombre, encabezados, filas) in enumerate(hojas):
+        destino = f"{base}.csv" if i == 0 else f"{base}_{nombre.lower().replace(' ', '_')}.csv"
+        # utf-8-sig + ';' para que Excel en español lo abra bien con doble clic
+        with open(destino, "w", newline="", encoding="utf-8-sig") as f:
+            escritor = csv.writer(f, delimiter=";")
+            escritor.writerow(encabezados)
+            escritor.writerows(filas)
+        archivos.append(destino)
+    return archivos
+
+def _exportar_hojas(prefijo: str, hojas: List[Hoja]) -> str:
+    """Escribe las hojas en .xlsx (o .csv sin openpyxl). Retorna la ruta principal."""
+    if importlib.util.find_spec("openpyxl") is None:
+        return _escribir_csv(_ruta_reporte(prefijo, "csv"), hojas)[0]
+
+    ruta = _ruta_reporte(prefijo, "xlsx")
+    _escribir_xlsx(ruta, hojas)
+    return ruta
+
+def _hoja_filtros(filtros: Optional[Dict[str, Any]]) -> Hoja:
+    filas = [("Generado", datetime.now().strftime("%Y-%m-%d %H:%M"))]
+    filas += [(str(k), str(v)) for k, v in (filtros or {}).items()]
+    return ("Filtros", ("Filtro", "Valor"), filas)
+
+# ========================================
+# 📊 EXPORTACIONES A EXCEL
+# ========================================
+
+def exportar_a_excel(transacciones: Iterable[Dict[str, Any]],
+                     filtros: Optional[Dict[str, Any]] = None,
+                     prefijo: str = "transacciones") -> str:
+    """
+    Exporta transacciones (lista o generador, p. ej. iterar_transacciones_combinadas)
+    a reports/<prefijo>_<fecha>.xlsx. Retorna la ruta del archivo.
+    """
+    encabezados = [titulo for _, titulo in COLUMNAS_TRANSACCIONES]
+    return _exportar_hojas(prefijo, [
+        ("Transacciones", encabezados, _filas_transacciones(transacciones)),
+        _hoja_filtros(filtros),
+    ])
+
+def exportar_transacciones_filtradas(filtros_consulta: Dict[str, Any],
+                                     filtros_reporte: Optional[Dict[str, Any]] = None) -> str:
+    """Exporta directo desde la BD (streaming) con los filtros de obtener_transacciones_combinadas()"""
+    return exportar_a_excel(iterar_transacciones_combinadas(**filtros_consulta), filtros_reporte)
+
+def exportar_dashboard(fecha_inicio: str = None, fecha_fin: str = None) -> str:
+    """Resumen de ganancias + ranking de trabajadores + ganancias diarias del periodo"""
+    agregados = obtener_agregados_ganancias(fecha_inicio, fecha_fin)
+    resumen = agregados["resumen"]
+
+    filas_resumen = [
+        ("Total transacciones", resumen["total_transacciones"]),
+        ("Recargas", resumen["total_recargas"]),
+        ("Remesas", resumen["total_remesas"]),
+        ("Recibido recargas (USD)", resumen["total_recibido_usd"]),
+        ("Ganancia recargas (USD)", resumen["ganancia_total_usd"]),
+        ("Comisiones recargas (USD)", resumen["comisiones_total_usd"]),
+        ("Ganancia neta dueño recargas (USD)", resumen["ganancia_neta_dueño_usd"]),
+        ("Monto origen remesas", resumen["total_origin"]),
+        ("Monto destino remesas (Bs)", resumen["total_destiny_bs"]),
+        ("Ganancia remesas (USDT)", resumen["ganancia_total_usdt"]),
+        ("Comisiones remesas (USDT)", resumen["comisiones_total_usdt"]),
+        ("Ganancia neta dueño remesas (USDT)", resumen["ganancia_neta_dueño_usdt"]),
+    ]
+    filas_ranking = (
+        (t["nombre"], t["total_recargas"], t["total_remesas"], t["ganancia_generada"],
+         t["comisiones_ganadas"], t["ganancia_neta_para_dueño"])
+        for t in agregados["ranking"]
+    )
+    # Serie diaria del mismo periodo (sin fecha inicial: 30 días); incluye días sin ventas
+    fin = fecha_fin or datetime.now().strftime("%Y-%m-%d")
+    inicio = fecha_inicio or (datetime.strptime(fin, "%Y-%m-%d") - timedelta(days=30)).strftime("%Y-%m-%d")
+    serie = obtener_serie_ganancias(inicio, fin, "dia")
+    filas_diarias = zip(serie["periodo"], serie["ganancia_recargas"], serie["ganancia_remesas"],
+                        serie["comisiones_total"], serie["ganancia_neta"])
+
+    return _exportar_hojas("dashboard", [
+        ("Resumen", ("Concepto", "Valor"), filas_resumen),
+        ("Trabajadores", ("Trabajador", "Recargas", "Remesas", "Ganancia generada",
+                          "Comisiones", "Neto dueño"), filas_ranking),
+        ("Ganancias diarias", ("Fecha", "Recargas", "Remesas", "Comisiones", "Neto"), filas_diarias),
+        _hoja_filtros({"Fecha desde": fecha_inicio or "Inicio", "Fecha hasta": fecha_fin or "Hoy"}),
+    ])
+
+def generar_reporte_comisiones(worker_id: int, fecha_inicio: str, fecha_fin: str) -> str:
+    """Comisiones del trabajador + el detalle de sus transacciones (streaming)"""
+    datos = obtener_comisiones_trabajador(worker_id, fecha_inicio, fecha_fin)
+    filas_resumen = [
+        ("Trabajador", datos["worker_name"]),
+        ("Periodo", f"{fecha_inicio} a {fecha_fin}"),
+        ("Recargas", datos["total_recargas"]),
+        ("Remesas", datos["total_remesas"]),
+        ("Venta recargas (USD)", datos["total_venta_usd"]),
+        ("Venta remesas (origen)", datos["total_venta_origen"]),
+        ("Ganancia generada (USD)", datos["ganancia_generada_usd"]),
+        ("Ganancia generada (USDT)", datos["ganancia_generada_usdt"]),
+        ("Comisiones (USD)", datos["total_comisiones_usd"]),
+        ("Comisiones (USDT)", datos["total_comisiones_usdt"]),
+    ]
+
+    transacciones = iterar_transacciones_combinadas(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, worker_id=worker_id
+    )
+    encabezados = [titulo for _, titulo in COLUMNAS_TRANSACCIONES]
+    return _exportar_hojas(f"comisiones_{worker_id}", [
+        ("Comisiones", ("Concepto", "Valor"), filas_resumen),
+        ("Transacciones", encabezados, _filas_transacciones(transacciones)),
+    ])
+
+# ========================================
+# 📄 EXPORTACIÓN A PDF
+# ========================================
+
+# Columnas que caben en una hoja horizontal
+_COLUMNAS_PDF = [("date", "Fecha"), ("tipo", "Tipo"), ("worker_name", "Trabajador"),
+                 ("country_name", "País"), ("payment_method_name", "Método"),
+                 ("monto", "Monto"), ("comision", "Comisión"), ("ganancia", "Ganancia")]
+
+# Filas por tabla: reportlab maqueta tablas chicas mucho más rápido que una gigante
+_FILAS_POR_TABLA = 500
+
+class ExportacionCancelada(Exception):
+    """El usuario canceló la generación del reporte."""
+
+def _celda_pdf(valor: Any) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, float):
+        return f"{valor:,.2f}"
+    return str(valor)
+
+def exportar_a_pdf(transacciones: Iterable[Dict[str, Any]], titulo: str = "Reporte",
+                   filtros: Optional[Dict[str, Any]] = None,
+                   total: Optional[int] = None,
+                   al_progresar: Optional[Callable[[int, Optional[int]], None]] = None,
+                   cancelado: Optional[Callable[[], bool]] = None) -> str:
+    """
+    Tabla de transacciones en PDF horizontal. Retorna la ruta del archivo.
+
+    • al_progresar(filas_maquetadas, total) se llama tras cada tramo de página
+    • cancelado() se consulta en cada tramo; si retorna True se borra el
+      archivo a medias y se lanza ExportacionCancelada
+    """
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    except ImportError:
+        raise RuntimeError("Para exportar a PDF instala reportlab")
+
+    def revisar_cancelacion():
+        if cancelado and cancelado():
+            raise ExportacionCancelada()
+
+    estilos = getSampleStyleSheet()
+    elementos = [Paragraph(titulo, estilos["Title"])]
+    for clave, valor in (filtros or {}).items():
+        elementos.append(Paragraph(f"<b>{clave}:</b> {valor}", estilos["Normal"]))
+    elementos.append(Spacer(1, 12))
+
+    estilo_tabla = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2D3436")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F1F2F6")]),
+    ])
+    encabezado = [titulo_col for _, titulo_col in _COLUMNAS_PDF]
+    anchos = [60, 60, 110, 90, 100, 70, 70, 70]  # Iguales en todas las tablas
+
+    # Tablas de a _FILAS_POR_TABLA filas, con el encabezado repetido en cada página
+    tramo: List[List[str]] = []
+    for t in transacciones:
+        tramo.append([_celda_pdf(t.get(clave)) for clave, _ in _COLUMNAS_PDF])
+        if len(tramo) >= _FILAS_POR_TABLA:
+            revisar_cancelacion()
+            tabla = Table([encabezado] + tramo, colWidths=anchos, repeatRows=1)
+            tabla.setStyle(estilo_tabla)
+            elementos.append(tabla)
+            tramo = []
+    if tramo or len(elementos) == 3:
+        tabla = Table([encabezado] + tramo, colWidths=anchos, repeatRows=1)
+        tabla.setStyle(estilo_tabla)
+        elementos.append(tabla)
+
+    maquetadas = 0
+
+    class _Documento(SimpleDocTemplate):
+        def afterFlowable(self, flowable):
+            # Cada tabla se parte en tramos de una página; cada tramo trae su encabezado
+            nonlocal maquetadas
+            if isinstance(flowable, Table):
+                maquetadas += max(0, len(flowable._cellvalues) - 1)
+                revisar_cancelacion()
+                if al_progresar:
+                    al_progresar(maquetadas, total)
+
+    ruta = _ruta_reporte("transacciones", "pdf")
+    try:
+        _Documento(ruta, pagesize=landscape(A4)).build(elementos)
+    except ExportacionCancelada:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+    return ruta
+
+# ========================================
+# ⚙️ PDF EN UN PROCESO APARTE
+# ========================================
+
+def _proceso_pdf(filtros_consulta: Dict[str, Any], titulo: str,
+                 filtros: Optional[Dict[str, Any]], cola, evento_cancelar) -> None:
+    """
+    Proceso hijo: cuenta, lee y maqueta el PDF; informa por la cola:
+    ("progreso", hechas, total) | ("listo", ruta) | ("cancelado", None) | ("error", mensaje)
+    (A nivel de módulo para poder iniciarse con 'spawn' en Windows.)
+    """
+    try:
+        total = contar_transacciones_combinadas(**filtros_consulta)
+        cola.put(("progreso", 0, total))
+        ultimo_porcentaje = -1
+
+        def progreso(hechas, total):
+            nonlocal ultimo_porcentaje
+            porcentaje = hechas * 100 // total if total else 100
+            if porcentaje != ultimo_porcentaje:  # Un mensaje por punto porcentual
+                ultimo_porcentaje = porcentaje
+                cola.put(("progreso", hechas, total))
+
+        ruta = exportar_a_pdf(
+            iterar_transacciones_combinadas(**filtros_consulta), titulo, filtros,
+            total=total, al_progresar=progreso, cancelado=evento_cancelar.is_set
+        )
+        cola.put(("listo", ruta))
+    except ExportacionCancelada:
+        cola.put(("cancelado", None))
+    except Exception as e:
+        cola.put(("error", str(e)))
+
+class ExportacionPDF:
+    """
+    Genera exportar_a_pdf() en otro proceso para no congelar la ventana
+    (reportlab maqueta en Python puro y retiene el GIL).
+
+    La GUI llama mensajes() periódicamente con after() y cancelar() si el
+    usuario lo pide; si el hijo no responde, terminar() lo detiene.
+    """
+
+    def __init__(self, filtros_consulta: Dict[str, Any], titulo: str,
+                 filtros: Optional[Dict[str, Any]] = None):
+        contexto = multiprocessing.get_context("spawn")  # Igual en Windows y Linux
+        self._cola = contexto.Queue()
+        self._evento_cancelar = contexto.Event()
+        self.proceso = contexto.Process(
+            target=_proceso_pdf,
+            args=(filtros_consulta, titulo, filtros, self._cola, self._evento_cancelar),
+            daemon=True,
+        )
+        self.proceso.start()
+
+    def mensajes(self) -> List[tuple]:
+        """Mensajes pendientes del proceso hijo (sin bloquear)"""
+        pendientes = []
+        while True:
+            try:
+                pendientes.append(self._cola.get_nowait())
+            except queue.Empty:
+                return pendientes
+
+    def cancelar(self) -> None:
+        self._evento_cancelar.set()
+
+    def activo(self) -> bool:
+        return self.proceso.is_alive()
+
+    def terminar(self) -> None:
+        if self.proceso.is_alive():
+            self.proceso.terminate()
+        self.proceso.join(timeout=1)
@@ -41,7 +41,31 @@ COLORS = {
 # ========================================
 SETTINGS = {
     "debug": True, "default_currency": "USD", "default_date_format": "%Y-%m-%d",
-    "max_recent_days": 30, "auto_backup_days": 7
+    "max_recent_days": 30, "auto_backup_days": 7, "page_size": 200,
+    "query_threads": 2, "catalog_cache_ttl": 5,  # segundos entre revisiones de versión
+    "ledger_checkpoint_every": 200,  # movimientos por cuenta entre checkpoints de balance
+    "db_pragma_profile": "rendimiento"  # rendimiento | seguro | red
+}
+
+# ========================================
+# 🗄️ PERFILES DE PRAGMAS SQLITE
+# ========================================
+# • rendimiento → WAL: Historial lee mientras Recargas/Remesas escriben
+# • seguro      → WAL con fsync completo en cada commit
+# • red         → Diario clásico (WAL no funciona en carpetas compartidas)
+DB_PRAGMA_PROFILES = {
+    "rendimiento": {
+        "journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -64000,
+        "mmap_size": 268435456, "temp_store": "MEMORY"
+    },
+    "seguro": {
+        "journal_mode": "WAL", "synchronous": "FULL", "cache_size": -16000,
+        "mmap_size": 0, "temp_store": "MEMORY"
+    },
+    "red": {
+        "journal_mode": "DELETE", "synchronous": "FULL", "cache_size": -16000,
+        "mmap_size": 0, "temp_store": "MEMORY"
+    },
 }
 
 EXCHANGE_RATES = {"USD_to_VES": 40.0, "USDT_to_USD": 0.99}
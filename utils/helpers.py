@@ -7,11 +7,14 @@ utils/helpers.py - [translate:CÁLCULOS FINANCIEROS Y UTILIDADES]
 │ • format_currency() → Formatea Bs. 1.234,56
 │ • validate_amount() → Valida montos > 0
 │ • get_today_string() → Fecha actual YYYY-MM-DD
+│ • medir_arranque() / registrar_arranque() → Desglose del arranque (modo debug)
 """
 
+import time
+from contextlib import contextmanager
 from typing import Tuple
 from datetime import datetime
-from utils.config import EXCHANGE_RATES
+from utils.config import EXCHANGE_RATES, SETTINGS
 
 # ========================================
 # 💰 CÁLCULO DE GANANCIAS AUTOMÁTICO
@@ -109,4 +112,37 @@ def get_current_datetime() -> str:
 
     Ejemplo: "2025-12-07 15:30:45"
     """
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
\ No newline at end of file
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# ========================================
+# ⏱️ TIEMPOS DE ARRANQUE (MODO DEBUG)
+# ========================================
+_TIEMPOS_ARRANQUE: list = []
+
+@contextmanager
+def medir_arranque(etapa: str):
+    """
+    BLOQUE 8: Registra cuánto tarda una etapa del arranque
+
+    Ejemplo: with medir_arranque("Base de datos"): inicializar_base_de_datos()
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_arranque(etapa, time.perf_counter() - inicio)
+
+def registrar_arranque(etapa: str, segundos: float):
+    """BLOQUE 8b: Registra una etapa ya medida (p.ej. imports de main.py)"""
+    _TIEMPOS_ARRANQUE.append((etapa, segundos))
+
+def imprimir_tiempos_arranque(total_segundos: float = None):
+    """BLOQUE 9: Imprime el desglose del arranque (solo con SETTINGS['debug'])"""
+    if not SETTINGS["debug"] or not _TIEMPOS_ARRANQUE:
+        return
+    print("⏱️ TIEMPOS DE ARRANQUE:")
+    for etapa, segundos in _TIEMPOS_ARRANQUE:
+        print(f"   {etapa:<32} {segundos * 1000:8.1f} ms")
+    if total_segundos is not None:
+        print(f"   {'LISTO PARA USAR':<32} {total_segundos * 1000:8.1f} ms")
+    _TIEMPOS_ARRANQUE.clear()